@@ -3,21 +3,30 @@
 Pretender — 本地正向代理 & Mock 服务
 支持 HTTP 和 HTTPS (MITM) 代理
 
-启动: python app.py
+启动: python app.py [--workers N]
+编译配置快照: python app.py --compile [OUTPUT]
 """
 
 import sys
 import os
+import argparse
 import asyncio
+import functools
 import logging
+import signal
 
 # 添加项目根目录到 Python 路径
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+from src.core.config_loader import compile_config, default_compiled_path
 from src.core.config_manager import ConfigManager
 from src.core.cert_manager import CertManager
 from src.core.data_generator import DataGenerator
+from src.server.admin import AdminAPI
 from src.server.async_proxy import AsyncProxyServer
+from src.server.response_cache import ResponseCache
+from src.server.upstream import UpstreamPool
+from src.server.workers import WorkerSupervisor
 
 # 配置日志
 logging.basicConfig(
@@ -27,32 +36,185 @@ logging.basicConfig(
 logger = logging.getLogger('Pretender')
 logging.getLogger('asyncio').setLevel(logging.ERROR)
 
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Mock 配置：单个 YAML 文件，或按主机 / 团队拆分的配置目录
+CONFIG_PATH = os.environ.get('PRETENDER_CONFIG') or os.path.join(BASE_DIR, 'config/mock_config.yaml')
+CERTS_DIR = os.path.join(BASE_DIR, 'certs')
+# 配置编译快照，默认位于配置文件旁（目录配置为目录中的 .compiled）
+COMPILED_PATH = os.environ.get('PRETENDER_CONFIG_COMPILED') or default_compiled_path(CONFIG_PATH)
 
-def main():
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    config_path = os.path.join(base_dir, 'config/mock_config.yaml')
-    certs_dir = os.path.join(base_dir, 'certs')
 
+def _env_flag(name: str, default: str = '0') -> bool:
+    return os.environ.get(name, default).lower() in ('1', 'true', 'yes')
+
+
+def _build_server(reuse_port: bool = False) -> AsyncProxyServer:
     host = os.environ.get('PRETENDER_HOST', '0.0.0.0')
     port = int(os.environ.get('PRETENDER_PORT', '8888'))
 
-    # 初始化核心组件
-    config_manager = ConfigManager(config_path)
-    cert_manager = CertManager(certs_dir)
-    data_generator = DataGenerator()
+    # 上游连接池
+    upstream = UpstreamPool(
+        max_connections_per_host=int(os.environ.get('PRETENDER_UPSTREAM_MAX_CONNECTIONS', '20')),
+        keepalive_expiry=float(os.environ.get('PRETENDER_UPSTREAM_KEEPALIVE', '30')),
+        http2=_env_flag('PRETENDER_UPSTREAM_HTTP2'),
+        dns_ttl=float(os.environ.get('PRETENDER_UPSTREAM_DNS_TTL', '60')),
+        max_hosts=int(os.environ.get('PRETENDER_UPSTREAM_MAX_HOSTS', '256')),
+    )
+
+    # 转发响应缓存（按配置 cache 规则启用）
+    cache_max_bytes = int(os.environ.get('PRETENDER_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+    response_cache = None
+    if cache_max_bytes > 0:
+        response_cache = ResponseCache(
+            max_bytes=cache_max_bytes,
+            max_entry_size=int(os.environ.get('PRETENDER_CACHE_MAX_ENTRY', str(8 * 1024 * 1024))),
+            disk_dir=os.environ.get('PRETENDER_CACHE_DIR') or None,
+            disk_max_bytes=int(os.environ.get('PRETENDER_CACHE_DISK_MAX_BYTES', str(1024 * 1024 * 1024))),
+        )
+
+    # 初始化核心组件（每个 worker 各自持有，配置独立热加载）
+    config_manager = ConfigManager(CONFIG_PATH,
+                                   rule_engine=os.environ.get('PRETENDER_RULE_ENGINE', 'auto'),
+                                   match_cache_size=int(os.environ.get('PRETENDER_MATCH_CACHE_SIZE', '4096')),
+                                   watch=os.environ.get('PRETENDER_CONFIG_WATCH', 'auto'),
+                                   debounce=float(os.environ.get('PRETENDER_CONFIG_DEBOUNCE', '0.2')),
+                                   lazy_hosts=_env_flag('PRETENDER_CONFIG_LAZY'),
+                                   runtime_store=os.environ.get('PRETENDER_ADMIN_STORE') or None,
+                                   compiled_path=COMPILED_PATH)
+    cert_manager = CertManager(CERTS_DIR)
+    pool_low = os.environ.get('PRETENDER_FAKER_POOL_LOW')
+    data_generator = DataGenerator(pool_size=int(os.environ.get('PRETENDER_FAKER_POOL', '0')),
+                                   pool_low=int(pool_low) if pool_low else None)
+
+    # 管理接口：运行时规则保存在进程内，多 worker 模式下规则只读，仅提供查询与统计
+    admin = None
+    if _env_flag('PRETENDER_ADMIN'):
+        admin = AdminAPI(config_manager, host=os.environ.get('PRETENDER_ADMIN_HOST', 'pretender.admin'),
+                         rules=not reuse_port, upstream=upstream)
+
+    return AsyncProxyServer(
+        config_manager, cert_manager, data_generator,
+        host=host, port=port, upstream=upstream,
+        stream_upstream=_env_flag('PRETENDER_STREAM_UPSTREAM', '1'),
+        max_body_size=int(os.environ.get('PRETENDER_MAX_BODY_SIZE', str(10 * 1024 * 1024))),
+        keepalive_timeout=float(os.environ.get('PRETENDER_KEEPALIVE_TIMEOUT', '30')),
+        blind_tunnel=_env_flag('PRETENDER_BLIND_TUNNEL', '1'),
+        tunnel_idle_timeout=float(os.environ.get('PRETENDER_TUNNEL_IDLE_TIMEOUT', '300')),
+        max_head_size=int(os.environ.get('PRETENDER_MAX_HEAD_SIZE', str(64 * 1024))),
+        header_parser=os.environ.get('PRETENDER_HEADER_PARSER', 'auto'),
+        http2=_env_flag('PRETENDER_HTTP2', '1'),
+        reuse_port=reuse_port,
+        tcp_nodelay=_env_flag('PRETENDER_TCP_NODELAY', '1'),
+        response_cache=response_cache,
+        admin=admin,
+        body_match_max=int(os.environ.get('PRETENDER_BODY_MATCH_MAX', str(1024 * 1024))),
+        stats_file=os.environ.get('PRETENDER_STATS_FILE') or None,
+        stats_interval=float(os.environ.get('PRETENDER_STATS_INTERVAL', '60')),
+        mock_stream_chunk=int(os.environ.get('PRETENDER_MOCK_STREAM_CHUNK', str(64 * 1024))),
+    )
+
+
+def _start_options() -> dict:
+    """监听 socket 调优参数，传给 AsyncProxyServer.start()"""
+    return dict(
+        backlog=int(os.environ.get('PRETENDER_BACKLOG', '1024')),
+        recv_buffer=int(os.environ.get('PRETENDER_RECV_BUFFER', '0')),
+        send_buffer=int(os.environ.get('PRETENDER_SEND_BUFFER', '0')),
+    )
+
+
+def _run(coro, loop: str = 'auto'):
+    """运行事件循环；auto / uvloop 时优先使用 uvloop，未安装则回退到 asyncio"""
+    loop_factory = None
+    if loop in ('auto', 'uvloop'):
+        try:
+            import uvloop
+            loop_factory = uvloop.new_event_loop
+        except ImportError:
+            if loop == 'uvloop':
+                logger.warning("未安装 uvloop，使用默认 asyncio 事件循环")
+    elif loop != 'asyncio':
+        raise ValueError(f'未知的事件循环: {loop}（可选: auto, asyncio, uvloop）')
+    with asyncio.Runner(loop_factory=loop_factory) as runner:
+        return runner.run(coro)
+
+
+def _worker_main(worker_id: int, loop: str = 'auto'):
+    """worker 子进程入口"""
+    def _on_term(signum, frame):
+        raise KeyboardInterrupt
+
+    # fork 出的子进程会继承 supervisor 的信号处理，需恢复
+    signal.signal(signal.SIGTERM, _on_term)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    logging.getLogger('Pretender').info(f"worker {worker_id} (pid {os.getpid()}) 初始化")
+
+    server = _build_server(reuse_port=True)
+    try:
+        _run(server.start(**_start_options()), loop)
+    except KeyboardInterrupt:
+        pass
+
+
+def _compile(output: str = None) -> int:
+    """校验配置并写出编译快照，返回进程退出码"""
+    compiled, errors = compile_config(CONFIG_PATH, output or COMPILED_PATH)
+    for error in errors:
+        logger.error(f"❌ {error}")
+    if errors:
+        logger.error(f"配置校验失败（{len(errors)} 处错误），未生成编译快照")
+        return 1
+    compiled.save()
+    rules = sum(len(entries) for _, _, entries in compiled.files.values())
+    logger.info(f"✅ 已编译 {len(compiled)} 个配置文件, {rules} 条规则 → {compiled.path}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pretender — 本地正向代理 & Mock 服务')
+    parser.add_argument('--workers', type=int,
+                        default=int(os.environ.get('PRETENDER_WORKERS', '1')),
+                        help='worker 进程数，>1 时以 SO_REUSEPORT 多进程监听同一端口 '
+                             '(默认读取 PRETENDER_WORKERS，否则为 1)')
+    parser.add_argument('--loop', choices=('auto', 'asyncio', 'uvloop'),
+                        default=os.environ.get('PRETENDER_LOOP', 'auto'),
+                        help='事件循环实现，auto 时已安装 uvloop 则使用 uvloop '
+                             '(默认读取 PRETENDER_LOOP，否则为 auto)')
+    parser.add_argument('--compile', nargs='?', const='', metavar='OUTPUT',
+                        help='校验配置并生成编译快照后退出，启动时自动采用与源文件一致的快照 '
+                             '(默认输出到 PRETENDER_CONFIG_COMPILED，否则为配置文件旁的 .compiled)')
+    args = parser.parse_args()
+
+    if args.compile is not None:
+        sys.exit(_compile(args.compile))
+
+    host = os.environ.get('PRETENDER_HOST', '0.0.0.0')
+    port = int(os.environ.get('PRETENDER_PORT', '8888'))
+    ca_crt = os.path.join(CERTS_DIR, 'ca.crt')
 
-    ca_crt = os.path.join(certs_dir, 'ca.crt')
     logger.info("=" * 60)
     logger.info("Pretender — 本地正向代理 & Mock 服务")
     logger.info(f"  监听地址: {host}:{port}")
-    logger.info(f"  配置文件: {config_path}")
+    logger.info(f"  配置文件: {CONFIG_PATH}")
     logger.info(f"  CA 证书:  {ca_crt}")
+    if args.workers > 1:
+        logger.info(f"  Worker:   {args.workers} 个进程 (SO_REUSEPORT)")
+        if _env_flag('PRETENDER_ADMIN'):
+            logger.warning("  管理接口的规则保存在单个进程内，多 worker 模式下规则只读，统计按 worker 分别计算")
+    if _env_flag('PRETENDER_ADMIN'):
+        admin_host = os.environ.get('PRETENDER_ADMIN_HOST', 'pretender.admin')
+        logger.info(f"  管理接口: http://{admin_host}/rules, http://{admin_host}/stats")
     logger.info("  客户端信任 CA 后即可拦截 HTTPS 请求")
     logger.info("=" * 60)
 
-    server = AsyncProxyServer(config_manager, cert_manager, data_generator,
-                              host=host, port=port)
-    asyncio.run(server.start())
+    if args.workers > 1:
+        # 在 fork 之前生成 CA，避免多个 worker 同时创建
+        CertManager(CERTS_DIR)
+        WorkerSupervisor(functools.partial(_worker_main, loop=args.loop), args.workers).run()
+        return
+
+    server = _build_server()
+    _run(server.start(**_start_options()), args.loop)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+代理吞吐基准：分别测量 mock 路径与转发路径，对比 asyncio / uvloop 事件循环
+
+用法:
+    python benchmarks/bench_proxy.py [--connections 50] [--duration 10] [--loops asyncio,uvloop]
+
+代理与本地上游各自运行在独立进程中，压测客户端使用 keep-alive 长连接。
+"""
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MOCK_HOST = 'bench.pretender.local'
+
+_CONFIG = f"""\
+mocks:
+  - url: ^http://{MOCK_HOST.replace('.', '[.]')}/mock$
+    method: GET
+    response:
+      code: 200
+      msg:
+        desc: "成功"
+        items: [1, 2, 3]
+"""
+
+_UPSTREAM_BODY = b'{"code": 200, "msg": "upstream"}'
+
+
+# ── 进程入口 ─────────────────────────────────────────────
+
+def _run_upstream(port: int, ready):
+    """最简 keep-alive HTTP 上游，返回固定响应"""
+    response = (b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                b'Content-Length: %d\r\n\r\n' % len(_UPSTREAM_BODY)) + _UPSTREAM_BODY
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                await reader.readuntil(b'\r\n\r\n')
+                writer.write(response)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def main():
+        server = await asyncio.start_server(handle, '127.0.0.1', port, backlog=1024)
+        ready.set()
+        await server.serve_forever()
+
+    asyncio.run(main())
+
+
+def _run_proxy(port: int, loop: str, config_path: str, certs_dir: str, ready):
+    logging.basicConfig(level=logging.WARNING)
+    os.environ['PRETENDER_PORT'] = str(port)
+    os.environ['PRETENDER_HOST'] = '127.0.0.1'
+
+    import app
+    from src.core.cert_manager import CertManager
+    from src.core.config_manager import ConfigManager
+    from src.core.data_generator import DataGenerator
+    from src.server.async_proxy import AsyncProxyServer
+    from src.server.upstream import UpstreamPool
+
+    server = AsyncProxyServer(ConfigManager(config_path), CertManager(certs_dir), DataGenerator(),
+                              host='127.0.0.1', port=port, upstream=UpstreamPool())
+
+    async def main():
+        asyncio.get_running_loop().call_later(0.2, ready.set)
+        await server.start(**app._start_options())
+
+    app._run(main(), loop)
+
+
+# ── 压测客户端 ───────────────────────────────────────────
+
+async def _read_response(reader: asyncio.StreamReader):
+    head = await reader.readuntil(b'\r\n\r\n')
+    length = 0
+    chunked = False
+    for line in head.split(b'\r\n')[1:]:
+        name, _, value = line.partition(b':')
+        name = name.strip().lower()
+        if name == b'content-length':
+            length = int(value)
+        elif name == b'transfer-encoding' and b'chunked' in value.lower():
+            chunked = True
+    if chunked:
+        while True:
+            size = int((await reader.readuntil(b'\r\n')).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif length:
+        await reader.readexactly(length)
+    return int(head.split(b' ', 2)[1])
+
+
+async def _worker(port: int, request: bytes, deadline: float, latencies: list, errors: list):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            writer.write(request)
+            status = await _read_response(reader)
+            if status != 200:
+                errors.append(status)
+            latencies.append(time.perf_counter() - started)
+    except (asyncio.IncompleteReadError, ConnectionError) as e:
+        errors.append(repr(e))
+    finally:
+        writer.close()
+
+
+async def _load(port: int, url: str, connections: int, duration: float):
+    host = url.split('/')[2]
+    request = (f'GET {url} HTTP/1.1\r\nHost: {host}\r\n'
+               f'Proxy-Connection: keep-alive\r\n\r\n').encode()
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+    await asyncio.gather(*(_worker(port, request, deadline, latencies, errors)
+                           for _ in range(connections)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+
+    def pct(p):
+        return latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000 if latencies else 0
+
+    return len(latencies) / elapsed, pct(0.5), pct(0.99), len(errors)
+
+
+def _free_port() -> int:
+    import socket
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--connections', type=int, default=50, help='并发 keep-alive 连接数')
+    parser.add_argument('--duration', type=float, default=10, help='每项测量时长（秒）')
+    parser.add_argument('--loops', default='asyncio,uvloop', help='对比的事件循环，逗号分隔')
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context('spawn')
+    workdir = tempfile.mkdtemp(prefix='pretender-bench-')
+    config_path = os.path.join(workdir, 'mock_config.yaml')
+    with open(config_path, 'w', encoding='utf-8') as f:
+        f.write(_CONFIG)
+
+    upstream_port = _free_port()
+    ready = ctx.Event()
+    upstream = ctx.Process(target=_run_upstream, args=(upstream_port, ready), daemon=True)
+    upstream.start()
+    ready.wait(10)
+
+    paths = [
+        ('mock', f'http://{MOCK_HOST}/mock'),
+        ('forward', f'http://127.0.0.1:{upstream_port}/fwd'),
+    ]
+    results = []
+    try:
+        for loop in args.loops.split(','):
+            if loop == 'uvloop':
+                try:
+                    import uvloop  # noqa: F401
+                except ImportError:
+                    print('未安装 uvloop，跳过')
+                    continue
+            port = _free_port()
+            ready = ctx.Event()
+            proxy = ctx.Process(target=_run_proxy, daemon=True,
+                                args=(port, loop, config_path, os.path.join(workdir, 'certs'), ready))
+            proxy.start()
+            ready.wait(30)
+            try:
+                for name, url in paths:
+                    # 预热：建立上游连接、加载配置
+                    asyncio.run(_load(port, url, 4, 0.5))
+                    rps, p50, p99, errors = asyncio.run(
+                        _load(port, url, args.connections, args.duration))
+                    results.append((loop, name, rps, p50, p99, errors))
+                    print(f'{loop:8} {name:8} {rps:10.0f} req/s  p50 {p50:6.2f} ms  '
+                          f'p99 {p99:6.2f} ms  errors {errors}', flush=True)
+            finally:
+                proxy.terminate()
+                proxy.join()
+    finally:
+        upstream.terminate()
+        upstream.join()
+
+    baseline = {name: rps for loop, name, rps, *_ in results if loop == 'asyncio'}
+    if baseline and len(results) > len(baseline):
+        print('\n相对 asyncio 的吞吐变化:')
+        for loop, name, rps, *_ in results:
+            if loop != 'asyncio' and baseline.get(name):
+                print(f'  {loop:8} {name:8} {(rps / baseline[name] - 1) * 100:+.1f}%')
+
+
+if __name__ == '__main__':
+    main()
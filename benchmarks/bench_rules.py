@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+规则匹配基准：10 / 1k / 50k 条 Mock 规则下，对比各匹配引擎的构建耗时与单次匹配耗时
+
+用法:
+    python benchmarks/bench_rules.py [--sizes 10,1000,50000] [--engines linear,combined,re2]
+
+规则集模拟真实配置：多数规则绑定具体主机，另有少量跨主机（.*/health$）、
+大小写不敏感、带反向引用/前瞻（无法合并）的规则。
+"""
+
+import argparse
+import logging
+import os
+import random
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.core import rule_index  # noqa: E402
+from src.core.rule_index import RuleIndex  # noqa: E402
+
+
+def build_rules(n: int, seed: int = 0):
+    rnd = random.Random(seed)
+    hosts = [f'api{i}.example.com' for i in range(max(n // 200, 1))]
+    rules = []
+    for i in range(n):
+        host = re.escape(rnd.choice(hosts))
+        kind = rnd.random()
+        if kind < 0.80:
+            url = f'^https?://{host}/v{i % 7}/res{i}/[0-9]+$'
+        elif kind < 0.90:
+            url = f'^https://{host}/static/{i}/.*'
+        elif kind < 0.95:
+            url = f'.*/health{i}$'
+        elif kind < 0.98:
+            url = f'(?i)^https://{host}/CASE{i}$'
+        else:
+            url = f'^https://{host}/(a|b)/\\1/(?!admin)r{i}$'
+        rules.append({'url': url, 'method': rnd.choice(['GET', 'POST']),
+                      'response': {'code': 200, 'msg': {'ok': True}}})
+    return rules
+
+
+def build_urls(rules, count: int, seed: int = 1):
+    """一半命中（取自规则本身），一半未命中"""
+    rnd = random.Random(seed)
+    urls = []
+    for _ in range(count // 2):
+        rule = rnd.choice(rules)
+        url = rule['url']
+        host = re.search(r'api\d+\\\.example\\\.com', url)
+        host = host.group(0).replace('\\', '') if host else 'api0.example.com'
+        index = re.search(r'(\d+)(?:/\[0-9\]\+|/\.\*|\$)', url)
+        i = index.group(1) if index else '0'
+        if '/res' in url:
+            sample = f'https://{host}/v{int(i) % 7}/res{i}/42'
+        elif '/static/' in url:
+            sample = f'https://{host}/static/{i}/app.js'
+        elif 'health' in url:
+            sample = f'https://{host}/health{i}'
+        elif 'CASE' in url:
+            sample = f'https://{host}/case{i}'
+        else:
+            sample = f'https://{host}/a/a/r{i}'
+        urls.append((rule['method'], sample))
+    for _ in range(count - len(urls)):
+        urls.append((rnd.choice(['GET', 'POST']), f'https://api{rnd.randint(0, 999)}.example.com/missing'))
+    rnd.shuffle(urls)
+    return urls
+
+
+def bench(rules, urls, engine: str):
+    started = time.perf_counter()
+    index = RuleIndex(rules, engine=engine)
+    build = time.perf_counter() - started
+
+    started = time.perf_counter()
+    hits = 0
+    for method, url in urls:
+        if index.match(method, url) is not None:
+            hits += 1
+    per_match = (time.perf_counter() - started) / len(urls)
+    return build, per_match, hits
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='10,1000,50000', help='规则数，逗号分隔')
+    parser.add_argument('--engines', default='linear,combined,re2', help='对比的引擎，逗号分隔')
+    parser.add_argument('--urls', type=int, default=2000, help='每轮匹配的 URL 数')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    engines = args.engines.split(',')
+    if 're2' in engines and rule_index.re2 is None:
+        print('未安装 google-re2，跳过 re2 引擎')
+        engines.remove('re2')
+
+    print(f'{"规则数":>8} {"引擎":>9} {"构建(ms)":>10} {"单次匹配(us)":>14} {"命中":>6}')
+    for size in (int(s) for s in args.sizes.split(',')):
+        rules = build_rules(size)
+        urls = build_urls(rules, args.urls)
+        expected = None
+        for engine in engines:
+            build, per_match, hits = bench(rules, urls, engine)
+            if expected is None:
+                expected = hits
+            flag = '' if hits == expected else '  (命中数不一致!)'
+            print(f'{size:>8} {engine:>9} {build * 1000:>10.1f} {per_match * 1e6:>14.1f} {hits:>6}{flag}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+import json
+import re
+from urllib.parse import parse_qs
+
+from src.core.header_validator import HeaderValidator
+
+# 尚未解析 / JSON 解析失败的占位，区别于合法的 null
+_UNPARSED = object()
+_INVALID = object()
+# JSONPath 中的 [*] / .*
+_WILDCARD = object()
+
+# JSONPath 子集：$ 开头，.key、['key']、["key"]、[N]（可为负数）、[*]、.*
+_PATH_STEP = re.compile(r"""\.(?P<key>[^.\[\]]+)|\[(?P<index>-?\d+)\]|\[(?P<any>\*)\]"""
+                        r"""|\['(?P<single>(?:[^'\\]|\\.)*)'\]|\["(?P<double>(?:[^"\\]|\\.)*)"\]""")
+_ESCAPE = re.compile(r'\\(.)')
+
+
+class RequestBodyView:
+    """单个请求的请求体，JSON / 表单在第一次用到时解析并缓存，同一请求的多条候选规则共用
+
+    raw 为 None 表示请求体超过匹配上限（或读取失败），此时任何 body 约束都不匹配。
+    """
+
+    __slots__ = ('raw', '_json', '_form')
+
+    def __init__(self, raw):
+        self.raw = raw
+        self._json = _UNPARSED
+        self._form = None
+
+    @property
+    def json(self):
+        """解析后的 JSON，不是合法 JSON 时为 _INVALID"""
+        if self._json is _UNPARSED:
+            try:
+                self._json = json.loads(self.raw)
+            except (ValueError, TypeError):
+                self._json = _INVALID
+        return self._json
+
+    @property
+    def form(self) -> dict:
+        """application/x-www-form-urlencoded 字段 → [值]"""
+        if self._form is None:
+            self._form = parse_qs(self.raw.decode('utf-8', 'replace'), keep_blank_values=True)
+        return self._form
+
+
+def compile_json_path(path: str) -> tuple:
+    """把 JSONPath（子集）编译为步骤元组：键（str）、下标（int）或通配"""
+    path = str(path)
+    if not path.startswith('$'):
+        raise ValueError(f"JSONPath 应以 $ 开头: {path}")
+    steps = []
+    position = 1
+    while position < len(path):
+        if path.startswith('.*', position):
+            steps.append(_WILDCARD)
+            position += 2
+            continue
+        match = _PATH_STEP.match(path, position)
+        if match is None:
+            raise ValueError(f"无法解析的 JSONPath: {path}（位置 {position}）")
+        if match.group('index') is not None:
+            steps.append(int(match.group('index')))
+        elif match.group('any') is not None:
+            steps.append(_WILDCARD)
+        else:
+            key = match.group('key')
+            if key is None:
+                quoted = match.group('single')
+                key = _ESCAPE.sub(r'\1', quoted if quoted is not None else match.group('double'))
+            steps.append(key)
+        position = match.end()
+    return tuple(steps)
+
+
+def select_json(value, steps) -> list:
+    """按步骤取出 JSON 中的值；含通配时可能有多个，路径不存在时为空列表"""
+    values = [value]
+    for step in steps:
+        selected = []
+        for item in values:
+            if step is _WILDCARD:
+                if isinstance(item, list):
+                    selected.extend(item)
+                elif isinstance(item, dict):
+                    selected.extend(item.values())
+            elif type(step) is int:
+                if isinstance(item, list) and -len(item) <= step < len(item):
+                    selected.append(item[step])
+            elif isinstance(item, dict) and step in item:
+                selected.append(item[step])
+        if not selected:
+            return selected
+        values = selected
+    return values
+
+
+def json_equal(actual, expected) -> bool:
+    """JSON 值相等：true/false 不等于 1/0，整数与浮点数按数值比较"""
+    if isinstance(actual, bool) or isinstance(expected, bool):
+        return actual is expected
+    if isinstance(expected, dict):
+        return (isinstance(actual, dict) and actual.keys() == expected.keys()
+                and all(json_equal(actual[k], v) for k, v in expected.items()))
+    if isinstance(expected, list):
+        return (isinstance(actual, list) and len(actual) == len(expected)
+                and all(json_equal(a, e) for a, e in zip(actual, expected)))
+    return actual == expected
+
+
+class BodyMatcher:
+    """规则的请求体约束，加载配置时编译；各项都满足时规则才命中
+
+    配置写法:
+        body:
+          regex: '"vip":\\s*true'        # 对原始请求体（UTF-8 字节）re.search，无需解析
+          form:                          # 表单字段，写法同 headers（正则 / {equals: ...}）
+            action: login
+          json:                          # JSONPath → 期望值（按 JSON 值比较，$ 为整个请求体）
+            $.user.name: alice
+            $.items[*].sku: A-1          # 含通配时任一值相等即可
+    """
+
+    __slots__ = ('regex', 'form', 'json')
+
+    def __init__(self, spec: dict):
+        if not isinstance(spec, dict):
+            raise ValueError(f"body 约束应为映射: {spec}")
+        unknown = set(spec) - {'regex', 'form', 'json'}
+        if unknown:
+            raise ValueError(f"body 约束未知: {', '.join(sorted(unknown))}（可选: regex, form, json）")
+        regex = spec.get('regex')
+        self.regex = re.compile(str(regex).encode('utf-8')) if regex is not None else None
+        self.form = tuple(HeaderValidator(name, pattern)
+                          for name, pattern in (spec.get('form') or {}).items())
+        self.json = tuple((compile_json_path(path), expected)
+                          for path, expected in (spec.get('json') or {}).items())
+
+    def test(self, body: RequestBodyView) -> bool:
+        # 由易到难：字节正则不需要解析，JSON 解析放在最后
+        if body is None or body.raw is None:
+            return False
+        if self.regex is not None and self.regex.search(body.raw) is None:
+            return False
+        if self.form:
+            form = body.form
+            for validator in self.form:
+                if not any(validator.test(value) for value in form.get(validator.name) or ('',)):
+                    return False
+        if self.json:
+            data = body.json
+            if data is _INVALID:
+                return False
+            for steps, expected in self.json:
+                if not any(json_equal(value, expected) for value in select_json(data, steps)):
+                    return False
+        return True
+
+
+def compile_body_matcher(spec):
+    """编译规则的 body 约束，没有时返回 None；配置错误时抛出 re.error / ValueError"""
+    if not spec:
+        return None
+    return BodyMatcher(spec)
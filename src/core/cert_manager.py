@@ -2,6 +2,9 @@ import ipaddress
 import os
 import ssl
 import logging
+import tempfile
+import threading
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 
 from cryptography import x509
@@ -9,9 +12,43 @@ from cryptography.x509.oid import NameOID
 from cryptography.hazmat.primitives import hashes, serialization
 from cryptography.hazmat.primitives.asymmetric import rsa
 
+try:
+    import fcntl
+except ImportError:  # Windows 无 fcntl，退化为无锁（单进程模式不受影响）
+    fcntl = None
+
 logger = logging.getLogger('Pretender.Cert')
 
 
+@contextmanager
+def _file_lock(path):
+    """跨进程排他锁，多 worker 共享 certs/ 目录时避免重复签发"""
+    if fcntl is None:
+        yield
+        return
+    with open(path, 'a') as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _atomic_write(path, data):
+    """先写临时文件再 rename，其他进程不会读到写了一半的文件"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
 class CertManager:
     """CA 证书管理 + 域名证书动态签发/缓存"""
 
@@ -19,6 +56,8 @@ class CertManager:
         self.certs_dir = certs_dir
         self.domains_dir = os.path.join(certs_dir, 'domains')
         self._domain_cache = {}  # domain -> (cert_path, key_path)
+        # 签发可能在多个线程中进行（见 get_ssl_context 的调用方），进程内先串行化
+        self._issue_lock = threading.Lock()
         self._ca_key = None
         self._ca_cert = None
         self._ensure_ca()
@@ -32,15 +71,16 @@ class CertManager:
         ca_key_path = os.path.join(self.certs_dir, 'ca.key')
         ca_crt_path = os.path.join(self.certs_dir, 'ca.crt')
 
-        if os.path.exists(ca_key_path) and os.path.exists(ca_crt_path):
-            # 加载已有 CA
-            with open(ca_key_path, 'rb') as f:
-                self._ca_key = serialization.load_pem_private_key(f.read(), password=None)
-            with open(ca_crt_path, 'rb') as f:
-                self._ca_cert = x509.load_pem_x509_certificate(f.read())
-            logger.info(f"CA 证书已加载: {ca_crt_path}")
-        else:
-            self._generate_ca(ca_key_path, ca_crt_path)
+        with _file_lock(os.path.join(self.certs_dir, '.ca.lock')):
+            if os.path.exists(ca_key_path) and os.path.exists(ca_crt_path):
+                # 加载已有 CA
+                with open(ca_key_path, 'rb') as f:
+                    self._ca_key = serialization.load_pem_private_key(f.read(), password=None)
+                with open(ca_crt_path, 'rb') as f:
+                    self._ca_cert = x509.load_pem_x509_certificate(f.read())
+                logger.info(f"CA 证书已加载: {ca_crt_path}")
+            else:
+                self._generate_ca(ca_key_path, ca_crt_path)
 
     def _generate_ca(self, key_path, crt_path):
         """生成自签名 Root CA（2048-bit RSA，有效期 10 年）"""
@@ -73,15 +113,12 @@ class CertManager:
             .sign(self._ca_key, hashes.SHA256())
         )
 
-        with open(key_path, 'wb') as f:
-            f.write(self._ca_key.private_bytes(
-                serialization.Encoding.PEM,
-                serialization.PrivateFormat.TraditionalOpenSSL,
-                serialization.NoEncryption(),
-            ))
-
-        with open(crt_path, 'wb') as f:
-            f.write(self._ca_cert.public_bytes(serialization.Encoding.PEM))
+        _atomic_write(key_path, self._ca_key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.TraditionalOpenSSL,
+            serialization.NoEncryption(),
+        ))
+        _atomic_write(crt_path, self._ca_cert.public_bytes(serialization.Encoding.PEM))
 
         logger.info(f"CA 证书已生成: {crt_path}")
 
@@ -95,11 +132,25 @@ class CertManager:
         cert_path = os.path.join(self.domains_dir, f'{domain}.crt')
         key_path = os.path.join(self.domains_dir, f'{domain}.key')
 
+        # key 先于 cert 落盘，cert 存在即说明这一对已完整写入
         if os.path.exists(cert_path) and os.path.exists(key_path):
             self._domain_cache[domain] = (cert_path, key_path)
             return cert_path, key_path
 
-        # 动态生成
+        # 加锁后再次检查：其他线程或 worker 可能已经签发；所有域名共用一个锁文件
+        with self._issue_lock, _file_lock(os.path.join(self.domains_dir, '.lock')):
+            if not (os.path.exists(cert_path) and os.path.exists(key_path)):
+                self._generate_domain_cert(domain, cert_path, key_path)
+
+        self._domain_cache[domain] = (cert_path, key_path)
+        return cert_path, key_path
+
+    def is_cached(self, domain) -> bool:
+        """域名证书已在内存缓存中，获取时不会读盘或签发"""
+        return domain in self._domain_cache
+
+    def _generate_domain_cert(self, domain, cert_path, key_path):
+        """签发域名证书（有效期 1 年）"""
         key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
 
         subject = x509.Name([
@@ -125,23 +176,20 @@ class CertManager:
             .sign(self._ca_key, hashes.SHA256())
         )
 
-        with open(key_path, 'wb') as f:
-            f.write(key.private_bytes(
-                serialization.Encoding.PEM,
-                serialization.PrivateFormat.TraditionalOpenSSL,
-                serialization.NoEncryption(),
-            ))
-
-        with open(cert_path, 'wb') as f:
-            f.write(cert.public_bytes(serialization.Encoding.PEM))
+        _atomic_write(key_path, key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.TraditionalOpenSSL,
+            serialization.NoEncryption(),
+        ))
+        _atomic_write(cert_path, cert.public_bytes(serialization.Encoding.PEM))
 
         logger.info(f"域名证书已生成: {domain}")
-        self._domain_cache[domain] = (cert_path, key_path)
-        return cert_path, key_path
 
-    def get_ssl_context(self, domain):
-        """为域名创建 server-side SSLContext"""
+    def get_ssl_context(self, domain, http2=False):
+        """为域名创建 server-side SSLContext，http2=True 时通过 ALPN 优先协商 h2"""
         cert_path, key_path = self.get_cert_for_domain(domain)
         ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
         ctx.load_cert_chain(cert_path, key_path)
+        if http2:
+            ctx.set_alpn_protocols(['h2', 'http/1.1'])
         return ctx
@@ -0,0 +1,200 @@
+import logging
+import os
+import pickle
+import re
+import tempfile
+
+import yaml
+
+from src.core.config_watcher import directory_signatures, file_signature
+from src.core.rule_index import RuleError, compile_rule
+
+logger = logging.getLogger('Pretender.Config')
+
+# 已安装 libyaml 时使用其 C 实现（CSafeLoader），解析大配置比纯 Python 实现快数倍
+YamlLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+YamlDumper = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+
+# 配置目录下按主机拆分的子目录，文件名为主机名（如 hosts/api.example.com.yaml）
+HOSTS_DIR = 'hosts'
+
+# 编译快照：文件头行 "PRETENDER-COMPILED <格式版本>" + pickle({'files'})，格式变化时递增 COMPILED_FORMAT
+COMPILED_MAGIC = b'PRETENDER-COMPILED'
+COMPILED_FORMAT = 2
+_COMPILED_HEADER = b'%s %d\n' % (COMPILED_MAGIC, COMPILED_FORMAT)
+
+# 快照内容只有 SafeLoader 能产生的类型；pickle 操作码直接表示的 dict / list / tuple / set /
+# str / bytes / 数值之外，只允许 YAML 时间戳对应的 datetime 类型
+_SNAPSHOT_GLOBALS = frozenset((
+    ('datetime', 'date'),
+    ('datetime', 'datetime'),
+    ('datetime', 'timedelta'),
+    ('datetime', 'timezone'),
+))
+
+
+# ── YAML 配置文件 ────────────────────────────────────────
+
+def load_yaml(path: str):
+    with open(path, 'r', encoding='utf-8') as f:
+        return yaml.load(f, Loader=YamlLoader)
+
+
+def parse_config_file(path: str):
+    """读取单个 YAML 配置文件，失败时抛出异常"""
+    config = load_yaml(path)
+    if config is not None and not isinstance(config, dict):
+        raise ValueError(f"配置文件顶层应为映射，实际为 {type(config).__name__}")
+    return config
+
+
+def scan_config_files(config_path: str) -> dict:
+    """配置的全部源文件 → {名称: 签名}
+
+    单文件配置的名称为文件名；配置目录为相对路径（含 hosts/），按相对路径排序。
+    """
+    if not os.path.isdir(config_path):
+        signature = file_signature(config_path)
+        return {os.path.basename(config_path): signature} if signature is not None else {}
+    files = directory_signatures(config_path)
+    for name, signature in directory_signatures(os.path.join(config_path, HOSTS_DIR)).items():
+        files[f'{HOSTS_DIR}/{name}'] = signature
+    return dict(sorted(files.items()))
+
+
+def source_path(config_path: str, name: str) -> str:
+    return os.path.join(config_path, name) if os.path.isdir(config_path) else config_path
+
+
+# ── 编译快照 ─────────────────────────────────────────────
+
+def default_compiled_path(config_path: str) -> str:
+    """配置文件旁的 <文件名>.compiled，配置目录中的 .compiled（不会被当作 YAML 加载）"""
+    if os.path.isdir(config_path):
+        return os.path.join(config_path, '.compiled')
+    return config_path + '.compiled'
+
+
+class _SnapshotUnpickler(pickle.Unpickler):
+    """只能还原白名单中的类型，不会因快照文件被篡改而执行任意代码"""
+
+    def find_class(self, module, name):
+        if (module, name) not in _SNAPSHOT_GLOBALS:
+            raise pickle.UnpicklingError(f'快照中不允许的类型: {module}.{name}')
+        return super().find_class(module, name)
+
+
+def _source_key(signature):
+    # 只比较大小与修改时间：镜像构建、复制到容器后 inode 会变化
+    return signature[1:]
+
+
+class CompiledConfig:
+    """配置的编译快照：各源文件解析后的配置与已校验的规则条目
+
+    每个文件记录编译时的大小与修改时间，加载时只采用与当前源文件一致的部分，
+    修改过的文件照常解析 YAML。规则条目为 (序号, method, 字面量前缀)，
+    见 RuleIndex 的 entries 参数。
+    """
+
+    def __init__(self, path: str, files=None):
+        self.path = path
+        self.files = files or {}    # 名称 -> (源文件大小与修改时间, config, entries)
+
+    def __len__(self):
+        return len(self.files)
+
+    @classmethod
+    def load(cls, path: str):
+        """读取快照，文件不存在或不可用时返回 None
+
+        先校验文件头行（标识与格式版本），通过后才反序列化内容。
+        """
+        try:
+            with open(path, 'rb') as f:
+                header = f.readline(len(_COMPILED_HEADER) + 16)
+                if not header.startswith(COMPILED_MAGIC):
+                    raise ValueError('不是编译快照文件')
+                if header != _COMPILED_HEADER:
+                    logger.warning(f"⚠️  编译快照格式版本不符，忽略: {path}（请重新编译）")
+                    return None
+                data = _SnapshotUnpickler(f).load()
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"⚠️  编译快照不可用，忽略: {path} ({e})")
+            return None
+        files = data.get('files') if isinstance(data, dict) else None
+        if not isinstance(files, dict):
+            logger.warning(f"⚠️  编译快照内容无效，忽略: {path}")
+            return None
+        return cls(path, files)
+
+    def take(self, name: str, signature):
+        """取出与源文件当前签名一致的 (config, entries)，不一致时返回 None；取出后不再保留"""
+        entry = self.files.pop(name, None)
+        if entry is None or signature is None or entry[0] != _source_key(signature):
+            return None
+        return entry[1], entry[2]
+
+    def retain(self, names):
+        """只保留 names 中的条目（其余已使用或已过期）"""
+        names = set(names)
+        self.files = {name: entry for name, entry in self.files.items() if name in names}
+
+    def save(self):
+        """原子写入快照文件"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.compiled-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(_COMPILED_HEADER)
+                pickle.dump({'files': self.files}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+
+def compile_config(config_path: str, output: str = None):
+    """校验配置并生成编译快照，返回 (CompiledConfig, 错误列表)
+
+    有错误（YAML 格式、规则正则、缓存规则）时快照不完整，调用方不应写出。
+    """
+    compiled = CompiledConfig(output or default_compiled_path(config_path))
+    errors = []
+    files = scan_config_files(config_path)
+    if not files:
+        errors.append(f"没有找到配置文件: {config_path}")
+    for name, signature in files.items():
+        try:
+            config = parse_config_file(source_path(config_path, name)) or {}
+        except yaml.YAMLError as e:
+            errors.append(f"{name}: YAML格式错误: {e}")
+            continue
+        except Exception as e:
+            errors.append(f"{name}: 读取配置文件异常: {e}")
+            continue
+
+        entries = []
+        for index, rule in enumerate(config.get('mocks') or []):
+            try:
+                rule_compiled = compile_rule(index, rule)
+            except RuleError as e:
+                errors.append(f"{name}: 第 {index + 1} 条 Mock 规则无效: {e}")
+                continue
+            entries.append((index, rule_compiled.method, rule_compiled.prefix))
+        for rule in config.get('cache') or []:
+            if not isinstance(rule, dict) or not ('url' in rule or rule.get('host')):
+                errors.append(f"{name}: 缓存规则缺少 url 或 host: {rule}")
+                continue
+            try:
+                if 'url' in rule:
+                    re.compile(rule['url'])
+            except re.error as e:
+                errors.append(f"{name}: 缓存规则 URL 正则错误: {rule['url']} ({e})")
+        compiled.files[name] = (_source_key(signature), config, entries)
+    return compiled, errors
@@ -1,106 +1,567 @@
+import asyncio
 import yaml
+import fnmatch
 import os
 import re
+import threading
 import time
 import logging
 from datetime import datetime
+from urllib.parse import urlsplit
+
+from src.core.config_loader import (HOSTS_DIR, CompiledConfig, default_compiled_path,
+                                    parse_config_file, scan_config_files)
+from src.core.config_watcher import ConfigWatcher, file_signature
+from src.core.header_validator import HeaderRejection, compile_header_validators, validate_headers
+from src.core.rule_index import ChainedIndex, RuleIndex, literal_prefix
+from src.core.rule_stats import RuleStats
+from src.core.runtime_rules import RuntimeRules
+
+
+class ConfigShard:
+    """配置目录中单个文件的解析与编译结果，创建后不再修改"""
+
+    __slots__ = ('name', 'signature', 'config', 'rule_index', 'cache_rules')
+
+    def __init__(self, name: str, signature, config: dict, rule_index: RuleIndex, cache_rules):
+        self.name = name
+        self.signature = signature
+        self.config = config
+        self.rule_index = rule_index
+        self.cache_rules = cache_rules
+
+
+class ConfigSnapshot:
+    """一次加载得到的配置快照，创建后不再修改，重新加载时整体替换"""
+
+    __slots__ = ('config', 'rule_index', 'rule_prefixes', 'cache_rules', 'cache_scopes', 'pending_hosts')
+
+    def __init__(self, config: dict, rule_index, cache_rules=(), pending_hosts=None, rule_prefixes=None):
+        self.config = config
+        self.rule_index = rule_index
+        # 各规则 URL 的字面量前缀，按来源分层（运行时规则 / 配置文件），供 CONNECT 隧道判断
+        if rule_prefixes is None:
+            rule_prefixes = (rule_prefixes_of(rule_index),)
+        self.rule_prefixes = rule_prefixes
+        self.cache_rules = tuple(cache_rules)
+        # 缓存规则的 (URL 字面量前缀, 主机通配符)：缓存 HTTPS 响应同样需要解密，供 CONNECT 隧道判断
+        self.cache_scopes = tuple((literal_prefix(pattern.pattern) if pattern is not None else None, host)
+                                  for pattern, host, _ in self.cache_rules)
+        # 尚未加载的主机分片：主机名 -> 文件相对路径
+        self.pending_hosts = pending_hosts or {}
+
+
+def rule_prefixes_of(rule_index) -> tuple:
+    return tuple(compiled.prefix for compiled in rule_index.rules)
+
 
 class ConfigManager:
-    def __init__(self, config_path):
+    def __init__(self, config_path, rule_engine='auto', match_cache_size=4096,
+                 watch='auto', debounce=0.2, lazy_hosts=False, runtime_store=None,
+                 compiled_path=None):
+        # 单个 YAML 文件，或包含多个 YAML 文件的配置目录
         self.config_path = config_path
-        self._config_cache = None
-        self._config_mtime = None
+        self.directory = os.path.isdir(config_path)
+        # 规则匹配引擎：auto / linear / combined / re2（见 RuleIndex）
+        self.rule_engine = rule_engine
+        # (method, URL) → 匹配结果的 LRU 条目数，0 关闭
+        self.match_cache_size = match_cache_size
+        # 后台热更新：auto / inotify / poll / off（off 时在请求路径上按间隔检查文件）
+        self.watch = watch
+        self.debounce = debounce
+        # 配置目录模式下，hosts/ 中的文件在首次访问对应主机时才加载
+        self.lazy_hosts = lazy_hosts
+        # 编译快照（python app.py --compile 生成），首次加载时采用其中与源文件一致的部分
+        self.compiled_path = compiled_path or default_compiled_path(config_path)
+        self._compiled = None
+        self._snapshot = ConfigSnapshot({}, RuleIndex([]))
+        # 配置文件部分的最新结果：(config, rule_index, cache_rules, pending_hosts)
+        self._file_layer = ({}, RuleIndex([]), (), {})
+        self._file_prefixes = ()    # 配置文件规则的 URL 字面量前缀，随 _file_layer 更新
+        self._publish_lock = threading.RLock()
+        self._shards = {}       # 相对路径 -> ConfigShard（各文件最近一次成功解析的结果）
+        self._failed = {}       # 相对路径 -> 解析失败时的文件签名，未再修改前不重复解析
+        self._seen_hosts = set()
+        self._host_loads = {}   # 主机名 -> 进行中的分片加载（事件循环侧去重）
+        self._loaded = False
+        self._signature = None  # 最近一次尝试加载的文件签名（含加载失败的）
+        self._reload_lock = threading.RLock()
+        self._watcher = None
         self._last_check_time = 0
         self._check_interval = 1.0  # 最小检查间隔1秒，避免频繁文件系统调用
+        # 已被替换的索引上累计的匹配缓存命中 / 未命中 / 失效次数
+        self._memo_hits = 0
+        self._memo_misses = 0
+        self._memo_invalidations = 0
+        # 每条规则的命中 / 耗时统计与转发计数，重新加载后延续
+        self.stats = RuleStats()
         
         # 设置专用的logger
         self.logger = logging.getLogger('Pretender.Config')
-    
+
+        # 管理接口增删改的运行时规则，优先于配置文件规则
+        self.runtime = RuntimeRules(engine=rule_engine, store_path=runtime_store)
+        if runtime_store:
+            try:
+                self.runtime.load()
+            except (OSError, yaml.YAMLError, AttributeError) as e:
+                self.logger.error(f"❌ 加载运行时规则失败: {runtime_store} ({e})")
+
+    # ── 加载 / 热更新 ────────────────────────────────────
+
+    def _current(self):
+        """返回当前快照；未启用后台监视时按间隔在调用方线程检查文件"""
+        if self._watcher is None:
+            current_time = time.time()
+            if not self._loaded or current_time - self._last_check_time >= self._check_interval:
+                self._last_check_time = current_time
+                self.reload()
+        return self._snapshot
+
+    def _for_host(self, snapshot, url):
+        """URL 的主机有尚未加载的分片时先加载，返回可用于匹配该 URL 的快照"""
+        if snapshot.pending_hosts:
+            host = urlsplit(url).hostname
+            if host in snapshot.pending_hosts:
+                return self._load_host(host)
+        return snapshot
+
     def load_config_if_changed(self):
-        """加载配置文件，支持热更新，优化频繁检查"""
-        current_time = time.time()
-        
-        # 如果距离上次检查时间不足指定间隔，直接返回缓存
-        if (self._config_cache is not None and 
-            current_time - self._last_check_time < self._check_interval):
-            return self._config_cache
-        
-        try:
-            # 检查文件是否存在
-            if not os.path.exists(self.config_path):
-                self.logger.error(f"❌ 配置文件不存在: {self.config_path}")
-                return {}
-            
-            # 获取文件修改时间
-            mtime = os.path.getmtime(self.config_path)
-            mtime_str = datetime.fromtimestamp(mtime).strftime('%Y-%m-%d %H:%M:%S')
-            self._last_check_time = current_time
-            
-            # 检查是否需要重新加载
-            if self._config_cache is None:
-                # 首次加载
-                self.logger.info(f"📋 加载配置文件: {self.config_path} ({mtime_str})")
-                self._load_config_from_file()
-                self._config_mtime = mtime
-                
-            elif mtime != self._config_mtime:
-                # 修改时间发生变化，需要重新加载
-                self.logger.info(f"🔄 配置文件已修改，重新加载: {mtime_str}")
-                self._load_config_from_file()
-                self._config_mtime = mtime
-                
-        except Exception as e:
-            self.logger.error(f"💥 加载配置文件失败: {e}")
-            self._config_cache = {}
-            
-        return self._config_cache
-    
-    def _load_config_from_file(self):
-        """从文件加载配置"""
+        """返回当前配置；后台监视启用后不会触发任何文件系统调用"""
+        return self._current().config
+
+    def reload(self):
+        """文件有变化时重新解析并原子替换快照，返回是否替换
+
+        可在线程中调用（后台监视即如此），解析与编译期间请求继续使用旧快照；
+        文件缺失或解析失败时保留上一份可用配置。
+        """
+        with self._reload_lock:
+            if not self._loaded:
+                self._compiled = CompiledConfig.load(self.compiled_path)
+                if self._compiled is not None:
+                    self.logger.info(f"⚡ 使用编译快照: {self.compiled_path} ({len(self._compiled)} 个文件)")
+            try:
+                if self.directory:
+                    return self._reload_directory()
+                return self._reload_file()
+            finally:
+                self._release_compiled()
+
+    def _take_compiled(self, name, signature):
+        """编译快照中与该源文件一致的 (config, entries)，没有时返回 None"""
+        if self._compiled is None:
+            return None
+        compiled = self._compiled.take(name, signature)
+        if not len(self._compiled):
+            self._compiled = None
+        return compiled
+
+    def _release_compiled(self):
+        """首次加载后只保留尚未加载的主机分片对应的快照条目"""
+        if self._compiled is not None:
+            self._compiled.retain(self._snapshot.pending_hosts.values())
+            if not len(self._compiled):
+                self._compiled = None
+
+    def _reload_file(self):
+        signature = file_signature(self.config_path)
+        if self._loaded and signature == self._signature:
+            return False
+        first = not self._loaded
+        self._loaded = True
+        self._signature = signature
+        if signature is None:
+            self.logger.error(f"❌ 配置文件不存在: {self.config_path}")
+            return False
+
+        mtime_str = datetime.fromtimestamp(signature[2] / 1e9).strftime('%Y-%m-%d %H:%M:%S')
+        if first:
+            self.logger.info(f"📋 加载配置文件: {self.config_path} ({mtime_str})")
+        else:
+            self.logger.info(f"🔄 配置文件已修改，重新加载: {mtime_str}")
         try:
-            with open(self.config_path, 'r', encoding='utf-8') as f:
-                self._config_cache = yaml.safe_load(f)
-            
-            # 简单统计
-            if self._config_cache:
-                mock_count = len(self._config_cache.get('mocks', []))
-                self.logger.info(f"✅ 配置加载完成: {mock_count} 个Mock规则")
-            else:
-                self.logger.warning("⚠️  配置文件为空")
-                
+            layer = self._build_file_layer(signature)
         except yaml.YAMLError as e:
             self.logger.error(f"❌ YAML格式错误: {e}")
-            self._config_cache = {}
         except Exception as e:
             self.logger.error(f"💥 读取配置文件异常: {e}")
-            self._config_cache = {}
+        else:
+            self._publish(layer)
+            return True
+        if not first:
+            self.logger.warning("⚠️  继续使用上一份有效配置")
+        return False
+
+    def _build_file_layer(self, signature):
+        """读取并编译配置文件（编译快照与文件一致时直接采用），失败时抛出异常"""
+        entries = None
+        compiled = self._take_compiled(os.path.basename(self.config_path), signature)
+        if compiled is not None:
+            config, entries = compiled
+        else:
+            config = parse_config_file(self.config_path)
+
+        # 简单统计
+        if config:
+            mock_count = len(config.get('mocks') or [])
+            self.logger.info(f"✅ 配置加载完成: {mock_count} 个Mock规则")
+        else:
+            self.logger.warning("⚠️  配置文件为空")
+        config = config or {}
+
+        # 预编译规则索引
+        mocks = config.get('mocks') or []
+        index = RuleIndex(mocks, engine=self.rule_engine, entries=entries)
+        if mocks:
+            self.logger.info(f"🗂  规则索引 ({index.engine}): {len(index)} 条规则, "
+                             f"{index.host_buckets} 个主机桶, "
+                             f"{index.generic_rules} 条通用规则")
+        return config, index, self._compile_cache_rules(config.get('cache')), {}
+
+    # ── 配置目录 ─────────────────────────────────────────
+
+    def _scan_directory(self):
+        """配置目录（含 hosts/）中的 YAML 文件 → {相对路径: 签名}，按相对路径排序"""
+        return scan_config_files(self.config_path)
+
+    def _shard_host(self, name):
+        """延迟加载的主机分片返回其主机名，其余文件返回 None"""
+        if not self.lazy_hosts or not name.startswith(HOSTS_DIR + '/'):
+            return None
+        return os.path.splitext(name[len(HOSTS_DIR) + 1:])[0].lower()
+
+    def _load_shard(self, name, signature):
+        """解析并编译配置目录中的一个文件（编译快照与文件一致时直接采用），失败时返回 None"""
+        entries = None
+        compiled = self._take_compiled(name, signature)
+        if compiled is not None:
+            config, entries = compiled
+        else:
+            try:
+                config = parse_config_file(os.path.join(self.config_path, name)) or {}
+            except yaml.YAMLError as e:
+                self.logger.error(f"❌ {name}: YAML格式错误: {e}")
+                return None
+            except Exception as e:
+                self.logger.error(f"💥 {name}: 读取配置文件异常: {e}")
+                return None
+        mocks = config.get('mocks') or []
+        index = RuleIndex(mocks, engine=self.rule_engine, entries=entries)
+        self.logger.debug(f"📄 {name}: {len(index)} 个Mock规则")
+        return ConfigShard(name, signature, config, index, self._compile_cache_rules(config.get('cache')))
+
+    def _reload_directory(self, force=False):
+        """只重新解析有变化的文件，按相对路径顺序合并为新快照"""
+        files = self._scan_directory()
+        if self._loaded and files == self._signature and not force:
+            return False
+        first = not self._loaded
+        self._loaded = True
+        self._signature = files
+        if not files:
+            self.logger.error(f"❌ 配置目录中没有 YAML 文件: {self.config_path}")
+            return False
+
+        shards = {}
+        pending = {}
+        parsed = 0
+        for name, signature in files.items():
+            old = self._shards.get(name)
+            if old is not None and old.signature == signature:
+                shards[name] = old
+                continue
+            host = self._shard_host(name)
+            if host is not None and host not in self._seen_hosts:
+                pending[host] = name
+                continue
+            if self._failed.get(name) == signature:
+                shard = None
+            else:
+                shard = self._load_shard(name, signature)
+                if shard is None:
+                    self._failed[name] = signature
+                    if old is not None:
+                        self.logger.warning(f"⚠️  {name}: 继续使用上一份有效配置")
+                else:
+                    self._failed.pop(name, None)
+                    parsed += 1
+            shard = shard or old
+            if shard is not None:
+                shards[name] = shard
+
+        if not first and not parsed and shards.keys() == self._shards.keys() \
+                and pending == self._snapshot.pending_hosts:
+            return False
+        index = self._merge_shards(shards, pending)
+        self.logger.info(f"{'📋' if first else '🔄'} 配置目录 {self.config_path}: "
+                         f"解析 {parsed} 个文件, 共 {len(shards)} 个文件 {len(index)} 条规则"
+                         + (f", {len(pending)} 个主机分片待首次访问时加载" if pending else ''))
+        return True
+
+    def _merge_shards(self, shards, pending):
+        """按相对路径顺序合并各分片并发布新快照，返回合并后的索引"""
+        self._shards = shards
+        ordered = list(shards.values())
+        index = ChainedIndex([shard.rule_index for shard in ordered])
+        config = {
+            'mocks': [rule for shard in ordered for rule in shard.config.get('mocks') or []],
+            'cache': [rule for shard in ordered for rule in shard.config.get('cache') or []],
+        }
+        cache_rules = [rule for shard in ordered for rule in shard.cache_rules]
+        self._publish((config, index, cache_rules, pending))
+        return index
+
+    def _load_host(self, host):
+        """首次访问某主机时只解析其分片并并入当前快照，其余文件不重新扫描
+
+        异步代理经 ensure_host() 在线程中调用；同步调用方（线程版服务器）在自己的线程中调用。
+        """
+        with self._reload_lock:
+            pending = self._snapshot.pending_hosts
+            name = pending.get(host)
+            if host in self._seen_hosts or name is None:
+                return self._snapshot
+            self._seen_hosts.add(host)
+            self.logger.info(f"📥 首次访问 {host}，加载主机分片 {name}")
+            signature = self._signature.get(name)
+            shard = self._load_shard(name, signature)
+            if shard is None:
+                self._failed[name] = signature
+            shards = dict(self._shards)
+            if shard is not None:
+                shards[name] = shard
+                shards = {key: shards[key] for key in sorted(shards)}
+            self._merge_shards(shards, {h: n for h, n in pending.items() if h != host})
+            self._release_compiled()
+        return self._snapshot
+
+    async def ensure_host(self, url):
+        """URL 的主机有尚未加载的分片时在线程中加载，解析期间事件循环继续处理其他请求"""
+        pending = self._current().pending_hosts
+        if not pending:
+            return
+        host = urlsplit(url).hostname
+        if host not in pending:
+            return
+        task = self._host_loads.get(host)
+        if task is None:
+            task = self._host_loads[host] = asyncio.ensure_future(
+                asyncio.to_thread(self._load_host, host))
+            task.add_done_callback(lambda _: self._host_loads.pop(host, None))
+        await asyncio.shield(task)
+
+    def _publish(self, file_layer=None):
+        """用配置文件部分与运行时规则组合出新快照并原子替换
+
+        重新加载（可能在线程中）与管理接口的修改都经由此处，_publish_lock 保证两者
+        不会用过期的另一半覆盖对方的结果。配置文件部分的前缀与统计计数器只在其更新时
+        计算一次，管理接口的修改只重建运行时规则这一层，开销与配置文件规则数无关。
+        snapshot.config 只含配置文件部分，运行时规则见 self.runtime。
+        """
+        with self._publish_lock:
+            if file_layer is not None:
+                self._file_layer = file_layer
+                self._file_prefixes = rule_prefixes_of(file_layer[1])
+                self.stats.attach(file_layer[1].rules, layer='config')
+            config, index, cache_rules, pending = self._file_layer
+            prefixes = (self._file_prefixes,)
+            runtime = self.runtime.index
+            self.stats.attach(runtime.rules, layer='runtime')
+            if len(runtime):
+                index = ChainedIndex([runtime, index], memo_size=self.match_cache_size)
+                prefixes = (rule_prefixes_of(runtime),) + prefixes
+            else:
+                index = ChainedIndex([index], memo_size=self.match_cache_size)
+            self._swap(ConfigSnapshot(config, index, cache_rules, pending, prefixes))
+
+    def _swap(self, snapshot):
+        """替换快照；匹配结果缓存属于规则索引，随之一次性失效"""
+        old = self._snapshot.rule_index
+        self._memo_hits += old.memo_hits
+        self._memo_misses += old.memo_misses
+        if old.memo_hits or old.memo_misses:
+            self._memo_invalidations += 1
+        self._snapshot = snapshot
+
+    # ── 运行时规则（管理接口） ───────────────────────────
+
+    def list_rules(self):
+        """全部规则：运行时规则在前（可修改），其后为配置文件中的规则（只读）"""
+        rules = [{'id': rule_id, 'source': 'runtime', 'rule': rule}
+                 for rule_id, rule in self.runtime.list()]
+        rules.extend({'id': None, 'source': 'config', 'rule': rule}
+                     for rule in self._file_layer[0].get('mocks') or [])
+        return rules
+
+    def add_rule(self, rule, position=None):
+        """新增运行时规则并立即生效，返回 id；规则无效时抛出 ValueError"""
+        with self._publish_lock:
+            rule_id = self.runtime.add(rule, position)
+            self._publish()
+        self.logger.info(f"➕ 新增运行时规则 {rule_id}")
+        return rule_id
+
+    def replace_rule(self, rule_id, rule):
+        with self._publish_lock:
+            self.runtime.replace(rule_id, rule)
+            self._publish()
+        self.logger.info(f"✏️  替换运行时规则 {rule_id}")
+
+    def delete_rule(self, rule_id):
+        with self._publish_lock:
+            self.runtime.delete(rule_id)
+            self._publish()
+        self.logger.info(f"➖ 删除运行时规则 {rule_id}")
+
+    def move_rule(self, rule_id, position):
+        with self._publish_lock:
+            self.runtime.move(rule_id, position)
+            self._publish()
+        self.logger.info(f"↕️  运行时规则 {rule_id} 移动到第 {position} 位")
+
+    async def persist_rules(self):
+        """把运行时规则写回 runtime_store（在线程中写文件），未配置时不做任何事"""
+        if not self.runtime.store_path:
+            return False
+        rules, version = self.runtime.rules(), self.runtime.version
+        await asyncio.to_thread(self.runtime.save, rules, version)
+        return True
+
+    async def start_watching(self):
+        """在线程中完成首次加载并启动后台监视，此后请求路径不再检查文件"""
+        if self.watch == 'off':
+            return
+        paths = [self.config_path]
+        hosts_dir = os.path.join(self.config_path, HOSTS_DIR)
+        if self.directory and os.path.isdir(hosts_dir):
+            paths.append(hosts_dir)
+        # 先开始监视再加载，避免漏掉两者之间的修改
+        self._watcher = ConfigWatcher(paths, self.reload,
+                                      mode=self.watch, debounce=self.debounce)
+        await self._watcher.start()
+        await asyncio.to_thread(self.reload)
+        self.logger.info(f"👀 配置热更新: 后台{'inotify' if self._watcher.mode == 'inotify' else '轮询'}监视")
+
+    async def stop_watching(self):
+        if self._watcher is not None:
+            await self._watcher.stop()
+            self._watcher = None
+
+    def match_stats(self):
+        """匹配结果缓存的统计（含历次重新加载前的累计值）"""
+        index = self._snapshot.rule_index
+        hits = self._memo_hits + index.memo_hits
+        misses = self._memo_misses + index.memo_misses
+        return {
+            'entries': index.memo_entries,
+            'max_entries': index.memo_size,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+            'invalidations': self._memo_invalidations,
+        }
+
+    def _compile_cache_rules(self, rules):
+        """预编译转发响应缓存的启用规则（按 url 正则或 host 通配符）"""
+        compiled = []
+        for rule in rules or []:
+            try:
+                pattern = re.compile(rule['url']) if 'url' in rule else None
+            except re.error as e:
+                self.logger.error(f"❌ 缓存规则 URL 正则错误: {rule.get('url')} ({e})")
+                continue
+            host = rule.get('host')
+            if pattern is None and not host:
+                self.logger.warning(f"⚠️  缓存规则缺少 url 或 host，已忽略: {rule}")
+                continue
+            compiled.append((pattern, host.lower() if host else None, rule))
+        return compiled
     
     def match_headers(self, rule_headers, request_headers):
-        """匹配请求头"""
-        if not rule_headers:
+        """匹配请求头（未预编译的 headers 约束；规则匹配时使用加载阶段编译好的校验器）"""
+        rejection = validate_headers(compile_header_validators(rule_headers), request_headers)
+        if rejection is None:
             return True, None
-        
-        for header_name, header_pattern in rule_headers.items():
-            header_value = request_headers.get(header_name, '')
-            if not re.search(header_pattern, header_value):
-                error_msg = f"Header validation failed: {header_name}={header_value}, expected pattern: {header_pattern}"
-                return False, error_msg
-        return True, None
+        return False, rejection['message']
     
-    def match_mock(self, url, method, headers):
-        """匹配mock规则，包含header验证"""
-        config = self.load_config_if_changed()
-        for rule in config.get('mocks', []):
-            # URL和Method匹配
-            pattern = rule['url']
-            if not re.fullmatch(pattern, url) or rule['method'].upper() != method.upper():
+    def mock_candidates(self, url, method):
+        """URL 与 method 都匹配的候选规则（按 method+URL 缓存），见 RuleIndex.candidates"""
+        snapshot = self._for_host(self._current(), url)
+        if not len(snapshot.rule_index):
+            return ()
+        return snapshot.rule_index.candidates(method, url)
+
+    @staticmethod
+    def needs_body(candidates):
+        """候选规则中有 body 约束时需要先读取请求体；只有 URL 条件的规则不需要"""
+        return bool(candidates) and candidates[0].body is not None
+
+    def select_rule(self, candidates, headers, body=None):
+        """按顺序取第一条 body 约束满足的候选规则（CompiledRule），都不满足时返回 None
+
+        body 为 RequestBodyView（未读取时为 None，带 body 约束的规则视为不匹配）。
+        命中规则的 Header 约束不满足时返回带预序列化 401 body 的 HeaderRejection，
+        不再尝试后面的规则。命中与拒绝计入该规则的统计。
+        """
+        for compiled in candidates:
+            if compiled.body is not None and not compiled.body.test(body):
+                continue
+            # Header验证（加载时已编译，每次请求都重新校验）
+            if compiled.headers:
+                rejection = validate_headers(compiled.headers, headers)
+                if rejection is not None:
+                    compiled.stats.rejections += 1
+                    return rejection
+            stats = compiled.stats
+            stats.matches += 1
+            stats.last_match = time.time()
+            return compiled
+        return None
+
+    def select_mock(self, candidates, headers, body=None):
+        """同 select_rule，命中时返回规则的响应配置"""
+        selected = self.select_rule(candidates, headers, body)
+        if selected is None or isinstance(selected, HeaderRejection):
+            return selected
+        return selected.rule['response']
+
+    def match_mock(self, url, method, headers, body=None):
+        """匹配mock规则，包含body约束与header验证"""
+        return self.select_mock(self.mock_candidates(url, method), headers, body)
+
+    def cache_policy(self, url):
+        """返回 URL 命中的缓存规则（含可选 ttl），未启用缓存时返回 None"""
+        cache_rules = self._current().cache_rules
+        if not cache_rules:
+            return None
+        host = urlsplit(url).hostname or ''
+        for pattern, host_pattern, rule in cache_rules:
+            if pattern is not None and not pattern.fullmatch(url):
+                continue
+            if host_pattern is not None and not fnmatch.fnmatchcase(host, host_pattern):
+                continue
+            return rule
+        return None
+
+    def could_match_origin(self, origin, cache=True):
+        """判断是否存在可能匹配 origin（如 https://host:port）下任意 URL 的规则
+
+        cache 为 True（启用了响应缓存）时缓存规则也计算在内。
+        """
+        target = origin + '/'
+        snapshot = self._for_host(self._current(), target)
+        for layer in snapshot.rule_prefixes:
+            for prefix in layer:
+                if target.startswith(prefix) or prefix.startswith(target):
+                    return True
+        if not cache or not snapshot.cache_scopes:
+            return False
+        host = urlsplit(target).hostname or ''
+        for prefix, host_pattern in snapshot.cache_scopes:
+            if prefix is not None and not (target.startswith(prefix) or prefix.startswith(target)):
+                continue
+            if host_pattern is not None and not fnmatch.fnmatchcase(host, host_pattern):
                 continue
-            
-            # Header验证
-            if 'headers' in rule:
-                is_valid, error_msg = self.match_headers(rule['headers'], headers)
-                if not is_valid:
-                    return {"error": "header_validation_failed", "message": error_msg}
-            
-            return rule['response']
-        return None 
\ No newline at end of file
+            return True
+        return False
@@ -0,0 +1,271 @@
+import asyncio
+import ctypes
+import ctypes.util
+import logging
+import os
+import struct
+
+logger = logging.getLogger('Pretender.Config')
+
+# ── inotify（Linux，经 ctypes 调用 libc，无需额外依赖）────────
+
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+
+# 编辑器常见的保存方式：原地写入、写临时文件后 rename、删除后重建
+_WATCH_MASK = (_IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO
+               | _IN_CREATE | _IN_DELETE | _IN_DELETE_SELF | _IN_MOVE_SELF)
+_EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len
+
+try:
+    _libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+    _libc.inotify_init1.argtypes = [ctypes.c_int]
+    _libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+except (OSError, AttributeError, TypeError):
+    _libc = None
+
+
+def inotify_available() -> bool:
+    return _libc is not None
+
+
+class _Inotify:
+    """inotify 实例：监视若干目录，读出事件涉及的文件名"""
+
+    def __init__(self):
+        self.fd = _libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+
+    def add_watch(self, directory: str):
+        wd = _libc.inotify_add_watch(self.fd, os.fsencode(directory), _WATCH_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), directory)
+        return wd
+
+    def read_events(self):
+        """读出当前所有事件 → {(wd, 文件名)}（目录自身的事件文件名为空字符串）"""
+        events = set()
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return events
+            offset = 0
+            while offset + _EVENT_HEADER.size <= len(data):
+                wd, _, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b'\0')
+                offset += length
+                events.add((wd, os.fsdecode(name)))
+
+    def close(self):
+        os.close(self.fd)
+
+
+# ── 监视器 ───────────────────────────────────────────────
+
+def file_signature(path: str):
+    """文件的 (inode, 大小, 修改时间)；不存在时返回 None"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+def directory_signatures(directory: str, suffixes=('.yaml', '.yml')) -> dict:
+    """目录中指定后缀文件的 {文件名: 签名}，目录不存在时返回空字典"""
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return {}
+    signatures = {}
+    for name in names:
+        if name.endswith(suffixes) and not name.startswith('.'):
+            signature = file_signature(os.path.join(directory, name))
+            if signature is not None:
+                signatures[name] = signature
+    return signatures
+
+
+class ConfigWatcher:
+    """在后台监视配置路径，变化稳定后调用 reload（在线程中执行）
+
+    paths 可以是文件或目录（目录监视其中的 YAML 文件）。优先使用 inotify 监视所在目录，
+    不可用时按 poll_interval 轮询 stat。收到变化后等待 debounce 秒无新变化再加载，
+    合并编辑器保存时的连续写入。
+    """
+
+    def __init__(self, paths, reload, mode: str = 'auto',
+                 debounce: float = 0.2, poll_interval: float = 1.0,
+                 suffixes=('.yaml', '.yml')):
+        self.paths = [os.path.abspath(p) for p in paths]
+        self.reload = reload          # 同步函数，返回是否替换了配置
+        self.mode = mode
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.suffixes = tuple(suffixes)
+        self._task = None
+        self._inotify = None
+        self._watches = {}
+        self._files = {}
+        self._changed = None
+
+    def _signatures(self):
+        return [directory_signatures(p, self.suffixes) if os.path.isdir(p) else file_signature(p)
+                for p in self.paths]
+
+    async def start(self):
+        mode = self.mode
+        if mode in ('auto', 'inotify'):
+            if inotify_available():
+                try:
+                    self._start_inotify()
+                    mode = 'inotify'
+                except OSError as e:
+                    logger.warning(f"inotify 不可用，改为轮询: {e}")
+                    mode = 'poll'
+            else:
+                if mode == 'inotify':
+                    logger.warning("当前平台不支持 inotify，改为轮询")
+                mode = 'poll'
+        self.mode = mode
+        run = self._run_inotify if mode == 'inotify' else self._run_poll
+        self._task = asyncio.create_task(run(), name='pretender-config-watcher')
+        logger.debug(f"配置监视已启动 ({mode}): {', '.join(self.paths)}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._inotify is not None:
+            asyncio.get_running_loop().remove_reader(self._inotify.fd)
+            self._inotify.close()
+            self._inotify = None
+
+    # ── inotify ──────────────────────────────────────────
+
+    def _start_inotify(self):
+        # 监视的目录 → 关心的文件名（None 表示其中任意 YAML 文件）
+        targets = {}
+        files = []
+        for path in self.paths:
+            if os.path.isdir(path):
+                targets[path] = None
+            else:
+                files.append(path)
+                names = targets.setdefault(os.path.dirname(path), set())
+                if names is not None:
+                    names.add(os.path.basename(path))
+
+        inotify = _Inotify()
+        watches = {}  # wd -> 关心的文件名
+        try:
+            for directory in sorted(targets):
+                watches[inotify.add_watch(directory)] = targets[directory]
+        except OSError:
+            inotify.close()
+            raise
+        self._inotify = inotify
+        self._watches = watches
+        self._changed = asyncio.Event()
+        # 单个文件的签名（跟随符号链接）：所在目录有其它变化时据此判断文件是否被替换
+        self._files = {path: file_signature(path) for path in files}
+        self._watch_resolved()
+
+        def relevant(wd, name):
+            if wd not in watches:
+                return False
+            names = watches[wd]
+            if names is None:
+                return name == '' or (name.endswith(self.suffixes) and not name.startswith('.'))
+            return name in names
+
+        def on_readable():
+            events = self._inotify.read_events()
+            if any(relevant(wd, name) for wd, name in events):
+                self._changed.set()
+            # 文件名之外的变化：原子替换符号链接（如 Kubernetes ConfigMap 的 ..data）、
+            # 符号链接指向的文件在其它目录中被修改，都只能靠比较签名发现
+            if self._files and any(watches.get(wd) is not None for wd, _ in events):
+                if self._files_changed():
+                    self._changed.set()
+
+        asyncio.get_running_loop().add_reader(inotify.fd, on_readable)
+
+    def _files_changed(self) -> bool:
+        changed = False
+        for path, signature in self._files.items():
+            current = file_signature(path)
+            if current != signature:
+                self._files[path] = current
+                changed = True
+        return changed
+
+    def _watch_resolved(self):
+        """监视符号链接实际指向的文件所在目录；链接切换后指向新目录，每次加载后重新解析"""
+        for path in self._files:
+            real = os.path.realpath(path)
+            if real == path:
+                continue
+            try:
+                wd = self._inotify.add_watch(os.path.dirname(real))
+            except OSError:
+                continue
+            names = self._watches.setdefault(wd, set())
+            if names is not None:
+                names.add(os.path.basename(real))
+
+    async def _run_inotify(self):
+        while True:
+            await self._changed.wait()
+            # 去抖：debounce 秒内不再有事件才加载
+            while True:
+                self._changed.clear()
+                try:
+                    await asyncio.wait_for(self._changed.wait(), self.debounce)
+                except asyncio.TimeoutError:
+                    break
+            await self._reload()
+            self._watch_resolved()
+
+    # ── 轮询 ─────────────────────────────────────────────
+
+    async def _run_poll(self):
+        last = await asyncio.to_thread(self._signatures)
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            current = await asyncio.to_thread(self._signatures)
+            if current == last:
+                continue
+            # 去抖：两次 stat 间隔 debounce 秒结果一致，视为写入完成
+            while True:
+                await asyncio.sleep(self.debounce)
+                settled = await asyncio.to_thread(self._signatures)
+                if settled == current:
+                    break
+                current = settled
+            last = current
+            await self._reload()
+
+    async def _reload(self):
+        try:
+            await asyncio.to_thread(self.reload)
+        except Exception as e:  # reload 自身应处理解析错误，这里兜底保证监视不中断
+            logger.error(f"💥 重新加载配置失败: {e}")
@@ -1,13 +1,254 @@
 import json
 import random
 import re
+from functools import partial
+from json.encoder import encode_basestring
+from urllib.parse import parse_qs, urlsplit
 from faker import Faker
 from datetime import datetime, timedelta, date, time
 
+from src.core.faker_pool import FakerPools
+
+# $repeat 按查询参数取数量时的默认上限
+REPEAT_QUERY_MAX = 1000
+# 流式输出时 $repeat 每批生成的项数
+STREAM_BATCH = 256
+
+# 无参数时 faker / random 方法使用的默认参数
+_FAKER_DEFAULT_KWARGS = {
+    'random_number': {'digits': 8},
+    'text': {'max_nb_chars': 200},
+    'sentence': {'nb_words': 6},
+    'paragraph': {'nb_sentences': 3},
+}
+_RANDOM_DEFAULT_ARGS = {
+    'uniform': (0, 1000),
+    'randint': (1, 100),
+    'randrange': (0, 100),
+    'choice': (['option1', 'option2', 'option3'],),
+    'sample': (['a', 'b', 'c', 'd', 'e'], 3),
+    'gauss': (0, 1),
+    'expovariate': (1.0,),
+    'triangular': (0, 1, 0.5),
+}
+
+
+# 与 json.dumps(..., ensure_ascii=False) 输出一致；复用同一个编码器，避免每次构造
+_json_encode = json.JSONEncoder(ensure_ascii=False).encode
+
+
+def _error(name, e):
+    return f"{{{{ERROR: {name} - {str(e)}}}}}"
+
+
+def _guarded(var_name, method, *args):
+    """生成 str(method(*args)) 的无参函数，参数错误时返回错误占位文本"""
+    def call():
+        try:
+            return str(method(*args))
+        except (AttributeError, TypeError) as e:
+            return _error(var_name, e)
+    return call
+
+
+def _resolve(var_name, owner, method_name, *args):
+    # 方法不存在时结果固定，编译时直接得到错误文本
+    try:
+        method = getattr(owner, method_name)
+    except AttributeError as e:
+        return _error(var_name, e)
+    return _guarded(var_name, method, *args)
+
+
+class RenderPlan:
+    """编译后的响应模板
+
+    static 为 True 时模板不含占位符，value 即为结果；否则 render() 每次生成新数据。
+    不含占位符的子树与配置共享同一对象，生成的结果不可修改。
+
+    to_json() 返回与 json.dumps(render(), ensure_ascii=False) 相同的 UTF-8 字节：静态模板
+    编译时即序列化（body）；动态模板的静态片段预先编码，每次只编码动态的值再拼接。
+    两者的 url 参数为当前请求的 URL，供按查询参数决定数量的 $repeat 使用。
+
+    含 $repeat 的模板 streamable 为 True，可用 iter_json() 边生成边输出，不必在内存中
+    构造完整的结果。
+    """
+
+    __slots__ = ('static', 'value', 'render', 'body', 'to_json', 'parts', 'streamable')
+
+    def __init__(self, value, render=None, json_parts=None):
+        self.static = render is None
+        self.value = value
+        self.body = None
+        if self.static:
+            self.render = _constant(value)
+            try:
+                self.body = _json_encode(value).encode('utf-8')
+            except ValueError:
+                pass
+            except TypeError:
+                pass    # 含 JSON 无法表示的值（如 YAML 日期），保持每次序列化时报错
+        else:
+            self.render = render
+        self.parts = _merge_text(json_parts) if json_parts is not None and self.body is None else None
+        self.streamable = self.parts is not None and any(part.__class__ is RepeatJson for part in self.parts)
+        if self.body is not None:
+            self.to_json = _constant(self.body)
+        elif self.parts is not None:
+            self.to_json = partial(_join_json, self.parts)
+        else:
+            self.to_json = self._dump
+
+    def _dump(self, url=None):
+        return _json_encode(self.render(url)).encode('utf-8')
+
+    def iter_json(self, url=None):
+        """逐段生成 JSON 文本（str），拼接后与 to_json() 的结果一致；$repeat 每批生成 STREAM_BATCH 项"""
+        if self.parts is None:
+            yield self.to_json(url).decode('utf-8')
+            return
+        for part in self.parts:
+            if part.__class__ is str:
+                yield part
+            elif part.__class__ is RepeatJson:
+                yield from part.iter(url)
+            else:
+                yield part(url)
+
+
+def _constant(value):
+    return lambda url=None: value
+
+
+def _ignore_url(call):
+    # 占位符生成函数不依赖请求，包装为节点的 render(url) 形式
+    return lambda url=None: call()
+
+
+def _encoded(call):
+    # 占位符的结果总是字符串，直接用 JSONEncoder 对字符串使用的同一个编码函数
+    return lambda url=None: encode_basestring(call())
+
+
+def _merge_text(parts) -> tuple:
+    """合并相邻的字符串片段"""
+    merged = []
+    for part in parts:
+        if isinstance(part, str) and merged and isinstance(merged[-1], str):
+            merged[-1] += part
+        else:
+            merged.append(part)
+    return tuple(merged)
+
+
+def _join_json(parts, url=None):
+    # 字符串为预先编码的 JSON 文本，函数按请求生成 JSON 文本
+    return ''.join([part if part.__class__ is str else part(url) for part in parts]).encode('utf-8')
+
+
+class RepeatJson:
+    """$repeat 的 JSON 片段：调用时返回整个数组的 JSON 文本，iter() 按批生成供流式输出
+
+    静态项直接重复其编码结果；动态项按列批量生成：每个占位符连续生成 n 个值
+    （同一个函数在紧凑循环中调用，省去逐项遍历模板），再用预先拼好的格式串
+    一次格式化出每一项的 JSON 文本。
+    """
+
+    __slots__ = ('count', 'text', 'columns', 'row_format')
+
+    def __init__(self, count, text=None, columns=(), row_format=None):
+        self.count = count
+        self.text = text
+        self.columns = columns
+        self.row_format = row_format
+
+    def rows(self, url, n) -> list:
+        if self.text is not None:
+            return [self.text] * n
+        row_format = self.row_format
+        values = [[column(url) for _ in range(n)] for column in self.columns]
+        return [row_format % row for row in zip(*values)]
+
+    def __call__(self, url=None):
+        return '[' + ', '.join(self.rows(url, self.count(url))) + ']'
+
+    def iter(self, url=None):
+        remaining = self.count(url)
+        yield '['
+        separator = ''
+        while remaining > 0:
+            n = min(remaining, STREAM_BATCH)
+            remaining -= n
+            yield separator + ', '.join(self.rows(url, n))
+            separator = ', '
+        yield ']'
+
+
+def _json_key(key) -> str:
+    # 与 json.dumps 对键的处理一致（非字符串键转为字符串，不支持的类型抛出 TypeError）
+    return _json_encode({key: None})[1:-7]
+
+
+# ── $repeat 指令 ─────────────────────────────────────────
+
+def _repeat_count(template):
+    """解析 $repeat 的数量，返回固定的整数或 count(url) 函数
+
+    写法: 非负整数；[最小, 最大]（每次随机）；
+    {query: 查询参数名, default: 参数缺失或无效时的数量（整数或 [最小, 最大]）, max: 上限}
+    """
+    unknown = set(template) - {'$repeat', '$item'}
+    if unknown:
+        raise ValueError(f"未知的键: {', '.join(sorted(map(str, unknown)))}（可选: $repeat, $item）")
+    if '$item' not in template:
+        raise ValueError('缺少 $item')
+    spec = template['$repeat']
+    if not isinstance(spec, dict):
+        return _count_of(spec)
+
+    unknown = set(spec) - {'query', 'default', 'max'}
+    if unknown:
+        raise ValueError(f"未知的键: {', '.join(sorted(map(str, unknown)))}（可选: query, default, max）")
+    if not spec.get('query'):
+        raise ValueError('缺少 query')
+    name = str(spec['query'])
+    default = _count_of(spec.get('default', 10))
+    limit = _count_of(spec.get('max', REPEAT_QUERY_MAX))
+    if not isinstance(limit, int):
+        raise ValueError(f"max 应为非负整数: {spec['max']!r}")
+
+    def count(url=None):
+        n = None
+        if url and '?' in url:
+            values = parse_qs(urlsplit(url).query).get(name)
+            if values:
+                try:
+                    n = int(values[0])
+                except ValueError:
+                    pass
+        if n is None:
+            n = default if isinstance(default, int) else default()
+        return max(0, min(n, limit))
+    return count
+
+
+def _count_of(spec):
+    if isinstance(spec, int) and not isinstance(spec, bool) and spec >= 0:
+        return spec
+    if (isinstance(spec, list) and len(spec) == 2
+            and all(isinstance(n, int) and not isinstance(n, bool) for n in spec)
+            and 0 <= spec[0] <= spec[1]):
+        low, high = spec
+        return lambda url=None: random.randint(low, high)
+    raise ValueError(f"数量应为非负整数或 [最小, 最大]: {spec!r}")
+
+
 class DataGenerator:
-    def __init__(self):
+    def __init__(self, pool_size: int = 0, pool_low: int = None):
         self.faker = Faker(['zh_CN', 'en_US'])
         self.faker.seed_instance(42)  # 固定种子，保证可重现
+        # faker 值池（pool_size 为每个池的补充上限，0 为关闭），见 FakerPools
+        self.pools = FakerPools(self.faker.locales, pool_size, pool_low) if pool_size > 0 else None
         # 缓存编译后的正则表达式，避免重复编译
         self._template_pattern = re.compile(r'\{\{(\w+(?:\.\w+)*)(?::([^}]+))?\}\}')
         self._str_pattern = re.compile(r'"([^"]*)"')
@@ -15,205 +256,318 @@ class DataGenerator:
         self._bool_pattern = re.compile(r'\b(true|false)\b', re.IGNORECASE)
     
     def generate_data(self, template):
-        """根据模板生成数据"""
+        """根据模板生成数据（一次性使用；同一模板反复生成时先 compile 再 render）"""
+        value, render, _ = self._compile_node(template, False)
+        return value if render is None else render()
+
+    # ── 模板编译 ─────────────────────────────────────────
+
+    def compile(self, template):
+        """把模板编译为 RenderPlan：占位符解析为绑定好参数的函数，不含占位符的子树直接共享"""
+        return RenderPlan(*self._compile_node(template, True))
+
+    def _compile_node(self, template, encode):
+        """编译模板中的一个值，返回 (静态值, None, None) 或 (None, render(url), JSON 片段)
+
+        encode 为 True 时同时生成 JSON 片段（预先编码的文本与按请求生成 JSON 文本的函数），
+        无法预先编码（含 JSON 不支持的值）时片段为 None。
+        """
         if isinstance(template, str):
-            return self._process_template(template)
-        elif isinstance(template, dict):
-            return self._process_dict(template)
-        elif isinstance(template, list):
-            return self._process_list(template)
+            return self._compile_string(template)
+        if isinstance(template, dict):
+            if '$repeat' in template:
+                return self._compile_repeat(template, encode)
+            return self._compile_container(template, template.items(), dict, encode)
+        if isinstance(template, list):
+            return self._compile_container(template, enumerate(template), list, encode)
+        return template, None, None
+
+    def _compile_container(self, template, items, factory, encode):
+        # 渲染时复制静态部分（浅拷贝），只重新生成动态的键 / 下标
+        static = factory()
+        dynamic = []
+        changed = False
+        json_parts = ['{' if factory is dict else '['] if encode else None
+        for key, value in items:
+            render = parts = None
+            if isinstance(value, (str, dict, list)):
+                fixed, render, parts = self._compile_node(value, encode)
+                if render is not None:
+                    dynamic.append((key, render))
+                elif fixed is not value:
+                    changed = True
+                value = fixed
+            if factory is dict:
+                static[key] = value
+            else:
+                static.append(value)
+            if json_parts is not None:
+                json_parts = self._append_json(json_parts, factory is dict, key, value, render, parts)
+        if not dynamic:
+            return (static if changed else template), None, None
+        dynamic = tuple(dynamic)
+
+        def render(url=None):
+            result = static.copy()
+            for key, render_value in dynamic:
+                result[key] = render_value(url)
+            return result
+
+        if json_parts is not None:
+            json_parts.append('}' if factory is dict else ']')
+        return None, render, json_parts
+
+    @staticmethod
+    def _append_json(json_parts, is_dict, key, value, render, parts):
+        """追加容器中一项的 JSON 片段，无法预先编码时返回 None"""
+        if len(json_parts) > 1:
+            json_parts.append(', ')
+        try:
+            if is_dict:
+                json_parts.append(_json_key(key) + ': ')
+            if render is None:
+                json_parts.append(_json_encode(value))
+            elif parts is None:
+                return None
+            else:
+                json_parts.extend(parts)
+        except (TypeError, ValueError):
+            return None
+        return json_parts
+
+    def _compile_repeat(self, template, encode):
+        """$repeat 指令：按数量重复 $item 生成数组，写法错误时结果为错误文本"""
+        try:
+            count = _repeat_count(template)
+        except ValueError as e:
+            return _error('$repeat', e), None, None
+        value, item_render, item_parts = self._compile_node(template['$item'], encode)
+        if isinstance(count, int):
+            if item_render is None:
+                return [value] * count, None, None
+            count = _constant(count)
+
+        if item_render is None:
+            def render(url=None):
+                return [value] * count(url)
         else:
-            return template
-    
-    def _process_template(self, template):
-        """处理字符串模板"""
-        # 使用缓存的编译正则表达式
-        def replace_var(match):
-            var_name = match.group(1)
-            params_str = match.group(2) if match.group(2) else ""
-            
-            # 解析参数
-            params = []
-            if params_str:
-                # 处理字符串参数（用引号包围的）
-                str_params = self._str_pattern.findall(params_str)
-                
-                # 处理数字参数（使用更安全的方法排除字符串参数）
-                # 先标记字符串参数的位置，然后提取数字
-                marked_str = params_str
-                for str_param in str_params:
-                    # 使用占位符替换字符串参数，避免影响数字提取
-                    placeholder = f"__STR_{len(str_params)}__"
-                    marked_str = marked_str.replace(f'"{str_param}"', placeholder)
-                
-                num_params = self._num_pattern.findall(marked_str)
-                
-                # 处理布尔参数
-                bool_params = self._bool_pattern.findall(params_str)
-                
-                params = str_params + [float(x) if '.' in x else int(x) for x in num_params] + [x.lower() == 'true' for x in bool_params]
-            
-            if var_name.startswith('faker.'):
-                method_name = var_name[6:]  # 去掉 'faker.'
-                try:
-                    method = getattr(self.faker, method_name)
-                    if params:
-                        result = method(*params)
-                    else:
-                        # 使用默认参数
-                        result = self._get_faker_default(method, method_name)
-                    
-                    # 确保返回的是字符串，并处理Unicode编码
-                    if isinstance(result, str):
-                        return result
-                    else:
-                        return str(result)
-                except (AttributeError, TypeError) as e:
-                    return f"{{{{ERROR: {var_name} - {str(e)}}}}}"
-            elif var_name.startswith('random.'):
-                method_name = var_name[7:]  # 去掉 'random.'
-                try:
-                    method = getattr(random, method_name)
-                    if params:
-                        if method_name == 'choice':
-                            # choice需要列表参数
-                            return str(method(params))
-                        elif method_name == 'sample' and len(params) >= 2:
-                            return str(method(params[0], params[1]))
-                        else:
-                            return str(method(*params))
-                    else:
-                        # 使用默认参数
-                        return self._get_random_default(method, method_name)
-                except (AttributeError, TypeError) as e:
-                    return f"{{{{ERROR: {var_name} - {str(e)}}}}}"
-            elif var_name.startswith('datetime.'):
-                method_name = var_name[9:]  # 去掉 'datetime.'
+            def render(url=None):
+                return [item_render(url) for _ in range(count(url))]
+
+        if not encode:
+            return None, render, None
+        to_json = self._repeat_json(count, value, item_render, item_parts)
+        return None, render, [to_json] if to_json is not None else None
+
+    @staticmethod
+    def _repeat_json(count, value, item_render, item_parts):
+        """$repeat 的 JSON 片段（RepeatJson），无法预先编码时返回 None"""
+        if item_render is None:
+            try:
+                return RepeatJson(count, text=_json_encode(value))
+            except (TypeError, ValueError):
+                return None
+        if item_parts is None:
+            return None
+        parts = _merge_text(item_parts)
+        columns = tuple(part for part in parts if not isinstance(part, str))
+        row_format = ''.join(part.replace('%', '%%') if isinstance(part, str) else '%s' for part in parts)
+        return RepeatJson(count, columns=columns, row_format=row_format)
+
+    def _compile_string(self, template):
+        parts = []
+        position = 0
+        for match in self._template_pattern.finditer(template):
+            if match.start() > position:
+                parts.append(template[position:match.start()])
+            parts.append(self._compile_placeholder(match.group(1), match.group(2) or ''))
+            position = match.end()
+        if not parts:
+            return template, None, None
+        if position < len(template):
+            parts.append(template[position:])
+
+        # 合并相邻的静态片段（未知变量、方法不存在等结果固定的占位符也在其中）
+        parts = _merge_text(parts)
+        if len(parts) == 1:
+            if isinstance(parts[0], str):
+                return parts[0], None, None
+            return None, _ignore_url(parts[0]), [_encoded(parts[0])]
+
+        def join():
+            return ''.join([part if part.__class__ is str else part() for part in parts])
+        return None, _ignore_url(join), [_encoded(join)]
+
+    def _parse_params(self, params_str):
+        """解析占位符参数：字符串（引号包围）、数字、布尔，按类型分组依次排列"""
+        # 处理字符串参数（用引号包围的）
+        str_params = self._str_pattern.findall(params_str)
+
+        # 处理数字参数（使用更安全的方法排除字符串参数）
+        # 先标记字符串参数的位置，然后提取数字
+        marked_str = params_str
+        for str_param in str_params:
+            # 使用占位符替换字符串参数，避免影响数字提取
+            placeholder = f"__STR_{len(str_params)}__"
+            marked_str = marked_str.replace(f'"{str_param}"', placeholder)
+
+        num_params = self._num_pattern.findall(marked_str)
+
+        # 处理布尔参数
+        bool_params = self._bool_pattern.findall(params_str)
+
+        return str_params + [float(x) if '.' in x else int(x) for x in num_params] + [x.lower() == 'true' for x in bool_params]
+
+    def _compile_placeholder(self, var_name, params_str):
+        """编译单个 {{变量:参数}}，返回生成字符串的无参函数；结果固定（如未知变量）时直接返回字符串"""
+        params = self._parse_params(params_str) if params_str else []
+        source, dot, method_name = var_name.partition('.')
+        if not dot:
+            return f"{{{{UNKNOWN: {var_name}}}}}"
+
+        if source == 'faker':
+            return self._compile_faker(var_name, method_name, params)
+        elif source == 'random':
+            try:
+                method = getattr(random, method_name)
+            except AttributeError as e:
+                return _error(var_name, e)
+            if params:
+                if method_name == 'choice':
+                    # choice需要列表参数
+                    return _guarded(var_name, method, params)
+                elif method_name == 'sample' and len(params) >= 2:
+                    return _guarded(var_name, method, params[0], params[1])
+                return _guarded(var_name, method, *params)
+            # 使用默认参数
+            if method_name == 'shuffle':
+                return f"{{{{ERROR: {method_name} - 不适合在模板中使用}}}}"
+            args = _RANDOM_DEFAULT_ARGS.get(method_name, ())
+
+            def call():
                 try:
-                    if method_name in ['now', 'today', 'utcnow']:
-                        method = getattr(datetime, method_name)
+                    try:
+                        return str(method(*args))
+                    except Exception:
                         return str(method())
-                    elif method_name == 'date':
-                        # datetime.date 返回当前日期的日期部分
-                        return str(datetime.now().date())
-                    elif method_name == 'time':
-                        # datetime.time 返回当前时间的时间部分
-                        return str(datetime.now().time())
-                    elif method_name == 'strptime' and params:
-                        # strptime是类方法，需要特殊处理
-                        if len(params) >= 2:
-                            # strptime(date_string, format_string)
-                            return str(datetime.strptime(params[0], params[1]))
-                        else:
-                            return f"{{{{ERROR: {method_name} - 需要两个参数}}}}"
-                    elif params:
-                        method = getattr(datetime, method_name)
-                        if method_name == 'strftime':
-                            return str(method(*params))
-                        else:
-                            return str(method(*params))
-                    else:
-                        # 使用默认参数
-                        return self._get_datetime_default(method_name)
                 except (AttributeError, TypeError) as e:
-                    return f"{{{{ERROR: {var_name} - {str(e)}}}}}"
-            elif var_name.startswith('date.'):
-                method_name = var_name[5:]  # 去掉 'date.'
+                    return _error(var_name, e)
+            return call
+        elif source == 'datetime':
+            if method_name in ['now', 'today', 'utcnow']:
+                return _resolve(var_name, datetime, method_name)
+            elif method_name == 'date':
+                # datetime.date 返回当前日期的日期部分
+                return lambda: str(datetime.now().date())
+            elif method_name == 'time':
+                # datetime.time 返回当前时间的时间部分
+                return lambda: str(datetime.now().time())
+            elif method_name == 'strptime' and params:
+                # strptime是类方法，需要特殊处理
+                if len(params) >= 2:
+                    # strptime(date_string, format_string)
+                    return _guarded(var_name, datetime.strptime, params[0], params[1])
+                return f"{{{{ERROR: {method_name} - 需要两个参数}}}}"
+            elif params:
+                return _resolve(var_name, datetime, method_name, *params)
+            # 使用默认参数
+            return partial(self._get_datetime_default, method_name)
+        elif source == 'date':
+            if method_name == 'today':
+                return lambda: str(date.today())
+            elif method_name == 'strptime' and params:
+                if len(params) >= 2:
+                    return _resolve(var_name, date, 'strptime', params[0], params[1])
+                return f"{{{{ERROR: {method_name} - 需要两个参数}}}}"
+            elif params:
+                return _resolve(var_name, date, method_name, *params)
+            return partial(self._get_date_default, method_name)
+        elif source == 'time':
+            if method_name == 'now':
+                return _resolve(var_name, time, 'now')
+            elif method_name == 'strptime' and params:
+                if len(params) >= 2:
+                    return _resolve(var_name, time, 'strptime', params[0], params[1])
+                return f"{{{{ERROR: {method_name} - 需要两个参数}}}}"
+            elif params:
+                return _resolve(var_name, time, method_name, *params)
+            return partial(self._get_time_default, method_name)
+        return f"{{{{UNKNOWN: {var_name}}}}}"
+
+    def _compile_faker(self, var_name, method_name, params):
+        method = self._bind_faker(method_name)
+        faker = self.faker
+        kwargs = {} if params else _FAKER_DEFAULT_KWARGS.get(method_name, {})
+        if params:
+            def call():
                 try:
-                    if method_name == 'today':
-                        return str(date.today())
-                    elif method_name == 'strptime' and params:
-                        # strptime是类方法，需要特殊处理
-                        if len(params) >= 2:
-                            # strptime(date_string, format_string)
-                            return str(date.strptime(params[0], params[1]))
-                        else:
-                            return f"{{{{ERROR: {method_name} - 需要两个参数}}}}"
-                    elif params:
-                        method = getattr(date, method_name)
-                        if method_name == 'strftime':
-                            return str(method(*params))
-                        else:
-                            return str(method(*params))
-                    else:
-                        return self._get_date_default(method_name)
+                    result = method(*params) if method is not None else getattr(faker, method_name)(*params)
+                    # 确保返回的是字符串，并处理Unicode编码
+                    return result if isinstance(result, str) else str(result)
                 except (AttributeError, TypeError) as e:
-                    return f"{{{{ERROR: {var_name} - {str(e)}}}}}"
-            elif var_name.startswith('time.'):
-                method_name = var_name[5:]  # 去掉 'time.'
+                    return _error(var_name, e)
+        else:
+            # 使用默认参数
+            def call():
                 try:
-                    if method_name == 'now':
-                        return str(time.now())
-                    elif method_name == 'strptime' and params:
-                        # strptime是类方法，需要特殊处理
-                        if len(params) >= 2:
-                            # strptime(time_string, format_string)
-                            return str(time.strptime(params[0], params[1]))
-                        else:
-                            return f"{{{{ERROR: {method_name} - 需要两个参数}}}}"
-                    elif params:
-                        method = getattr(time, method_name)
-                        if method_name == 'strftime':
-                            return str(method(*params))
-                        else:
-                            return str(method(*params))
-                    else:
-                        return self._get_time_default(method_name)
+                    bound = method if method is not None else getattr(faker, method_name)
                 except (AttributeError, TypeError) as e:
-                    return f"{{{{ERROR: {var_name} - {str(e)}}}}}"
-            else:
-                return f"{{{{UNKNOWN: {var_name}}}}}"
-        
-        return self._template_pattern.sub(replace_var, template)
-    
-    def _get_faker_default(self, method, method_name):
-        """获取Faker方法的默认参数"""
-        try:
-            if method_name == 'random_number':
-                result = method(digits=8)
-            elif method_name == 'text':
-                result = method(max_nb_chars=200)
-            elif method_name == 'sentence':
-                result = method(nb_words=6)
-            elif method_name == 'paragraph':
-                result = method(nb_sentences=3)
-            else:
-                result = method()
-            
-            # 确保返回的是字符串，并正确处理Unicode
-            if isinstance(result, str):
-                return result
-            else:
-                return str(result)
-        except Exception as e:
-            return f"{{{{ERROR: {method_name} - {str(e)}}}}}"
-    
-    def _get_random_default(self, method, method_name):
-        """获取Random方法的默认参数"""
-        try:
-            if method_name == 'uniform':
-                return str(method(0, 1000))
-            elif method_name == 'randint':
-                return str(method(1, 100))
-            elif method_name == 'randrange':
-                return str(method(0, 100))
-            elif method_name == 'choice':
-                return str(method(['option1', 'option2', 'option3']))
-            elif method_name == 'sample':
-                return str(method(['a', 'b', 'c', 'd', 'e'], 3))
-            elif method_name == 'shuffle':
-                return f"{{{{ERROR: {method_name} - 不适合在模板中使用}}}}"
-            elif method_name == 'gauss':
-                return str(method(0, 1))
-            elif method_name == 'expovariate':
-                return str(method(1.0))
-            elif method_name == 'triangular':
-                return str(method(0, 1, 0.5))
-            else:
-                return str(method())
-        except:
-            return str(method())
-    
+                    return _error(var_name, e)
+                try:
+                    result = bound(**kwargs)
+                    return result if isinstance(result, str) else str(result)
+                except Exception as e:
+                    return _error(method_name, e)
+
+        # 代理自身的属性、不存在的方法不预生成
+        if self.pools is None or method is None:
+            return call
+        return self._pooled(call, method_name, params, kwargs)
+
+    def _pooled(self, call, method_name, params, kwargs):
+        """优先取值池中预生成的值，池空时同步生成"""
+        def produce(faker):
+            result = getattr(faker, method_name)(*params, **kwargs)
+            return result if isinstance(result, str) else str(result)
+
+        key = (method_name, tuple(params), tuple(sorted(kwargs.items())))
+        pool = self.pools.get(key, method_name, produce)
+        if pool is None:
+            return call
+        take = pool.take
+
+        def pooled():
+            value = take()
+            return value if value is not None else call()
+        return pooled
+
+    def close(self):
+        """停止值池的后台线程"""
+        if self.pools is not None:
+            self.pools.close()
+
+    def _bind_faker(self, method_name):
+        """编译时解析 faker 方法，无法在不改变结果的前提下预先绑定时返回 None（每次经由 Faker 代理）
+
+        多语言代理每次调用都按语言随机选择实现：只有一种语言提供该方法时直接绑定，
+        多种语言时绑定全部实现，调用时用与代理相同的随机源选择，消耗的随机数与原来一致。
+        """
+        faker = self.faker
+        # 代理自身的属性、特殊处理的名称仍交给代理，保持原有行为（含报错）
+        if (method_name == 'seed' or hasattr(type(faker), method_name) or method_name in vars(faker)
+                or method_name in faker.generator_attrs or faker.cache_pattern.match(method_name)):
+            return None
+        factories = [factory for factory in faker.factories if hasattr(factory, method_name)]
+        if not factories:
+            return None
+        if len(factories) == 1:
+            return getattr(factories[0], method_name)
+        if faker.weights:
+            return None
+        methods = [getattr(factory, method_name) for factory in factories]
+        first = faker.factories[0]
+        return lambda *args, **kwargs: first.random.choice(methods)(*args, **kwargs)
+
     def _get_datetime_default(self, method_name):
         """获取Datetime方法的默认参数"""
         try:
@@ -266,30 +620,6 @@ class DataGenerator:
         except Exception as e:
             return f"{{{{ERROR: {method_name} - {str(e)}}}}}"
     
-    def _process_dict(self, data):
-        """处理字典类型数据"""
-        result = {}
-        for key, value in data.items():
-            if isinstance(value, str) and ('{{' in value and '}}' in value):
-                result[key] = self._process_template(value)
-            elif isinstance(value, (dict, list)):
-                result[key] = self.generate_data(value)
-            else:
-                result[key] = value
-        return result
-    
-    def _process_list(self, data):
-        """处理列表类型数据"""
-        result = []
-        for item in data:
-            if isinstance(item, str) and ('{{' in item and '}}' in item):
-                result.append(self._process_template(item))
-            elif isinstance(item, (dict, list)):
-                result.append(self.generate_data(item))
-            else:
-                result.append(item)
-        return result
-    
     def generate_user_data(self):
         """生成用户数据示例"""
         return {
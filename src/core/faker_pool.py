@@ -0,0 +1,125 @@
+import logging
+import queue
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger('Pretender.Faker')
+
+# 值池数量上限：每个 (方法, 参数) 组合一个池，超出后的组合直接同步生成
+MAX_POOLS = 1000
+
+
+class ValuePool:
+    """单个 faker 方法 + 参数组合的预生成值
+
+    事件循环线程从左侧取值，后台线程在右侧补充；deque 的 popleft / append 是原子操作，无需加锁。
+    剩余数量低于 low 时请求补充，补充到 high 为止。
+    """
+
+    __slots__ = ('name', 'produce', 'values', 'low', 'high', 'pending', 'disabled',
+                 'hits', 'misses', '_refiller')
+
+    def __init__(self, name: str, produce, low: int, high: int, refiller):
+        self.name = name
+        self.produce = produce      # produce(faker) -> str，在后台线程中用其自己的 Faker 实例调用
+        self.values = deque()
+        self.low = low
+        self.high = high
+        self.pending = False
+        self.disabled = False
+        self.hits = 0
+        self.misses = 0
+        self._refiller = refiller
+
+    def take(self):
+        """取一个预生成的值，池已空时返回 None（调用方同步生成）"""
+        if self.disabled:
+            return None
+        values = self.values
+        try:
+            value = values.popleft()
+            self.hits += 1
+        except IndexError:
+            value = None
+            self.misses += 1
+        if len(values) < self.low and not self.pending:
+            self.pending = True
+            self._refiller.request(self)
+        return value
+
+
+class FakerPools:
+    """faker 值池：为模板中用到的 faker 方法在后台线程预生成数据
+
+    Faker 在 Python 中逐个生成较慢，一个含几十个 faker 字段的响应会直接拉长事件循环上
+    其他请求的延迟。开启后每个 (方法, 参数) 组合维护一个池，后台线程用独立的 Faker 实例
+    补充（不与事件循环线程共享随机状态）；池空时退回同步生成，结果与不开启时分布相同，
+    但不再受固定种子约束。
+    """
+
+    def __init__(self, locales, size: int, low: int = None):
+        self.locales = locales
+        self.high = size
+        self.low = max(1, size // 4) if low is None else min(low, size)
+        self._pools = {}        # (方法, 位置参数, 关键字参数) -> ValuePool
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def get(self, key, name: str, produce):
+        """取得（必要时创建）组合对应的池，数量已达上限时返回 None"""
+        pool = self._pools.get(key)
+        if pool is not None:
+            return pool
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                if len(self._pools) >= MAX_POOLS:
+                    return None
+                pool = self._pools[key] = ValuePool(name, produce, self.low, self.high, self)
+                # 线程在首次使用时启动：多 worker 模式下 fork 之前不会创建线程
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='pretender-faker-pool',
+                                                    daemon=True)
+                    self._thread.start()
+                pool.pending = True
+                self._queue.put(pool)
+        return pool
+
+    def request(self, pool: ValuePool):
+        self._queue.put(pool)
+
+    def _run(self):
+        from faker import Faker
+
+        faker = Faker(self.locales)
+        while True:
+            pool = self._queue.get()
+            if pool is None:
+                return
+            try:
+                values = pool.values
+                while len(values) < pool.high:
+                    values.append(pool.produce(faker))
+                    # 每生成一个值让出 GIL，事件循环线程不必等待整批生成完
+                    time.sleep(0)
+            except Exception as e:
+                # 生成出错（如参数不适用）的组合不再预生成，每次同步生成并得到原有的错误文本
+                pool.disabled = True
+                pool.values.clear()
+                logger.warning(f"⚠️  faker.{pool.name} 无法预生成，改为同步生成: {e}")
+            finally:
+                pool.pending = False
+
+    def stats(self) -> dict:
+        hits = sum(pool.hits for pool in list(self._pools.values()))
+        misses = sum(pool.misses for pool in list(self._pools.values()))
+        return {'pools': len(self._pools), 'hits': hits, 'misses': misses,
+                'hit_rate': hits / (hits + misses) if hits + misses else 0.0}
+
+    def close(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=1)
+            self._thread = None
@@ -0,0 +1,132 @@
+import json
+import re
+
+# 正则中会终止字面量提取的元字符
+_REGEX_META = set('.^$*+?{}[]()|')
+# 字面量之后可忽略的"任意后缀"写法
+_ANY_TAIL = ('', '.*', '.*$')
+
+# 同一校验器缓存的 401 响应数上限（按请求中的实际 header 值）
+_MAX_REJECTIONS = 64
+
+
+class HeaderRejection(dict):
+    """Header 校验失败的结果：内容与原先的错误 dict 相同，附带预先序列化的 401 body"""
+
+    __slots__ = ('body',)
+
+    def __init__(self, message: str):
+        super().__init__(error='header_validation_failed', message=message)
+        self.body = json.dumps(self, ensure_ascii=False).encode('utf-8')
+
+
+def _split_literal(pattern: str):
+    """拆出开头的字面量（已去除转义），返回 (literal, rest)"""
+    literal = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == '\\':
+            if i + 1 >= len(pattern) or pattern[i + 1].isalnum():
+                break  # \d \w \b 等字符类/断言
+            char, step = pattern[i + 1], 2
+        elif c in _REGEX_META:
+            break
+        else:
+            char, step = c, 1
+        if pattern[i + step:i + step + 1] in ('*', '+', '?', '{'):
+            break  # 该字符带量词，不再是字面量
+        literal.append(char)
+        i += step
+    return ''.join(literal), pattern[i:]
+
+
+def classify(pattern: str):
+    """把 re.search 语义的 header 正则归类为无需正则引擎的匹配方式
+
+    返回 (kind, literal)，kind 为 equals / prefix / suffix / contains；
+    无法归类时返回 ('regex', pattern)。
+    """
+    anchored = pattern.startswith('^')
+    literal, rest = _split_literal(pattern[1:] if anchored else pattern)
+    if rest == '$':
+        return ('equals' if anchored else 'suffix'), literal
+    if rest in _ANY_TAIL:
+        return ('prefix' if anchored else 'contains'), literal
+    return 'regex', pattern
+
+
+class HeaderValidator:
+    """单个 header 约束，加载配置时编译
+
+    配置写法:
+        Authorization: "^Bearer "          # 字符串：正则（re.search），字面量写法自动走快速路径
+        X-Env: {equals: prod}              # 显式字面量匹配：equals / prefix / suffix / contains / regex
+    """
+
+    __slots__ = ('name', 'key', 'kind', 'literal', 'regex', 'expected', '_rejections')
+
+    def __init__(self, name: str, spec):
+        self.name = name
+        self.key = name.lower()
+        if isinstance(spec, dict):
+            if len(spec) != 1:
+                raise ValueError(f"header {name} 的匹配方式只能指定一种: {spec}")
+            (kind, literal), = spec.items()
+            if kind not in ('equals', 'prefix', 'suffix', 'contains', 'regex'):
+                raise ValueError(f"header {name} 的匹配方式未知: {kind}")
+            literal = str(literal)
+            self.expected = f'{kind}:{literal}'
+        else:
+            literal = str(spec)
+            kind, literal = classify(literal)
+            self.expected = str(spec)
+        self.kind = kind
+        self.literal = literal
+        self.regex = re.compile(literal) if kind == 'regex' else None
+        self._rejections = {}
+
+    def test(self, value: str) -> bool:
+        kind = self.kind
+        if kind == 'equals':
+            return value == self.literal
+        if kind == 'prefix':
+            return value.startswith(self.literal)
+        if kind == 'contains':
+            return self.literal in value
+        if kind == 'suffix':
+            return value.endswith(self.literal)
+        return self.regex.search(value) is not None
+
+    def rejection(self, value: str) -> HeaderRejection:
+        """校验失败的结果，相同的 header 值复用同一份已序列化的 401 body"""
+        rejection = self._rejections.get(value)
+        if rejection is None:
+            if len(self._rejections) >= _MAX_REJECTIONS:
+                self._rejections.clear()
+            rejection = HeaderRejection(f"Header validation failed: {self.name}={value}, "
+                                        f"expected pattern: {self.expected}")
+            self._rejections[value] = rejection
+        return rejection
+
+
+def compile_header_validators(rule_headers) -> tuple:
+    """编译规则的 headers 约束，正则错误时抛出 re.error / ValueError"""
+    if not rule_headers:
+        return ()
+    return tuple(HeaderValidator(name, spec) for name, spec in rule_headers.items())
+
+
+def validate_headers(validators, request_headers):
+    """依次校验，全部通过返回 None，否则返回第一个失败的 HeaderRejection
+
+    request_headers 为 Headers / http.client.HTTPMessage 等大小写不敏感的容器；
+    普通 dict 会先按小写名称建一次索引。
+    """
+    if type(request_headers) is dict:
+        request_headers = {name.lower(): value for name, value in request_headers.items()}
+    for validator in validators:
+        value = request_headers.get(validator.key) or ''
+        if not validator.test(value):
+            return validator.rejection(value)
+    return None
@@ -0,0 +1,570 @@
+import logging
+import re
+from collections import OrderedDict
+
+from src.core.body_matcher import compile_body_matcher
+from src.core.header_validator import compile_header_validators
+
+try:
+    import re2  # google-re2，可选：RE2::Set 单次扫描匹配全部规则
+except ImportError:
+    re2 = None
+
+logger = logging.getLogger('Pretender.Config')
+
+# 规则数不足该值的桶直接逐条匹配，合并正则得不偿失
+_MERGE_THRESHOLD = 16
+# 每个合并正则包含的规则数上限，限制单个正则的编译耗时与内存
+_CHUNK_SIZE = 1000
+
+# 无法并入合并正则的写法：数字反向引用、命名分组、条件分组
+_UNMERGEABLE = re.compile(r'\\[1-9]|\\g<|\(\?P[<=]|\(\?\(')
+# 开头的全局内联标志，合并时需改写为局部标志 (?i:...)
+_GLOBAL_FLAGS = re.compile(r'^\(\?([aimsux]+)\)')
+# RE2 不支持（反向引用、环视、原子分组）或与 Python re 解析不一致（POSIX 字符类、{,n}）
+# 的写法，不放入 RE2::Set
+_RE2_UNSAFE = re.compile(r'\\[1-9]|\\g<|\(\?<?[=!]|\(\?>|\(\?\(|\[:|\{,')
+
+# 正则中会终止字面量前缀提取的元字符
+_REGEX_META = set('.^$*+?{}[]()|')
+
+
+def literal_prefix(pattern):
+    """提取 URL 正则的字面量前缀，任何匹配结果都必然以该前缀开头
+
+    例: ``^https://api\\.example\\.com/v[0-9]$`` → ``https://api.example.com/v``
+    无法确定时返回空字符串（可能匹配任意 URL）
+    """
+    # 顶层存在 | 分支时，前缀无法确定
+    depth = 0
+    in_class = False
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == '\\':
+            i += 2
+            continue
+        if in_class:
+            in_class = c != ']'
+        elif c == '[':
+            in_class = True
+        elif c == '(':
+            depth += 1
+        elif c == ')':
+            depth -= 1
+        elif c == '|' and depth == 0:
+            return ''
+        i += 1
+
+    i = 1 if pattern.startswith('^') else 0
+    prefix = []
+    while i < len(pattern):
+        c = pattern[i]
+        if c == '\\':
+            if i + 1 >= len(pattern) or pattern[i + 1].isalnum():
+                break  # \d \w \b 等字符类/断言
+            literal = pattern[i + 1]
+            step = 2
+        elif c in _REGEX_META:
+            break
+        else:
+            literal = c
+            step = 1
+        nxt = pattern[i + step] if i + step < len(pattern) else ''
+        if nxt in ('*', '?', '{'):
+            break  # 该字符可能出现 0 次
+        prefix.append(literal)
+        if nxt == '+':
+            break
+        i += step
+    return ''.join(prefix)
+
+
+def origin_of(prefix_or_url: str):
+    """取 scheme://host[:port] 部分；其后没有 '/' 时无法确定完整主机，返回 None"""
+    start = prefix_or_url.find('://')
+    if start < 0:
+        return None
+    end = prefix_or_url.find('/', start + 3)
+    if end < 0:
+        return None
+    return prefix_or_url[:end]
+
+
+class CompiledRule:
+    """预编译的 Mock 规则，index 为其在配置中的顺序，headers 为编译后的 header 约束，
+    body 为请求体约束（BodyMatcher，没有时为 None），stats 为 RuleStats 挂上的计数器，
+    plan 为服务端在规则首次命中时编译的响应（模板的 RenderPlan 与预先序列化的响应）
+
+    从编译快照加载的规则 regex 初始为 None，所在的桶首次匹配时才编译。
+    """
+
+    __slots__ = ('index', 'regex', 'method', 'prefix', 'rule', 'headers', 'body', 'stats', 'plan')
+
+    def __init__(self, index: int, regex, method: str, prefix: str, rule: dict, headers=(), body=None):
+        self.index = index
+        self.regex = regex
+        self.method = method
+        self.prefix = prefix
+        self.rule = rule
+        self.headers = headers
+        self.body = body
+        self.stats = None
+        self.plan = None
+
+    def __lt__(self, other):
+        return self.index < other.index
+
+    def with_index(self, index):
+        """换一个顺序键，复用已编译的正则、header 校验器与响应模板"""
+        compiled = CompiledRule(index, self.regex, self.method, self.prefix, self.rule,
+                                self.headers, self.body)
+        compiled.stats = self.stats
+        compiled.plan = self.plan
+        return compiled
+
+    @property
+    def bucket(self):
+        """所属的桶：(method, origin)，origin 为 None 表示通用列表"""
+        return self.method, origin_of(self.prefix)
+
+
+class RuleError(ValueError):
+    """单条 Mock 规则无效"""
+
+
+def _check_response(response, pattern):
+    """response 须为含 msg 的对象；code 为整数状态码，delay 为非负毫秒数（均可省略）"""
+    if not isinstance(response, dict) or 'msg' not in response:
+        raise RuleError(f'response 应为包含 msg 的对象: {pattern}')
+    code = response.get('code', 200)
+    if isinstance(code, bool) or not isinstance(code, int) or not 100 <= code <= 599:
+        raise RuleError(f'response.code 应为 100-599 的整数: {pattern} ({code!r})')
+    if 'delay' in response:
+        delay = response['delay']
+        if isinstance(delay, bool) or not isinstance(delay, (int, float)) or not 0 <= delay < float('inf'):
+            raise RuleError(f'response.delay 应为非负的毫秒数: {pattern} ({delay!r})')
+
+
+def compile_rule(index, rule: dict) -> CompiledRule:
+    """编译单条 Mock 规则，index 为顺序键（越小越优先）；规则无效时抛出 RuleError"""
+    try:
+        pattern = rule['url']
+        method = rule['method'].upper()
+        regex = re.compile(pattern)
+    except (KeyError, TypeError, AttributeError):
+        raise RuleError('缺少 url 或 method') from None
+    except re.error as e:
+        raise RuleError(f'URL 正则错误: {pattern} ({e})') from None
+    _check_response(rule.get('response'), pattern)
+    try:
+        headers = compile_header_validators(rule.get('headers'))
+    except (re.error, ValueError, AttributeError) as e:
+        raise RuleError(f'headers 配置错误: {pattern} ({e})') from None
+    try:
+        body = compile_body_matcher(rule.get('body'))
+    except (re.error, ValueError, TypeError, AttributeError) as e:
+        raise RuleError(f'body 配置错误: {pattern} ({e})') from None
+    return CompiledRule(index, regex, method, literal_prefix(pattern), rule, headers, body)
+
+
+def _mergeable_source(pattern: str):
+    """返回可放入合并正则的写法，无法合并时返回 None"""
+    if _UNMERGEABLE.search(pattern):
+        return None
+    flags = _GLOBAL_FLAGS.match(pattern)
+    if flags:
+        pattern = f'(?{flags.group(1)}:{pattern[flags.end():]})'
+    try:
+        re.compile(pattern)
+    except re.error:
+        return None
+    return pattern
+
+
+class LinearMatcher:
+    """逐条按顺序匹配"""
+
+    def __init__(self, rules):
+        self.rules = rules
+
+    def first(self, url: str, limit: int = None, after: int = None):
+        """返回第一条匹配的规则；limit 为上界，只考虑配置顺序在其之前的规则；
+        after 为下界，只考虑配置顺序在其之后的规则（取下一条候选时使用）"""
+        for compiled in self.rules:
+            if after is not None and compiled.index <= after:
+                continue
+            if limit is not None and compiled.index >= limit:
+                return None
+            if url.startswith(compiled.prefix) and compiled.regex.fullmatch(url):
+                return compiled
+        return None
+
+
+class CombinedMatcher:
+    """把多条规则合并为一个正则：``(?:p0)()|(?:p1)()|...``
+
+    Python re 按顺序尝试各分支，fullmatch 成功的第一个分支即配置中第一条匹配的规则，
+    由其末尾空分组的编号（lastindex）反查规则。无法合并的规则逐条匹配。
+    """
+
+    def __init__(self, rules):
+        self._chunks = []   # [(首条规则序号, 合并正则, {分组号: CompiledRule}, 块内规则)]
+        mergeable, fallback = [], []
+        for compiled in rules:
+            source = _mergeable_source(compiled.regex.pattern)
+            if source is None:
+                fallback.append(compiled)
+            else:
+                mergeable.append((compiled, source))
+
+        for start in range(0, len(mergeable), _CHUNK_SIZE):
+            chunk = mergeable[start:start + _CHUNK_SIZE]
+            groups = {}
+            parts = []
+            group = 0
+            for compiled, source in chunk:
+                group += compiled.regex.groups + 1
+                groups[group] = compiled
+                parts.append(f'(?:{source})()')
+            try:
+                regex = re.compile('|'.join(parts))
+            except (re.error, RecursionError, OverflowError) as e:
+                logger.warning(f"⚠️  合并正则编译失败，回退为逐条匹配: {e}")
+                fallback.extend(compiled for compiled, _ in chunk)
+                continue
+            self._chunks.append((chunk[0][0].index, regex, groups,
+                                 LinearMatcher([compiled for compiled, _ in chunk])))
+
+        fallback.sort()
+        self._fallback = LinearMatcher(fallback)
+        self.merged = len(rules) - len(fallback)
+
+    def first(self, url: str, limit: int = None, after: int = None):
+        best = None
+        for first_index, regex, groups, members in self._chunks:
+            if limit is not None and first_index >= limit:
+                break
+            if after is not None and first_index <= after:
+                # 合并正则总是给出块内第一条匹配，下界落在块内时逐条匹配块内其后的规则
+                if members.rules[-1].index <= after:
+                    continue
+                best = members.first(url, limit, after)
+                if best is not None:
+                    break
+                continue
+            match = regex.fullmatch(url)
+            if match is not None:
+                best = groups[match.lastindex]
+                if limit is not None and best.index >= limit:
+                    best = None
+                break
+        if best is not None:
+            limit = best.index
+        return self._fallback.first(url, limit, after) or best
+
+
+class RE2SetMatcher:
+    """RE2::Set 单次扫描得到所有匹配规则，取配置顺序最靠前的一条
+
+    RE2 与 Python re 在非 ASCII 文本上的 \\d、\\w、大小写折叠等语义不同：ASCII URL
+    走 RE2，且命中的规则会再用 Python re 确认；非 ASCII URL 交给 CombinedMatcher。
+    """
+
+    def __init__(self, rules):
+        options = re2.Options()
+        options.max_mem = 256 << 20
+        self._set = re2.Set.FullMatchSet(options)
+        self._members = []
+        rest = []
+        for compiled in rules:
+            pattern = compiled.regex.pattern
+            if _RE2_UNSAFE.search(pattern):
+                rest.append(compiled)
+                continue
+            try:
+                self._set.Add(pattern)
+            except re2.error:
+                rest.append(compiled)
+                continue
+            self._members.append(compiled)
+        self._set.Compile()
+        self._rest = CombinedMatcher(rest) if len(rest) >= _MERGE_THRESHOLD else LinearMatcher(rest)
+        self._rules = rules
+        self._python = None
+        self.merged = len(self._members)
+
+    def first(self, url: str, limit: int = None, after: int = None):
+        if not url.isascii():
+            if self._python is None:
+                self._python = CombinedMatcher(self._rules)
+            return self._python.first(url, limit, after)
+        best = None
+        ids = self._set.Match(url)
+        if ids:
+            for i in sorted(ids):
+                compiled = self._members[i]
+                if after is not None and compiled.index <= after:
+                    continue
+                if limit is not None and compiled.index >= limit:
+                    break
+                if compiled.regex.fullmatch(url):
+                    best = compiled
+                    break
+        if best is not None:
+            limit = best.index
+        return self._rest.first(url, limit, after) or best
+
+
+ENGINES = ('auto', 'linear', 'combined', 're2')
+
+
+def _make_matcher(rules, engine: str):
+    if engine == 'linear' or len(rules) < _MERGE_THRESHOLD:
+        return LinearMatcher(rules)
+    if engine == 're2':
+        try:
+            return RE2SetMatcher(rules)
+        except re2.error as e:
+            logger.warning(f"⚠️  RE2::Set 编译失败，改用合并正则: {e}")
+    return CombinedMatcher(rules)
+
+
+class _LazyMatcher:
+    """首次匹配时才编译桶内规则的正则并构建真正的匹配器（从编译快照加载的索引使用）
+
+    构建后把 first 替换为真正匹配器的方法，此后不再经过本层。多个线程同时首次匹配时
+    可能重复构建，结果相同，后写入的生效。
+    """
+
+    def __init__(self, members, engine: str):
+        self._members = members
+        self._engine = engine
+
+    def first(self, url: str, limit: int = None, after: int = None):
+        for compiled in self._members:
+            if compiled.regex is None:
+                compiled.regex = re.compile(compiled.rule['url'])
+        matcher = _make_matcher(self._members, self._engine)
+        self.first = matcher.first
+        return matcher.first(url, limit, after)
+
+
+class _MemoizedIndex:
+    """(method, URL) → 候选规则的有界 LRU（包括"没有匹配规则"），子类实现 _candidates
+
+    缓存属于索引对象本身，配置重新加载时随新索引整体替换，不会读到旧规则的结果。
+    """
+
+    def __init__(self, memo_size: int = 0):
+        self.memo_size = memo_size
+        self._memo = OrderedDict()  # (method, url) -> (CompiledRule, ...)，空元组表示没有匹配
+        self.memo_hits = 0
+        self.memo_misses = 0
+
+    @property
+    def memo_entries(self) -> int:
+        return len(self._memo)
+
+    def candidates(self, method: str, url: str) -> tuple:
+        """URL 与 method 都匹配的候选规则，按配置顺序
+
+        带 body 约束的规则是否命中取决于请求体，因此候选依次包含这些规则，直到第一条
+        没有 body 约束的规则为止；没有 body 约束的配置下至多一条。
+        """
+        if not self.memo_size:
+            return self._candidates(method, url)
+        key = (method, url)
+        found = self._memo.get(key)
+        if found is not None:
+            try:
+                self._memo.move_to_end(key)
+            except KeyError:
+                pass  # 线程模式下可能已被其它线程淘汰
+            self.memo_hits += 1
+            return found
+        self.memo_misses += 1
+        found = self._candidates(method, url)
+        self._memo[key] = found
+        if len(self._memo) > self.memo_size:
+            self._memo.popitem(last=False)
+        return found
+
+    def match(self, method: str, url: str):
+        """返回第一条 URL 与 method 都匹配的规则（CompiledRule，不考虑 body 约束），没有则返回 None"""
+        found = self.candidates(method, url)
+        return found[0] if found else None
+
+    def _candidates(self, method: str, url: str) -> tuple:
+        raise NotImplementedError
+
+
+class RuleIndex(_MemoizedIndex):
+    """按 method 与 scheme+host 分桶的规则索引
+
+    URL 正则的字面量前缀能确定完整主机的规则放入对应主机桶，其余规则放入该 method 的
+    通用列表。每个桶按 engine 构建匹配器（逐条 / 合并正则 / RE2::Set），匹配时取主机桶与
+    通用列表中配置顺序最靠前的命中，保持"第一条匹配的规则生效"的语义。
+
+    memo_size > 0 时以 (method, URL) 为键缓存匹配结果，见 _MemoizedIndex。
+    entries 为编译快照中已校验的 [(序号, method, 字面量前缀)]，给出时跳过逐条编译。
+    """
+
+    def __init__(self, rules, engine: str = 'auto', memo_size: int = 0, entries=None):
+        super().__init__(memo_size)
+        engine = (engine or 'auto').lower()
+        if engine not in ENGINES:
+            raise ValueError(f'未知的规则匹配引擎: {engine}（可选: {", ".join(ENGINES)}）')
+        if engine == 're2' and re2 is None:
+            logger.warning("未安装 google-re2，规则匹配改用合并正则")
+            engine = 'combined'
+        if engine == 'auto':
+            engine = 're2' if re2 is not None else 'combined'
+        self.engine = engine
+
+        self.rules = []
+        self._members = {}  # (method, origin 或 None) -> [CompiledRule]，按顺序键排序
+        self._by_host = {}  # method -> {origin: 匹配器}
+        self._generic = {}  # method -> 匹配器
+        # 从编译快照加载时各桶延迟构建：首次匹配到该桶才编译其中的正则
+        self._lazy = entries is not None
+
+        if entries is not None:
+            # 快照中已校验过的规则：(序号, method, 字面量前缀)，正则留待首次匹配时编译
+            for index, method, prefix in entries:
+                rule = rules[index]
+                compiled = CompiledRule(index, None, method, prefix, rule,
+                                        compile_header_validators(rule.get('headers')),
+                                        compile_body_matcher(rule.get('body')))
+                self.rules.append(compiled)
+                self._members.setdefault(compiled.bucket, []).append(compiled)
+        else:
+            for index, rule in enumerate(rules or []):
+                try:
+                    compiled = compile_rule(index, rule)
+                except RuleError as e:
+                    logger.error(f"❌ Mock 规则无效，已忽略: 第 {index + 1} 条 ({e})")
+                    continue
+                self.rules.append(compiled)
+                self._members.setdefault(compiled.bucket, []).append(compiled)
+
+        for bucket, members in self._members.items():
+            self._set_matcher(bucket, members)
+        self._count()
+
+    def _set_matcher(self, bucket, members):
+        method, origin = bucket
+        make = _LazyMatcher if self._lazy else _make_matcher
+        if origin is None:
+            if members:
+                self._generic[method] = make(members, self.engine)
+            else:
+                self._generic.pop(method, None)
+            return
+        buckets = self._by_host.setdefault(method, {})
+        if members:
+            buckets[origin] = make(members, self.engine)
+        else:
+            buckets.pop(origin, None)
+            if not buckets:
+                del self._by_host[method]
+
+    def _count(self):
+        self.host_buckets = sum(1 for _, origin in self._members if origin is not None)
+        self.generic_rules = sum(len(members) for (_, origin), members in self._members.items()
+                                 if origin is None)
+
+    def with_changes(self, removed=(), added=()):
+        """写时复制：返回移除 removed、加入 added（均为 CompiledRule）后的新索引
+
+        只重建受影响的桶，其余桶的匹配器与旧索引共享；旧索引保持不变，可继续服务
+        正在进行的匹配。新索引的匹配结果缓存为空。
+        """
+        new = object.__new__(RuleIndex)
+        _MemoizedIndex.__init__(new, self.memo_size)
+        new.engine = self.engine
+        new._lazy = self._lazy
+        dropped = {id(compiled) for compiled in removed}
+        touched = {compiled.bucket for compiled in removed}
+        touched.update(compiled.bucket for compiled in added)
+
+        new._members = dict(self._members)
+        new._by_host = {method: dict(buckets) for method, buckets in self._by_host.items()}
+        new._generic = dict(self._generic)
+        for bucket in touched:
+            members = [c for c in self._members.get(bucket, ()) if id(c) not in dropped]
+            members.extend(c for c in added if c.bucket == bucket)
+            members.sort()
+            if members:
+                new._members[bucket] = members
+            else:
+                new._members.pop(bucket, None)
+            new._set_matcher(bucket, members)
+        new.rules = sorted([c for c in self.rules if id(c) not in dropped] + list(added))
+        new._count()
+        return new
+
+    def __len__(self):
+        return len(self.rules)
+
+    def _candidates(self, method: str, url: str) -> tuple:
+        best = self._match(method, url)
+        if best is None:
+            return ()
+        if best.body is None:
+            return (best,)
+        found = [best]
+        while best.body is not None:
+            best = self._match(method, url, best.index)
+            if best is None:
+                break
+            found.append(best)
+        return tuple(found)
+
+    def _match(self, method: str, url: str, after=None):
+        """第一条匹配的规则；after 非空时只考虑顺序在其之后的规则"""
+        method = method.upper()
+        best = None
+        buckets = self._by_host.get(method)
+        if buckets:
+            end = url.find('/', url.find('://') + 3)
+            matcher = buckets.get(url if end < 0 else url[:end])
+            if matcher is not None:
+                best = matcher.first(url, None, after)
+        generic = self._generic.get(method)
+        if generic is not None:
+            best = generic.first(url, best.index if best is not None else None, after) or best
+        return best
+
+
+class ChainedIndex(_MemoizedIndex):
+    """按顺序串联多个 RuleIndex（如配置目录中的各个文件），第一个给出匹配的索引生效"""
+
+    def __init__(self, indexes, memo_size: int = 0):
+        super().__init__(memo_size)
+        self.indexes = tuple(indexes)
+        self._rules = None
+        self._len = sum(len(index) for index in self.indexes)
+        self.engine = self.indexes[0].engine if self.indexes else 'linear'
+        self.host_buckets = sum(index.host_buckets for index in self.indexes)
+        self.generic_rules = sum(index.generic_rules for index in self.indexes)
+
+    @property
+    def rules(self) -> list:
+        """串联后的全部规则，首次访问时才拼接（管理接口每次修改都会新建 ChainedIndex）"""
+        if self._rules is None:
+            self._rules = [compiled for index in self.indexes for compiled in index.rules]
+        return self._rules
+
+    def __len__(self):
+        return self._len
+
+    def _candidates(self, method: str, url: str) -> tuple:
+        found = ()
+        for index in self.indexes:
+            more = index._candidates(method, url)
+            if more:
+                found += more
+                if more[-1].body is None:
+                    break
+        return found
@@ -0,0 +1,149 @@
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+
+# 单独统计的转发目标数上限，超出后归入 OTHER_HOSTS，避免代理浏览流量时无限增长
+MAX_FORWARD_HOSTS = 10000
+OTHER_HOSTS = '(other)'
+
+
+class RuleCounters:
+    """单条规则的计数器
+
+    请求路径上直接累加整数，不加锁：asyncio 下每个 worker 只有事件循环线程写入；
+    Legacy 线程模式下并发累加偶尔会丢失计数，对统计用途可以接受。
+    """
+
+    __slots__ = ('key', 'matches', 'rejections', 'renders', 'render_ns', 'render_max_ns',
+                 'bytes', 'last_match')
+
+    def __init__(self, key: str):
+        self.key = key
+        self.reset()
+
+    def reset(self):
+        self.matches = 0         # 命中并返回 Mock 响应
+        self.rejections = 0      # 命中但 Header 校验失败（401）
+        self.renders = 0
+        self.render_ns = 0       # 模板生成 + 序列化耗时合计
+        self.render_max_ns = 0
+        self.bytes = 0           # 响应 body 字节数合计
+        self.last_match = 0.0
+
+    def record_render(self, elapsed_ns: int, size: int):
+        self.renders += 1
+        self.render_ns += elapsed_ns
+        if elapsed_ns > self.render_max_ns:
+            self.render_max_ns = elapsed_ns
+        self.bytes += size
+
+    def to_dict(self) -> dict:
+        return {
+            'rule': self.key,
+            'matches': self.matches,
+            'rejections': self.rejections,
+            'render_avg_ms': round(self.render_ns / self.renders / 1e6, 3) if self.renders else None,
+            'render_max_ms': round(self.render_max_ns / 1e6, 3) if self.renders else None,
+            'bytes': self.bytes,
+            'last_match': _isoformat(self.last_match) if self.last_match else None,
+        }
+
+
+def _isoformat(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp).isoformat(timespec='seconds')
+
+
+def rule_key(compiled) -> str:
+    """规则的统计键：配置了 id 时用 id，否则为 "METHOD url正则\""""
+    return str(compiled.rule.get('id') or f"{compiled.method} {compiled.rule['url']}")
+
+
+class RuleStats:
+    """每条规则的命中 / 拒绝 / 生成耗时 / 响应字节数，以及未命中规则、被转发的请求按主机计数
+
+    计数器挂在 CompiledRule.stats 上，请求路径只做属性累加。配置重新加载后按统计键
+    复用原有计数器，统计不会因热更新清零；从配置中删除的规则随之移除。
+    配置文件规则与运行时规则分层挂载，修改其中一层不会遍历另一层。
+    每个 worker 进程各自统计。
+    """
+
+    def __init__(self):
+        self._layers = {}       # 规则来源（config / runtime）-> {统计键: RuleCounters}
+        self.forwards = {}      # scheme://host[:port] -> 转发次数
+        self.started = time.time()
+
+    def attach(self, rules, layer: str = 'config'):
+        """给某一来源的当前全部规则（CompiledRule，按匹配顺序）挂上计数器，其它来源不受影响
+
+        同一统计键出现多次（如同一 URL 按 body 区分的多条规则）时依次追加 #2、#3。
+        """
+        previous = self._layers.get(layer, {})
+        counters = {}
+        for compiled in rules:
+            base = key = rule_key(compiled)
+            n = 1
+            while key in counters:
+                n += 1
+                key = f'{base} #{n}'
+            counter = previous.get(key)
+            if counter is None:
+                counter = RuleCounters(key)
+            counters[key] = counter
+            compiled.stats = counter
+        self._layers[layer] = counters
+
+    def _counters(self):
+        for counters in self._layers.values():
+            yield from counters.values()
+
+    def record_forward(self, url: str):
+        """记录一次未命中规则、转发给上游的请求；直连隧道以 origin 调用，每条隧道计一次"""
+        end = url.find('/', url.find('://') + 3)
+        host = url if end < 0 else url[:end]
+        forwards = self.forwards
+        count = forwards.get(host)
+        if count is None:
+            if len(forwards) >= MAX_FORWARD_HOSTS:
+                host = OTHER_HOSTS
+                count = forwards.get(host, 0)
+            else:
+                count = 0
+        forwards[host] = count + 1
+
+    def reset(self):
+        for counter in self._counters():
+            counter.reset()
+        self.forwards = {}
+        self.started = time.time()
+
+    def report(self) -> dict:
+        """统计快照：规则按命中次数从多到少，未被命中过的规则单独计数"""
+        rules = sorted((counter.to_dict() for counter in self._counters()),
+                       key=lambda item: (-item['matches'], -item['rejections']))
+        return {
+            'pid': os.getpid(),
+            'since': _isoformat(self.started),
+            'rules': rules,
+            'total_matches': sum(item['matches'] for item in rules),
+            'dead_rules': sum(1 for item in rules if not item['matches'] and not item['rejections']),
+            'forwarded': dict(sorted(self.forwards.items(), key=lambda item: -item[1])),
+        }
+
+    @staticmethod
+    def write(report: dict, path: str):
+        """把 report() 的结果原子写入 JSON 文件（可在线程中调用）"""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.stats-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
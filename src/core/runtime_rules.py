@@ -0,0 +1,183 @@
+import copy
+import logging
+import os
+import tempfile
+import threading
+
+import yaml
+
+from src.core.config_loader import YamlDumper, load_yaml
+from src.core.rule_index import RuleIndex, compile_rule
+
+logger = logging.getLogger('Pretender.Config')
+
+
+class RuleNotFound(KeyError):
+    """运行时规则 id 不存在"""
+
+
+class DuplicateRule(ValueError):
+    """运行时规则 id 已存在"""
+
+
+class RuntimeRules:
+    """通过管理接口增删改的运行时规则，整体位于配置文件规则之前（优先匹配）
+
+    每次修改都在当前索引上写时复制出新的 RuleIndex（只重建受影响的桶），由 ConfigManager
+    原子替换快照。规则的顺序由 CompiledRule.index 上的浮点顺序键表示，插入到两条规则
+    之间时取中点，无需给其它规则重新编号。
+
+    store_path 非空时从该 YAML 文件加载，并可通过 save() 写回（与主配置文件分开，
+    写回不会触发配置热更新）。
+    """
+
+    def __init__(self, engine: str = 'auto', store_path: str = None):
+        self.store_path = store_path
+        self.index = RuleIndex([], engine=engine)
+        self._entries = []          # [(id, CompiledRule)]，按顺序
+        self._next_id = 1
+        self._save_lock = threading.Lock()
+        self._version = 0           # 每次修改递增
+        self._saved_version = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    # ── 查询 ─────────────────────────────────────────────
+
+    def list(self):
+        """[(id, rule dict)]，按匹配顺序"""
+        return [(rule_id, compiled.rule) for rule_id, compiled in self._entries]
+
+    def rules(self):
+        return [compiled.rule for _, compiled in self._entries]
+
+    def _position_of(self, rule_id):
+        for position, (entry_id, _) in enumerate(self._entries):
+            if entry_id == rule_id:
+                return position
+        raise RuleNotFound(rule_id)
+
+    # ── 修改 ─────────────────────────────────────────────
+
+    def _new_id(self):
+        while True:
+            rule_id = f'rt-{self._next_id}'
+            self._next_id += 1
+            if all(entry_id != rule_id for entry_id, _ in self._entries):
+                return rule_id
+
+    def _prepare(self, rule, rule_id=None):
+        """复制并补全 id，返回 (id, rule)；规则本身由 compile_rule 校验"""
+        if not isinstance(rule, dict):
+            raise ValueError('规则应为 JSON 对象')
+        rule = copy.deepcopy(rule)
+        rule_id = str(rule.get('id') or rule_id or self._new_id())
+        rule['id'] = rule_id
+        return rule_id, rule
+
+    def _key_at(self, position: int):
+        """插入到 position 处的顺序键；相邻键之间已无可用浮点数时返回 None"""
+        if not self._entries:
+            return 0.0
+        if position <= 0:
+            return self._entries[0][1].index - 1.0
+        if position >= len(self._entries):
+            return self._entries[-1][1].index + 1.0
+        low = self._entries[position - 1][1].index
+        high = self._entries[position][1].index
+        middle = (low + high) / 2
+        return middle if low < middle < high else None
+
+    def _insert(self, position: int, rule_id, compiled_rule, removed=()):
+        """把已编译（顺序键待定）的规则放到 position，更新索引"""
+        position = max(0, min(position, len(self._entries)))
+        key = self._key_at(position)
+        if key is None:
+            # 顺序键精度耗尽：整体重新编号（极少发生）
+            self._entries.insert(position, (rule_id, compiled_rule))
+            self._entries = [(entry_id, compiled.with_index(float(i)))
+                             for i, (entry_id, compiled) in enumerate(self._entries)]
+            self.index = RuleIndex([], engine=self.index.engine).with_changes(
+                added=[compiled for _, compiled in self._entries])
+        else:
+            compiled = compiled_rule.with_index(key)
+            self._entries.insert(position, (rule_id, compiled))
+            self.index = self.index.with_changes(removed=removed, added=[compiled])
+        self._version += 1
+
+    def add(self, rule, position: int = None):
+        """新增规则（默认追加到运行时规则末尾），返回 id；规则无效时抛出 RuleError"""
+        rule_id, rule = self._prepare(rule)
+        if any(entry_id == rule_id for entry_id, _ in self._entries):
+            raise DuplicateRule(rule_id)
+        compiled = compile_rule(0.0, rule)
+        self._insert(len(self._entries) if position is None else position, rule_id, compiled)
+        return rule_id
+
+    def replace(self, rule_id, rule):
+        """原位替换规则内容"""
+        position = self._position_of(rule_id)
+        _, rule = self._prepare(rule, rule_id)
+        rule['id'] = rule_id
+        _, old = self._entries[position]
+        compiled = compile_rule(old.index, rule)
+        self._entries[position] = (rule_id, compiled)
+        self.index = self.index.with_changes(removed=[old], added=[compiled])
+        self._version += 1
+
+    def delete(self, rule_id):
+        position = self._position_of(rule_id)
+        _, old = self._entries.pop(position)
+        self.index = self.index.with_changes(removed=[old])
+        self._version += 1
+
+    def move(self, rule_id, position: int):
+        """把规则移动到 position（移动后的下标）"""
+        current = self._position_of(rule_id)
+        _, old = self._entries.pop(current)
+        self._insert(position, rule_id, old, removed=[old])
+
+    # ── 持久化 ───────────────────────────────────────────
+
+    def load(self):
+        """从 store_path 加载；文件不存在时为空"""
+        if not self.store_path or not os.path.exists(self.store_path):
+            return
+        data = load_yaml(self.store_path) or {}
+        for rule in data.get('mocks') or []:
+            try:
+                self.add(rule)
+            except ValueError as e:
+                logger.error(f"❌ 运行时规则无效，已忽略: {e}")
+        self._saved_version = self._version
+        logger.info(f"📌 已加载 {len(self)} 条运行时规则: {self.store_path}")
+
+    def save(self, rules=None, version=None):
+        """写回 store_path（原子替换）；可在线程中调用，较旧版本的写入会被跳过"""
+        if not self.store_path:
+            return
+        rules = self.rules() if rules is None else rules
+        version = self._version if version is None else version
+        with self._save_lock:
+            if version < self._saved_version:
+                return
+            directory = os.path.dirname(os.path.abspath(self.store_path))
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.admin-', suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    yaml.dump({'mocks': rules}, f, Dumper=YamlDumper,
+                              allow_unicode=True, sort_keys=False)
+                os.replace(tmp_path, self.store_path)
+            except BaseException:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+                raise
+            self._saved_version = version
+
+    @property
+    def version(self) -> int:
+        return self._version
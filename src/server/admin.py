@@ -0,0 +1,165 @@
+import asyncio
+import json
+import logging
+from urllib.parse import parse_qs, urlsplit
+
+from src.core.config_manager import ConfigManager
+from src.core.runtime_rules import DuplicateRule, RuleNotFound
+from src.server.http_body import BodyTooLarge, MalformedBody
+
+logger = logging.getLogger('Pretender.Admin')
+
+_JSON = 'application/json; charset=utf-8'
+
+
+class AdminError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class AdminAPI:
+    """运行时规则管理接口，挂在保留主机名上（经代理访问，或直连代理端口并带 Host 头）
+
+        GET    /rules                   列出规则（运行时规则 + 配置文件规则）
+        POST   /rules[?position=N]      新增运行时规则，body 为规则 JSON
+        PUT    /rules/{id}              替换运行时规则
+        DELETE /rules/{id}              删除运行时规则
+        POST   /rules/{id}/move         调整顺序，body: {"position": N}
+        GET    /stats                   每条规则的命中 / 拒绝 / 生成耗时 / 字节数，按主机的转发计数，
+                                        以及上游连接池的连接数与复用情况
+        DELETE /stats                   清零统计
+
+    修改立即生效；ConfigManager 配置了 runtime_store 时同时写回该文件。
+    rules=False 时（多 worker 模式，规则保存在各自进程中）规则只读；统计为处理该请求的 worker 的数据。
+    """
+
+    def __init__(self, config_manager: ConfigManager, host: str = 'pretender.admin', rules: bool = True,
+                 upstream=None):
+        self.config_manager = config_manager
+        self.upstream = upstream
+        self.host = host.lower()
+        self.rules = rules
+        # 绝对形式请求 URL 的前缀（经代理访问），用于快速判断
+        self._prefixes = tuple(f'{scheme}://{self.host}{end}'
+                               for scheme in ('http', 'https') for end in ('/', ':'))
+
+    def handles(self, url: str, headers) -> bool:
+        if url.startswith('/'):
+            # 直连代理端口的 origin-form 请求，按 Host 头判断
+            host = (headers.get('host') or '').rsplit(':', 1)[0].lower()
+            return host == self.host
+        return url[:len(self.host) + 9].lower().startswith(self._prefixes)
+
+    async def handle(self, responder, method: str, url: str, headers, body):
+        parts = urlsplit(url)
+        try:
+            status, payload = await self._dispatch(method, parts.path.rstrip('/') or '/',
+                                                   parse_qs(parts.query), body)
+        except AdminError as e:
+            status, payload = e.status, {'error': e.message}
+        data = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+        await responder.send(status, {'Content-Type': _JSON}, data)
+
+    # ── 路由 ─────────────────────────────────────────────
+
+    async def _dispatch(self, method, path, query, body):
+        segments = [s for s in path.split('/') if s]
+        if segments == ['stats']:
+            return self._stats(method)
+        if not segments or segments[0] != 'rules':
+            raise AdminError(404, f'未知的管理接口: {path}')
+
+        manager = self.config_manager
+        if len(segments) == 1 and method == 'GET':
+            return 200, {'rules': manager.list_rules()}
+        if not self.rules:
+            raise AdminError(403, '多 worker 模式下运行时规则不可修改')
+        if len(segments) == 1:
+            if method == 'POST':
+                rule = await self._read_json(body)
+                position = self._int(query.get('position', [None])[0], 'position')
+                rule_id = self._apply(manager.add_rule, rule, position)
+                await self._persist()
+                return 201, {'id': rule_id}
+            raise AdminError(405, f'不支持的方法: {method}')
+
+        rule_id = segments[1]
+        if len(segments) == 2:
+            if method == 'PUT':
+                rule = await self._read_json(body)
+                self._apply(manager.replace_rule, rule_id, rule)
+            elif method == 'DELETE':
+                self._apply(manager.delete_rule, rule_id)
+            else:
+                raise AdminError(405, f'不支持的方法: {method}')
+            await self._persist()
+            return 200, {'id': rule_id}
+
+        if len(segments) == 3 and segments[2] == 'move' and method == 'POST':
+            data = await self._read_json(body)
+            position = self._int(data.get('position') if isinstance(data, dict) else None, 'position')
+            if position is None:
+                raise AdminError(400, '缺少 position')
+            self._apply(manager.move_rule, rule_id, position)
+            await self._persist()
+            return 200, {'id': rule_id, 'position': position}
+
+        raise AdminError(404, f'未知的管理接口: {path}')
+
+    def _stats(self, method):
+        stats = self.config_manager.stats
+        if method == 'GET':
+            report = stats.report()
+            if self.upstream is not None:
+                report['upstream'] = self.upstream.stats()
+            return 200, report
+        if method == 'DELETE':
+            stats.reset()
+            return 200, {'reset': True}
+        raise AdminError(405, f'不支持的方法: {method}')
+
+    # ── 辅助 ─────────────────────────────────────────────
+
+    @staticmethod
+    def _apply(operation, *args):
+        try:
+            return operation(*args)
+        except RuleNotFound as e:
+            raise AdminError(404, f'规则不存在: {e.args[0]}') from None
+        except DuplicateRule as e:
+            raise AdminError(409, f'规则 id 已存在: {e.args[0]}') from None
+        except ValueError as e:
+            raise AdminError(400, f'规则无效: {e}') from None
+
+    @staticmethod
+    async def _read_json(body):
+        if body.too_large:
+            raise AdminError(413, '请求体过大')
+        try:
+            data = await body.read()
+        except BodyTooLarge:
+            # chunked 请求体事先不知道长度，读取时才会超限
+            raise AdminError(413, '请求体过大') from None
+        except (MalformedBody, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+            raise AdminError(400, f'请求体读取失败: {e}') from None
+        try:
+            return json.loads(data or b'null')
+        except (ValueError, UnicodeDecodeError) as e:
+            raise AdminError(400, f'请求体不是合法的 JSON: {e}') from None
+
+    @staticmethod
+    def _int(value, name):
+        if value is None:
+            return None
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            raise AdminError(400, f'{name} 应为整数') from None
+
+    async def _persist(self):
+        try:
+            await self.config_manager.persist_rules()
+        except OSError as e:
+            logger.error(f"运行时规则写回失败: {e}")
@@ -1,13 +1,28 @@
 import asyncio
 import json
 import logging
+import os
+import socket
 import ssl
+import time
 
 import httpx
 
+from src.core.body_matcher import RequestBodyView
 from src.core.config_manager import ConfigManager
 from src.core.cert_manager import CertManager
 from src.core.data_generator import DataGenerator
+from src.core.header_validator import HeaderRejection
+from src.server import tunnel
+from src.server.admin import AdminAPI
+from src.server.h2_server import H2_AVAILABLE, H2Session
+from src.server.http_body import BodyTooLarge, MalformedBody, RequestBody
+from src.server.http_parser import HeadParseError, Headers, create_head_parser
+from src.server.responder import Http1Responder, PreparedResponse
+from src.server.response_cache import (
+    CacheEntry, ResponseCache, freshness_lifetime, is_storable, vary_values, wants_revalidation,
+)
+from src.server.upstream import UpstreamPool
 
 logger = logging.getLogger('Pretender.Proxy')
 
@@ -17,6 +32,47 @@ _NOISE_PATTERNS = (
     'healthcheck', 'status', '.well-known',
 )
 
+# 不转发给上游的请求头
+_SKIP_REQUEST_HEADERS = frozenset((
+    'host', 'connection', 'proxy-connection', 'transfer-encoding',
+))
+
+# 经缓存转发时由代理自行生成的条件请求头
+_CONDITIONAL_HEADERS = frozenset((
+    'if-none-match', 'if-modified-since', 'if-match', 'if-unmodified-since', 'if-range',
+))
+
+# 不转发给客户端的 hop-by-hop 响应头
+_HOP_BY_HOP = frozenset((
+    'connection', 'keep-alive', 'proxy-authenticate',
+    'proxy-authorization', 'te', 'trailers', 'upgrade',
+    'transfer-encoding',
+))
+
+_MOCK_HEADERS = {'Content-Type': 'application/json; charset=utf-8'}
+
+
+def _has_body(method: str, status: int) -> bool:
+    """响应是否带 body（RFC 9110 6.4.1）"""
+    return method != 'HEAD' and status >= 200 and status not in (204, 304)
+
+
+class _MockPlan:
+    """规则首次命中时编译的 Mock 响应，缓存在 CompiledRule.plan 上
+
+    模板不含占位符时 prepared 为预先序列化的完整响应（状态行、响应头与 body），
+    否则每次由 template（RenderPlan）生成 body。
+    """
+
+    __slots__ = ('status', 'template', 'prepared')
+
+    def __init__(self, status, template):
+        self.status = status
+        self.template = template
+        self.prepared = None
+        if template.body is not None:
+            self.prepared = PreparedResponse(status, _MOCK_HEADERS, template.body)
+
 
 class AsyncProxyServer:
     """asyncio TCP 代理服务器，同一端口处理 HTTP 和 HTTPS CONNECT"""
@@ -24,36 +80,151 @@ class AsyncProxyServer:
     def __init__(self, config_manager: ConfigManager,
                  cert_manager: CertManager,
                  data_generator: DataGenerator,
-                 host: str = '0.0.0.0', port: int = 8888):
+                 host: str = '0.0.0.0', port: int = 8888,
+                 upstream: UpstreamPool = None,
+                 stream_upstream: bool = True,
+                 max_body_size: int = 10 * 1024 * 1024,
+                 keepalive_timeout: float = 30,
+                 blind_tunnel: bool = True,
+                 tunnel_idle_timeout: float = 300,
+                 max_head_size: int = 64 * 1024,
+                 header_parser: str = 'auto',
+                 http2: bool = True,
+                 reuse_port: bool = False,
+                 tcp_nodelay: bool = True,
+                 response_cache: ResponseCache = None,
+                 admin: AdminAPI = None,
+                 body_match_max: int = 1024 * 1024,
+                 stats_file: str = None,
+                 stats_interval: float = 60,
+                 mock_stream_chunk: int = 64 * 1024):
         self.config_manager = config_manager
         self.cert_manager = cert_manager
         self.data_generator = data_generator
         self.host = host
         self.port = port
-
-    async def start(self):
-        server = await asyncio.start_server(self._handle_client, self.host, self.port)
+        # 上游连接池（由服务器持有，跨请求复用 TCP/TLS 连接）
+        self.upstream = upstream or UpstreamPool()
+        # 流式透传上游响应 body，内存占用与 body 大小无关
+        self.stream_upstream = stream_upstream
+        # 请求体大小上限（字节），0 表示不限制
+        self.max_body_size = max_body_size
+        # 客户端 keep-alive 连接的空闲超时（秒）
+        self.keepalive_timeout = keepalive_timeout
+        # 没有任何规则可能匹配的 CONNECT 目标直接透传字节，不做 MITM
+        self.blind_tunnel = blind_tunnel
+        # 直连隧道两个方向都没有数据超过该时间（秒）后关闭，0 表示不限制
+        self.tunnel_idle_timeout = tunnel_idle_timeout
+        # 请求行 + 请求头的长度上限（字节），同时作为 StreamReader 的缓冲上限
+        self.max_head_size = max_head_size
+        self.head_parser = create_head_parser(header_parser)
+        # MITM 侧通过 ALPN 协商 HTTP/2（需安装 h2）
+        if http2 and not H2_AVAILABLE:
+            logger.info("未安装 h2，MITM 侧仅支持 HTTP/1.1")
+        self.http2 = http2 and H2_AVAILABLE
+        # 多 worker 模式下各进程以 SO_REUSEPORT 绑定同一端口
+        self.reuse_port = reuse_port
+        # 客户端连接启用 TCP_NODELAY：小响应（mock、401、错误页）不等待 Nagle 合并
+        self.tcp_nodelay = tcp_nodelay
+        # 转发响应缓存，仅对配置 cache 规则启用的 URL 生效
+        self.response_cache = response_cache
+        # 运行时规则管理接口（保留主机名），None 表示关闭
+        self.admin = admin
+        # 规则带 body 约束时读取请求体用于匹配的上限（字节），更大的请求体不参与 body 匹配
+        self.body_match_max = body_match_max
+        # 规则统计的定期导出（JSON），多 worker 时文件名带上进程号
+        self.stats_file = stats_file
+        self.stats_interval = stats_interval
+        # 含 $repeat 的 Mock 响应生成超过该大小（字符）后改为分块流式输出，0 表示不流式输出
+        self.mock_stream_chunk = mock_stream_chunk
+
+    async def start(self, backlog: int = 100, recv_buffer: int = 0, send_buffer: int = 0):
+        """启动监听
+
+        backlog 为 listen 队列长度；recv_buffer / send_buffer 为 SO_RCVBUF / SO_SNDBUF
+        字节数（0 表示使用系统默认），设置在监听 socket 上，由 accept 出的连接继承。
+        """
+        # 配置的首次加载与热更新在后台完成，不占用请求路径
+        await self.config_manager.start_watching()
+        server = await asyncio.start_server(self._handle_client, self.host, self.port,
+                                            limit=self.max_head_size, backlog=backlog,
+                                            reuse_port=self.reuse_port or None)
+        for sock in server.sockets:
+            if recv_buffer:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, recv_buffer)
+            if send_buffer:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, send_buffer)
         addr = server.sockets[0].getsockname()
-        logger.info(f"代理服务器已启动: {addr[0]}:{addr[1]}")
-        async with server:
-            await server.serve_forever()
+        loop_name = type(asyncio.get_running_loop()).__module__.split('.')[0]
+        logger.info(f"代理服务器已启动: {addr[0]}:{addr[1]} "
+                    f"(事件循环: {loop_name}, 请求头解析: {self.head_parser.name})")
+        stats_task = None
+        if self.stats_file:
+            if self.reuse_port:
+                root, ext = os.path.splitext(self.stats_file)
+                self.stats_file = f'{root}.{os.getpid()}{ext}'
+            stats_task = asyncio.create_task(self._dump_stats_periodically(),
+                                             name='pretender-stats-dump')
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if stats_task is not None:
+                stats_task.cancel()
+                await self._dump_stats()
+            await self.config_manager.stop_watching()
+            await self.upstream.aclose()
+            if self.response_cache is not None:
+                self.response_cache.close()
+            stats = self.config_manager.match_stats()
+            if stats['hits'] or stats['misses']:
+                logger.info(f"规则匹配缓存: 命中率 {stats['hit_rate']:.1%} "
+                            f"(命中 {stats['hits']}, 未命中 {stats['misses']}, "
+                            f"重新加载失效 {stats['invalidations']} 次)")
+            if self.data_generator.pools is not None:
+                pools = self.data_generator.pools.stats()
+                logger.info(f"faker 值池: {pools['pools']} 个, 命中率 {pools['hit_rate']:.1%} "
+                            f"(命中 {pools['hits']}, 池空同步生成 {pools['misses']})")
+                self.data_generator.close()
+            report = self.config_manager.stats.report()
+            if report['total_matches'] or report['forwarded']:
+                logger.info(f"规则统计: {len(report['rules'])} 条规则共命中 {report['total_matches']} 次, "
+                            f"{report['dead_rules']} 条未被命中, "
+                            f"转发 {sum(report['forwarded'].values())} 次")
+
+    async def _dump_stats_periodically(self):
+        while True:
+            await asyncio.sleep(self.stats_interval)
+            await self._dump_stats()
+
+    async def _dump_stats(self):
+        """导出规则统计：快照在事件循环中生成（计数器只在此线程修改），写文件在线程中完成"""
+        try:
+            await asyncio.to_thread(self.config_manager.stats.write,
+                                    self.config_manager.stats.report(), self.stats_file)
+        except OSError as e:
+            logger.error(f"规则统计导出失败: {e}")
 
     # ── 连接入口 ─────────────────────────────────────────
 
     async def _handle_client(self, reader: asyncio.StreamReader,
                              writer: asyncio.StreamWriter):
+        sock = writer.get_extra_info('socket')
+        if sock is not None:
+            try:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, int(self.tcp_nodelay))
+            except OSError:
+                pass
         try:
-            request_line = await self._read_line(reader)
-            if not request_line:
-                writer.close()
+            head = await self._read_head(reader, writer)
+            if head is None:
                 return
 
-            method, target, _ = self._parse_request_line(request_line)
-
+            method, target, version, headers = head
             if method == 'CONNECT':
                 await self._handle_connect(reader, writer, target)
             else:
-                await self._handle_http(reader, writer, method, target)
+                await self._handle_http(reader, writer, head)
         except (ConnectionResetError, BrokenPipeError):
             pass
         except Exception as e:
@@ -70,16 +241,37 @@ class AsyncProxyServer:
     async def _handle_connect(self, reader, writer, target):
         host, port = self._parse_host_port(target, default_port=443)
 
-        # 读取并丢弃 CONNECT 的剩余 headers
-        await self._read_headers(reader)
+        # 构造 URL 前缀（非标准端口需包含端口号）
+        if port == 443:
+            url_prefix = f"https://{host}"
+        else:
+            url_prefix = f"https://{host}:{port}"
+
+        # 快速路径：没有规则可能命中该 origin，直接建立 TCP 隧道，省去签发证书与两次 TLS
+        if self.blind_tunnel:
+            await self.config_manager.ensure_host(url_prefix)
+        if self.blind_tunnel and not self.config_manager.could_match_origin(
+                url_prefix, cache=self.response_cache is not None):
+            logger.info(f"直连隧道: {host}:{port}")
+            # 隧道内的请求不可见，整条连接按一次转发计入该主机
+            self.config_manager.stats.record_forward(url_prefix)
+            if not await tunnel.relay(reader, writer, host, port,
+                                      idle_timeout=self.tunnel_idle_timeout):
+                await self._write_error(Http1Responder(writer), 502, f'Tunnel Error: {host}:{port}')
+            return
+
+        # TLS 握手——用 CA 签发的域名证书扮演目标服务器
+        if self.cert_manager.is_cached(host):
+            ssl_ctx = self.cert_manager.get_ssl_context(host, http2=self.http2)
+        else:
+            # 首次签发（2048 位 RSA、跨 worker 文件锁）在线程中完成，不阻塞同一 worker 的其他连接；
+            # 须在回复 200 之前完成，否则客户端的 ClientHello 会先进入 reader 缓冲
+            ssl_ctx = await asyncio.to_thread(self.cert_manager.get_ssl_context, host, self.http2)
 
         # 告知客户端隧道已建立
         writer.write(b'HTTP/1.1 200 Connection Established\r\n\r\n')
         await writer.drain()
 
-        # TLS 握手——用 CA 签发的域名证书扮演目标服务器
-        ssl_ctx = self.cert_manager.get_ssl_context(host)
-
         transport = writer.transport
         protocol = transport.get_protocol()
         loop = asyncio.get_event_loop()
@@ -100,130 +292,398 @@ class AsyncProxyServer:
         # 但 writer 的 transport 引用仍指向旧的，需手动更新
         writer._transport = tls_transport
 
-        # 构造 URL 前缀（非标准端口需包含端口号）
-        if port == 443:
-            url_prefix = f"https://{host}"
-        else:
-            url_prefix = f"https://{host}:{port}"
+        # ALPN 协商为 h2 时，由 H2Session 在同一连接上并发处理多路复用的流
+        ssl_object = tls_transport.get_extra_info('ssl_object')
+        if ssl_object is not None and ssl_object.selected_alpn_protocol() == 'h2':
+            try:
+                await H2Session(self, reader, writer, url_prefix).run()
+            except (ConnectionResetError, BrokenPipeError, ssl.SSLError):
+                pass
+            return
 
         try:
             # 循环处理同一 TLS 连接上的多个请求（HTTP keep-alive）
-            while True:
-                req_line = await self._read_line(reader)
-                if not req_line:
-                    break
-                method, path, _ = self._parse_request_line(req_line)
+            head = await self._read_head(reader, writer)
+            while head is not None:
+                method, path, version, headers = head
                 url = f"{url_prefix}{path}"
 
-                headers = await self._read_headers(reader)
-                body = await self._read_body(reader, headers)
+                body = self._open_body(reader, headers)
+                responder = Http1Responder(writer, self._wants_keep_alive(version, headers), version)
 
-                await self._process_request(writer, url, method, headers, body)
+                await self._process_request(responder, url, method, headers, body)
+                # 未被读取的请求体需丢弃，否则会被当作下一个请求解析
+                if not responder.keep_alive or responder.closing or not await body.discard():
+                    break
+                head = await self._read_head(reader, writer, timeout=self.keepalive_timeout)
         except (ConnectionResetError, BrokenPipeError, ssl.SSLError):
             pass
 
     # ── 普通 HTTP 代理 ───────────────────────────────────
 
-    async def _handle_http(self, reader, writer, method, url):
-        headers = await self._read_headers(reader)
-        body = await self._read_body(reader, headers)
-        await self._process_request(writer, url, method, headers, body)
+    async def _handle_http(self, reader, writer, head):
+        # 循环处理同一连接上的多个请求（HTTP keep-alive，流水线请求按序处理）
+        while True:
+            method, url, version, headers = head
+            body = self._open_body(reader, headers)
+            responder = Http1Responder(writer, self._wants_keep_alive(version, headers), version)
+
+            await self._process_request(responder, url, method, headers, body)
+            if not responder.keep_alive or responder.closing or not await body.discard():
+                return
+
+            head = await self._read_head(reader, writer, timeout=self.keepalive_timeout)
+            if head is None:
+                return
+            if head[0] == 'CONNECT':
+                await self._handle_connect(reader, writer, head[1])
+                return
 
     # ── 请求处理核心（HTTP/HTTPS 共用） ───────────────────
 
-    async def _process_request(self, writer, url, method, headers, body):
+    async def _process_request(self, responder, url, method, headers: Headers,
+                               body: RequestBody):
+        """responder 为 Http1Responder 或 H2StreamResponder，屏蔽底层协议差异"""
+        if self.admin is not None and self.admin.handles(url, headers):
+            logger.info(f"管理接口: {method} {url}")
+            await self.admin.handle(responder, method, url, headers, body)
+            return
+
         # 噪音过滤
         if self._is_noise_request(url):
             logger.debug(f"过滤噪音请求: {method} {url}")
-            await self._write_response(writer, 404, {}, b'Not Found')
+            await responder.send(404, {}, b'Not Found')
+            return
+
+        if body.too_large:
+            logger.warning(f"请求体过大: {body.length} > {self.max_body_size}")
+            responder.keep_alive = False
+            await self._write_error(responder, 413, 'Payload Too Large')
             return
 
         logger.info(f"处理请求: {method} {url}")
 
-        # 转换 headers dict 的 key 为 Title-Case
-        request_headers = {k.title(): v for k, v in headers.items()}
-
-        # Mock 匹配
-        mock_resp = self.config_manager.match_mock(url, method, request_headers)
-        if mock_resp is not None:
-            if isinstance(mock_resp, dict) and mock_resp.get('error') == 'header_validation_failed':
-                logger.warning(f"Header 验证失败: {mock_resp['message']}")
-                err = json.dumps(mock_resp, ensure_ascii=False).encode()
-                await self._write_response(writer, 401,
-                                           {'Content-Type': 'application/json; charset=utf-8'}, err)
+        # Mock 匹配（Headers 大小写不敏感，重复 header 合并后参与匹配）；
+        # 主机分片首次访问时在线程中加载，不阻塞事件循环
+        await self.config_manager.ensure_host(url)
+        candidates = self.config_manager.mock_candidates(url, method)
+        request_body = None
+        if self.config_manager.needs_body(candidates):
+            # 只有候选规则带 body 约束时才读取请求体，转发时仍可完整发给上游
+            request_body = await self._read_body_for_match(responder, body)
+            if request_body is None:
+                return
+        selected = self.config_manager.select_rule(candidates, headers, request_body)
+        if selected is not None:
+            if isinstance(selected, HeaderRejection):
+                logger.warning(f"Header 验证失败: {selected['message']}")
+                await responder.send(401, {'Content-Type': 'application/json; charset=utf-8'}, selected.body)
             else:
                 logger.info(f"Mock 拦截: {method} {url}")
-                await self._send_mock_response(writer, mock_resp)
+                await self._send_mock_response(responder, url, selected)
             return
 
         # 代理转发
         logger.info(f"代理转发: {method} {url}")
-        await self._send_proxy_response(writer, url, method, request_headers, body)
+        self.config_manager.stats.record_forward(url)
+        await self._send_proxy_response(responder, url, method, headers, body)
+
+    async def _read_body_for_match(self, responder, body: RequestBody):
+        """读取请求体供 body 约束匹配；读取失败时写回错误响应并返回 None"""
+        try:
+            raw = await body.read_limited(self.body_match_max)
+        except BodyTooLarge as e:
+            logger.warning(str(e))
+            responder.keep_alive = False
+            await self._write_error(responder, 413, 'Payload Too Large')
+            return None
+        except (MalformedBody, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+            logger.warning(f"请求体读取失败: {e!r}")
+            responder.keep_alive = False
+            await self._write_error(responder, 400, 'Bad Request')
+            return None
+        if raw is None:
+            logger.debug(f"请求体超过匹配上限 {self.body_match_max} 字节，不参与 body 匹配")
+        return RequestBodyView(raw)
 
     # ── Mock 响应 ─────────────────────────────────────────
 
-    async def _send_mock_response(self, writer, mock_resp):
+    async def _send_mock_response(self, responder, url, selected):
+        mock_resp = selected.rule['response']
         if 'delay' in mock_resp:
             delay_s = mock_resp['delay'] / 1000.0
             logger.info(f"模拟延迟: {delay_s:.3f}s")
             await asyncio.sleep(delay_s)
 
-        response_data = self.data_generator.generate_data(mock_resp['msg'])
-        body = json.dumps(response_data, ensure_ascii=False).encode('utf-8')
-        status = mock_resp.get('code', 200)
+        # 响应模板在规则首次命中时编译，之后每次只执行数据生成；内容固定的响应直接发送缓存的字节
+        started = time.perf_counter_ns()
+        plan = selected.plan
+        if plan is None:
+            plan = selected.plan = _MockPlan(mock_resp.get('code', 200),
+                                             self.data_generator.compile(mock_resp['msg']))
+        prepared = plan.prepared
+        if prepared is None and plan.template.streamable and self.mock_stream_chunk:
+            await self._stream_mock_response(responder, url, plan, selected.stats, started)
+            return
+        body = prepared.body if prepared is not None else plan.template.to_json(url)
+        stats = selected.stats
+        if stats is not None:
+            stats.record_render(time.perf_counter_ns() - started, len(body))
+
+        if prepared is not None:
+            await responder.send_prepared(prepared)
+        else:
+            await responder.send(plan.status, dict(_MOCK_HEADERS), body)
+        logger.info(f"Mock 响应完成: {plan.status}")
+
+    async def _stream_mock_response(self, responder, url, plan, stats, started):
+        """边生成边发送大响应：生成内容超过 mock_stream_chunk 后改为分块写出（HTTP/1.1 chunked），
+        每块等待 drain() 背压并让出事件循环，内存占用与响应大小无关；未超过时仍按 Content-Length 一次发送
+
+        HTTP/1.0 客户端不支持 chunked，流式输出时由 Http1Responder 改为写完后关闭连接。
+        """
+        limit = self.mock_stream_chunk
+        buffered = []
+        size = 0
+        sent = 0
+        elapsed = 0
+        streaming = False
+        try:
+            for fragment in plan.template.iter_json(url):
+                buffered.append(fragment)
+                size += len(fragment)
+                if size < limit:
+                    continue
+                data = ''.join(buffered).encode('utf-8')
+                buffered.clear()
+                size = 0
+                elapsed += time.perf_counter_ns() - started
+                if not streaming:
+                    streaming = True
+                    await responder.start(plan.status, dict(_MOCK_HEADERS))
+                await responder.write(data)
+                sent += len(data)
+                # drain() 在缓冲未满时不会让出，生成下一块前主动让其他连接运行
+                await asyncio.sleep(0)
+                started = time.perf_counter_ns()
+        except (ConnectionResetError, BrokenPipeError):
+            raise
+        except Exception as e:
+            if not streaming:
+                raise
+            # 响应头已发出，无法再返回错误页，只能断开连接
+            logger.error(f"Mock 响应生成中断: {e}")
+            responder.abort()
+            return
 
-        await self._write_response(writer, status,
-                                   {'Content-Type': 'application/json; charset=utf-8'}, body)
-        logger.info(f"Mock 响应完成: {status}")
+        data = ''.join(buffered).encode('utf-8')
+        elapsed += time.perf_counter_ns() - started
+        if stats is not None:
+            stats.record_render(elapsed, sent + len(data))
+        if streaming:
+            await responder.write(data)
+            await responder.end()
+            logger.info(f"Mock 响应完成: {plan.status}（流式，{sent + len(data)} 字节）")
+        else:
+            await responder.send(plan.status, dict(_MOCK_HEADERS), data)
+            logger.info(f"Mock 响应完成: {plan.status}")
 
     # ── 代理转发 ──────────────────────────────────────────
 
-    async def _send_proxy_response(self, writer, url, method, headers, body):
-        proxy_headers = dict(headers)
-        proxy_headers.pop('Host', None)
-        proxy_headers.pop('Connection', None)
-        proxy_headers.pop('Proxy-Connection', None)
+    async def _send_proxy_response(self, responder, url, method, headers: Headers,
+                                   body: RequestBody):
+        # 保留重复 header；请求体以异步迭代器流式上传，分帧方式交由 httpx 决定
+        proxy_headers = [(k, v) for k, v in headers.items()
+                         if k.lower() not in _SKIP_REQUEST_HEADERS]
+
+        if self.response_cache is not None and method in ('GET', 'HEAD') and body.is_empty:
+            policy = self.config_manager.cache_policy(url)
+            if policy is not None:
+                await self._send_cached_proxy_response(responder, url, method, headers,
+                                                       proxy_headers, policy)
+                return
+
+        resp = await self._upstream_send(responder, method, url, proxy_headers,
+                                         None if body.is_empty else body, True)
+        if resp is not None:
+            await self._forward_response(responder, method, resp)
 
+    async def _forward_response(self, responder, method, resp):
+        """把上游响应原样写回客户端
+
+        body 一律取 aiter_raw() 的原始字节（gzip 等不解码），与透传的 Content-Encoding 一致；
+        非流式模式下读完整个 body 后按实际长度重写 Content-Length 再发出。
+        """
         try:
-            async with httpx.AsyncClient(follow_redirects=True, timeout=30,
-                                         verify=False) as client:
-                resp = await client.request(method=method, url=url,
-                                            headers=proxy_headers, content=body or None)
-
-            resp_headers = {}
-            hop_by_hop = {
-                'connection', 'keep-alive', 'proxy-authenticate',
-                'proxy-authorization', 'te', 'trailers', 'upgrade',
-                'transfer-encoding',
-            }
-            for k, v in resp.headers.items():
-                if k.lower() not in hop_by_hop:
-                    resp_headers[k] = v
-
-            await self._write_response(writer, resp.status_code, resp_headers, resp.content)
+            resp_headers = {k: v for k, v in resp.headers.items()
+                            if k.lower() not in _HOP_BY_HOP}
+            if self.stream_upstream:
+                await self._relay_upstream_body(responder, method, resp, resp_headers)
+            else:
+                body = await self._read_upstream_body(responder, resp)
+                if body is None:
+                    return
+                if _has_body(method, resp.status_code):
+                    resp_headers = {k: v for k, v in resp_headers.items() if k.lower() != 'content-length'}
+                    resp_headers['Content-Length'] = str(len(body))
+                await responder.send(resp.status_code, resp_headers, body)
             logger.info(f"代理响应完成: {resp.status_code}")
+        except (ConnectionResetError, BrokenPipeError):
+            raise
+        except Exception as e:
+            # 响应头可能已发出，无法再返回错误页，只能断开连接
+            logger.error(f"代理响应中断: {e}")
+            responder.abort()
+        finally:
+            await resp.aclose()
 
-        except httpx.TimeoutException:
+    async def _upstream_send(self, responder, method, url, proxy_headers, content, stream):
+        """请求上游，失败时写回对应的错误响应并返回 None"""
+        try:
+            return await self.upstream.send(method, url, headers=proxy_headers,
+                                            content=content, stream=stream)
+        except BodyTooLarge as e:
+            logger.warning(str(e))
+            responder.keep_alive = False
+            await self._write_error(responder, 413, 'Payload Too Large')
+        except MalformedBody as e:
+            logger.warning(f"请求体格式错误: {e}")
+            responder.keep_alive = False
+            await self._write_error(responder, 400, 'Bad Request')
+        except Exception as e:
+            await self._write_upstream_error(responder, e)
+        return None
+
+    async def _read_upstream_body(self, responder, resp):
+        """读出完整的上游原始 body；失败时（尚未写出任何内容）写回错误响应并返回 None"""
+        try:
+            return b''.join([chunk async for chunk in resp.aiter_raw()])
+        except Exception as e:
+            await self._write_upstream_error(responder, e)
+        return None
+
+    async def _write_upstream_error(self, responder, e: Exception):
+        if isinstance(e, httpx.TimeoutException):
             logger.error("代理请求超时")
-            await self._write_error(writer, 504, 'Gateway Timeout')
-        except httpx.RequestError as e:
+            await self._write_error(responder, 504, 'Gateway Timeout')
+        elif isinstance(e, httpx.RequestError):
             logger.error(f"代理请求失败: {e}")
-            await self._write_error(writer, 502, f'Proxy Error: {e}')
-        except Exception as e:
+            await self._write_error(responder, 502, f'Proxy Error: {e}')
+        else:
             logger.error(f"代理处理异常: {e}")
-            await self._write_error(writer, 500, 'Internal Server Error')
+            await self._write_error(responder, 500, 'Internal Server Error')
+
+    async def _relay_upstream_body(self, responder, method, resp, resp_headers,
+                                   buffered=(), chunks=None):
+        """边读边写上游 body，长度未知时使用 chunked 编码，每块都等待 drain() 背压
+
+        buffered 为已读出的数据块，chunks 为读取到一半的 aiter_raw() 迭代器。
+        """
+        await responder.start(resp.status_code, resp_headers, has_body=_has_body(method, resp.status_code))
+
+        for chunk in buffered:
+            await responder.write(chunk)
+        # aiter_raw 保留上游原始编码（gzip 等），与透传的 Content-Encoding/Length 一致
+        async for chunk in (chunks if chunks is not None else resp.aiter_raw()):
+            await responder.write(chunk)
+        await responder.end()
+
+    # ── 响应缓存 ──────────────────────────────────────────
+
+    async def _send_cached_proxy_response(self, responder, url, method, headers: Headers,
+                                          proxy_headers, policy: dict):
+        """GET/HEAD 经缓存转发：新鲜命中直接返回，过期时带校验器向上游重新校验"""
+        cache = self.response_cache
+        default_ttl = float(policy.get('ttl', 0) or 0)
+        entry = await cache.get(url, headers)
+
+        if entry is not None and entry.is_fresh and not wants_revalidation(headers):
+            cache.hits += 1
+            logger.info(f"缓存命中: {method} {url}")
+            await self._send_cache_entry(responder, method, headers, entry, 'HIT')
+            return
 
-    # ── HTTP 解析辅助 ─────────────────────────────────────
+        if method == 'HEAD':
+            # HEAD 响应没有 body，不写入缓存，按普通转发处理
+            resp = await self._upstream_send(responder, method, url, proxy_headers, None, True)
+            if resp is not None:
+                await self._forward_response(responder, method, resp)
+            return
 
-    @staticmethod
-    def _parse_request_line(line: str):
-        """解析请求行 → (method, target, version)"""
-        parts = line.split(' ', 2)
-        if len(parts) == 3:
-            return parts[0], parts[1], parts[2]
-        if len(parts) == 2:
-            return parts[0], parts[1], 'HTTP/1.1'
-        return 'GET', '/', 'HTTP/1.1'
+        # 条件请求头由缓存生成，客户端自身的条件在返回时针对缓存条目判断
+        request_headers = [(k, v) for k, v in proxy_headers if k.lower() not in _CONDITIONAL_HEADERS]
+        if entry is not None:
+            if entry.etag is not None:
+                request_headers.append(('If-None-Match', entry.etag))
+            if entry.last_modified is not None:
+                request_headers.append(('If-Modified-Since', entry.last_modified))
+
+        resp = await self._upstream_send(responder, method, url, request_headers, None, True)
+        if resp is None:
+            return
+
+        try:
+            resp_headers = {k: v for k, v in resp.headers.items()
+                            if k.lower() not in _HOP_BY_HOP}
+            if resp.status_code == 304 and entry is not None:
+                cache.revalidated += 1
+                entry.refresh(resp_headers, freshness_lifetime(resp_headers, default_ttl))
+                logger.info(f"缓存重新校验: {method} {url}")
+                await self._send_cache_entry(responder, method, headers, entry, 'REVALIDATED')
+                return
+
+            cache.misses += 1
+            resp_headers['X-Cache'] = 'MISS'
+            if not is_storable(resp.status_code, headers, resp_headers, default_ttl):
+                await self._relay_upstream_body(responder, method, resp, resp_headers)
+                return
+
+            # 边读边累积，超过单条上限则放弃缓存，转为流式透传
+            chunks = resp.aiter_raw().__aiter__()
+            buffered, size = [], 0
+            async for chunk in chunks:
+                buffered.append(chunk)
+                size += len(chunk)
+                if size > cache.max_entry_size:
+                    await self._relay_upstream_body(responder, method, resp, resp_headers,
+                                                    buffered=buffered, chunks=chunks)
+                    return
+
+            body = b''.join(buffered)
+            del resp_headers['X-Cache']
+            resp_headers = {k: v for k, v in resp_headers.items() if k.lower() != 'content-length'}
+            resp_headers['Content-Length'] = str(len(body))
+            await cache.put(url, CacheEntry(
+                resp.status_code, resp_headers, body, vary_values(resp_headers, headers),
+                freshness_lifetime(resp_headers, default_ttl),
+            ))
+            await responder.send(resp.status_code, {**resp_headers, 'X-Cache': 'MISS'}, body)
+            logger.info(f"代理响应完成: {resp.status_code} (已缓存)")
+        except (ConnectionResetError, BrokenPipeError):
+            raise
+        except Exception as e:
+            logger.error(f"代理响应中断: {e}")
+            responder.abort()
+        finally:
+            await resp.aclose()
+
+    async def _send_cache_entry(self, responder, method, headers: Headers,
+                                entry: CacheEntry, state: str):
+        resp_headers = dict(entry.headers)
+        resp_headers['Age'] = str(entry.age)
+        resp_headers['X-Cache'] = state
+        # 客户端自身的条件请求：校验器一致时返回 304
+        inm = headers.get('if-none-match')
+        if entry.status == 200 and inm is not None and entry.etag is not None and (
+                inm.strip() == '*' or entry.etag in (t.strip() for t in inm.split(','))):
+            resp_headers = {k: v for k, v in resp_headers.items() if k.lower() != 'content-length'}
+            await responder.start(304, resp_headers, has_body=False)
+            await responder.end()
+            return
+        body = b'' if method == 'HEAD' else entry.body
+        await responder.send(entry.status, resp_headers, body)
+
+    # ── HTTP 解析辅助 ─────────────────────────────────────
 
     @staticmethod
     def _parse_host_port(target: str, default_port: int = 80):
@@ -236,78 +696,51 @@ class AsyncProxyServer:
                 return target, default_port
         return target, default_port
 
-    async def _read_line(self, reader) -> str:
-        """读取一行（去掉 CRLF），超时返回空字符串"""
-        try:
-            data = await asyncio.wait_for(reader.readline(), timeout=30)
-            if not data:
-                return ''
-            return data.decode('latin-1').rstrip('\r\n')
-        except (asyncio.TimeoutError, ConnectionResetError):
-            return ''
-
-    async def _read_headers(self, reader) -> dict:
-        """读取到空行为止的所有 headers"""
-        headers = {}
-        while True:
-            line = await self._read_line(reader)
-            if not line:
-                break
-            if ':' in line:
-                key, value = line.split(':', 1)
-                headers[key.strip()] = value.strip()
-        return headers
-
-    async def _read_body(self, reader, headers: dict) -> bytes:
-        """根据 Content-Length 读取 body"""
-        length = 0
-        for k, v in headers.items():
-            if k.lower() == 'content-length':
-                try:
-                    length = int(v)
-                except ValueError:
-                    length = 0
-                break
-        if length > 0:
-            return await asyncio.wait_for(reader.readexactly(length), timeout=30)
-        return b''
+    async def _read_head(self, reader, writer, timeout: float = 30):
+        """在单个超时内读取完整请求头并一次性解析 → (method, target, version, Headers)
 
-    # ── 响应写入 ──────────────────────────────────────────
+        连接关闭、超时或请求头非法时返回 None（非法时已写回 4xx）
+        """
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), timeout=timeout)
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionResetError):
+            return None
+        except asyncio.LimitOverrunError:
+            logger.warning(f"请求头过大 (> {self.max_head_size} 字节)")
+            await self._write_error(Http1Responder(writer), 431, 'Request Header Fields Too Large')
+            return None
+        try:
+            return self.head_parser.parse(head)
+        except HeadParseError as e:
+            logger.warning(f"请求头解析失败: {e}")
+            await self._write_error(Http1Responder(writer), 400, 'Bad Request')
+            return None
 
     @staticmethod
-    def _status_phrase(code: int) -> str:
-        phrases = {
-            200: 'OK', 201: 'Created', 204: 'No Content',
-            301: 'Moved Permanently', 302: 'Found', 304: 'Not Modified',
-            400: 'Bad Request', 401: 'Unauthorized', 403: 'Forbidden',
-            404: 'Not Found', 405: 'Method Not Allowed',
-            500: 'Internal Server Error', 502: 'Bad Gateway',
-            503: 'Service Unavailable', 504: 'Gateway Timeout',
-        }
-        return phrases.get(code, 'Unknown')
-
-    async def _write_response(self, writer, status: int,
-                              headers: dict, body: bytes):
-        """写入原始 HTTP 响应"""
-        lines = [f'HTTP/1.1 {status} {self._status_phrase(status)}\r\n']
-        headers.setdefault('Content-Length', str(len(body)))
-        headers.setdefault('Connection', 'close')
+    def _wants_keep_alive(version: str, headers: Headers) -> bool:
+        """根据协议版本与 Connection / Proxy-Connection 判断是否保持连接"""
+        tokens = set()
         for k, v in headers.items():
-            lines.append(f'{k}: {v}\r\n')
-        lines.append('\r\n')
+            if k.lower() in ('connection', 'proxy-connection'):
+                tokens.update(t.strip().lower() for t in v.split(','))
+        if 'close' in tokens:
+            return False
+        if version.strip().upper() == 'HTTP/1.0':
+            return 'keep-alive' in tokens
+        return True
+
+    def _open_body(self, reader, headers: Headers) -> RequestBody:
+        """创建请求体读取管道（Content-Length / chunked），不立即读取"""
+        return RequestBody(reader, headers, max_size=self.max_body_size)
 
-        writer.write(''.join(lines).encode('latin-1'))
-        if body:
-            writer.write(body)
-        await writer.drain()
+    # ── 响应写入 ──────────────────────────────────────────
 
-    async def _write_error(self, writer, status: int, message: str):
+    async def _write_error(self, responder, status: int, message: str):
         err = json.dumps({
             'error': True, 'code': status, 'message': message,
             'server': 'Pretender Proxy',
         }, ensure_ascii=False).encode('utf-8')
-        await self._write_response(writer, status,
-                                   {'Content-Type': 'application/json; charset=utf-8'}, err)
+        await responder.send(status, {'Content-Type': 'application/json; charset=utf-8'}, err)
 
     @staticmethod
     def _is_noise_request(url: str) -> bool:
@@ -0,0 +1,306 @@
+import asyncio
+import logging
+
+from src.server.http_body import RequestBody
+from src.server.http_parser import Headers
+
+try:
+    import h2.config
+    import h2.connection
+    import h2.errors
+    import h2.events
+    import h2.exceptions
+    import h2.settings
+    H2_AVAILABLE = True
+except ImportError:  # h2 为可选依赖，未安装时 MITM 侧仅支持 HTTP/1.1
+    H2_AVAILABLE = False
+
+logger = logging.getLogger('Pretender.H2')
+
+# 单个连接允许的最大并发流
+MAX_CONCURRENT_STREAMS = 512
+
+# HTTP/2 禁止出现的连接级响应头（RFC 9113 8.2.2）
+_CONNECTION_HEADERS = frozenset((
+    'connection', 'keep-alive', 'proxy-connection', 'transfer-encoding', 'upgrade',
+))
+
+
+class H2RequestBody(RequestBody):
+    """HTTP/2 请求体：数据来自 DATA 帧，消费后才归还流控窗口"""
+
+    def __init__(self, session, stream_id: int, headers: Headers,
+                 ended: bool, max_size: int = 0):
+        super().__init__(None, headers, max_size=max_size)
+        self.chunked = False
+        if ended:
+            self.length = 0
+        elif 'content-length' not in headers:
+            self.length = None
+        self._session = session
+        self._stream_id = stream_id
+        self._queue = asyncio.Queue()
+        self._abandoned = False
+
+    def feed(self, data: bytes, flow_len: int):
+        if self._abandoned:
+            self._session.ack(self._stream_id, flow_len)
+        else:
+            self._queue.put_nowait((data, flow_len))
+
+    def end(self, exc: Exception = None):
+        self._queue.put_nowait(exc)
+
+    def abandon(self):
+        """请求处理结束后不再需要 body：归还已缓冲和后续数据的流控窗口"""
+        self._abandoned = True
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if isinstance(item, tuple):
+                self._session.ack(self._stream_id, item[1])
+
+    async def _source(self):
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                raise item
+            data, flow_len = item
+            self._session.ack(self._stream_id, flow_len)
+            self._account(len(data))
+            yield data
+
+
+class H2StreamResponder:
+    """HTTP/2 单个流的响应写入，接口与 Http1Responder 一致"""
+
+    # HTTP/2 连接本身总是持久的
+    keep_alive = True
+
+    def __init__(self, session, stream_id: int):
+        self._session = session
+        self._stream_id = stream_id
+        self._ended = False
+
+    @property
+    def closing(self) -> bool:
+        return self._session.closed
+
+    async def send(self, status: int, headers: dict, body: bytes):
+        headers.setdefault('Content-Length', str(len(body)))
+        await self.start(status, headers, has_body=bool(body))
+        if body:
+            await self.write(body)
+        await self.end()
+
+    async def send_prepared(self, prepared):
+        await self.send(prepared.status, dict(prepared.headers), prepared.body)
+
+    async def start(self, status: int, headers: dict, has_body: bool = True):
+        h2_headers = [(':status', str(status))]
+        h2_headers.extend((k.lower(), str(v)) for k, v in headers.items()
+                          if k.lower() not in _CONNECTION_HEADERS)
+        self._session.send_headers(self._stream_id, h2_headers, end_stream=not has_body)
+        self._ended = not has_body
+        await self._session.drain()
+
+    async def write(self, data: bytes):
+        if data:
+            await self._session.send_data(self._stream_id, data)
+
+    async def end(self):
+        if not self._ended:
+            self._ended = True
+            self._session.end_stream(self._stream_id)
+            await self._session.drain()
+
+    def abort(self):
+        self._ended = True
+        self._session.reset_stream(self._stream_id)
+
+
+class H2Session:
+    """单个 TLS 连接上的 HTTP/2 会话，每个流并发交给 server._process_request 处理"""
+
+    def __init__(self, server, reader: asyncio.StreamReader,
+                 writer: asyncio.StreamWriter, url_prefix: str):
+        self.server = server
+        self.reader = reader
+        self.writer = writer
+        self.url_prefix = url_prefix
+        self.closed = False
+
+        config = h2.config.H2Configuration(client_side=False, header_encoding='utf-8')
+        self.conn = h2.connection.H2Connection(config=config)
+        self.conn.local_settings = h2.settings.Settings(
+            client=False,
+            initial_values={h2.settings.SettingCodes.MAX_CONCURRENT_STREAMS: MAX_CONCURRENT_STREAMS},
+        )
+        self._streams = {}          # stream_id -> (task, body)
+        self._window_events = {}    # stream_id -> asyncio.Event
+
+    # ── 帧收发 ───────────────────────────────────────────
+
+    def flush(self):
+        data = self.conn.data_to_send()
+        if data and not self.writer.is_closing():
+            self.writer.write(data)
+
+    async def drain(self):
+        self.flush()
+        if self.writer.is_closing():
+            raise ConnectionResetError('HTTP/2 连接已关闭')
+        await self.writer.drain()
+
+    def ack(self, stream_id: int, flow_len: int):
+        """归还流控窗口"""
+        if flow_len and not self.closed:
+            self.conn.acknowledge_received_data(flow_len, stream_id)
+            self.flush()
+
+    def send_headers(self, stream_id, headers, end_stream=False):
+        try:
+            self.conn.send_headers(stream_id, headers, end_stream=end_stream)
+        except h2.exceptions.StreamClosedError as e:
+            raise ConnectionResetError(f'流已关闭: {stream_id}') from e
+
+    def end_stream(self, stream_id):
+        try:
+            self.conn.end_stream(stream_id)
+        except h2.exceptions.StreamClosedError as e:
+            raise ConnectionResetError(f'流已关闭: {stream_id}') from e
+
+    def reset_stream(self, stream_id):
+        try:
+            self.conn.reset_stream(stream_id, error_code=h2.errors.ErrorCodes.INTERNAL_ERROR)
+            self.flush()
+        except h2.exceptions.StreamClosedError:
+            pass
+
+    async def send_data(self, stream_id: int, data: bytes):
+        """按流控窗口与最大帧长分片发送，窗口耗尽时等待 WINDOW_UPDATE"""
+        view = memoryview(data)
+        while view:
+            try:
+                window = min(self.conn.local_flow_control_window(stream_id),
+                             self.conn.max_outbound_frame_size)
+            except h2.exceptions.StreamClosedError as e:
+                raise ConnectionResetError(f'流已关闭: {stream_id}') from e
+            if window <= 0:
+                event = self._window_events.setdefault(stream_id, asyncio.Event())
+                event.clear()
+                await event.wait()
+                if self.closed:
+                    raise ConnectionResetError('HTTP/2 连接已关闭')
+                continue
+            self.conn.send_data(stream_id, bytes(view[:window]))
+            view = view[window:]
+            await self.drain()
+
+    # ── 主循环 ───────────────────────────────────────────
+
+    async def run(self):
+        self.conn.initiate_connection()
+        await self.drain()
+        try:
+            while not self.closed:
+                # 没有活动流时按 keep-alive 空闲超时断开
+                timeout = None if self._streams else self.server.keepalive_timeout
+                try:
+                    data = await asyncio.wait_for(self.reader.read(65536), timeout=timeout)
+                except asyncio.TimeoutError:
+                    self.conn.close_connection()
+                    break
+                if not data:
+                    break
+                try:
+                    events = self.conn.receive_data(data)
+                except h2.exceptions.ProtocolError as e:
+                    logger.warning(f"HTTP/2 协议错误: {e}")
+                    break
+                for event in events:
+                    self._dispatch(event)
+                await self.drain()
+        finally:
+            self.closed = True
+            self.flush()
+            for event in self._window_events.values():
+                event.set()
+            tasks = [task for task, _ in self._streams.values()]
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _dispatch(self, event):
+        if isinstance(event, h2.events.RequestReceived):
+            self._on_request(event)
+        elif isinstance(event, h2.events.DataReceived):
+            stream = self._streams.get(event.stream_id)
+            if stream is not None:
+                stream[1].feed(event.data, event.flow_controlled_length)
+            else:
+                self.ack(event.stream_id, event.flow_controlled_length)
+        elif isinstance(event, h2.events.StreamEnded):
+            stream = self._streams.get(event.stream_id)
+            if stream is not None:
+                stream[1].end()
+        elif isinstance(event, h2.events.StreamReset):
+            stream = self._streams.get(event.stream_id)
+            if stream is not None:
+                stream[1].end(ConnectionResetError('客户端重置了流'))
+                stream[0].cancel()
+        elif isinstance(event, (h2.events.WindowUpdated, h2.events.RemoteSettingsChanged)):
+            stream_id = getattr(event, 'stream_id', 0)
+            if stream_id:
+                if stream_id in self._window_events:
+                    self._window_events[stream_id].set()
+            else:
+                for e in self._window_events.values():
+                    e.set()
+        elif isinstance(event, h2.events.ConnectionTerminated):
+            self.closed = True
+
+    def _on_request(self, event):
+        pseudo = {}
+        headers = Headers()
+        cookies = []
+        for name, value in event.headers:
+            if name.startswith(':'):
+                pseudo[name] = value
+            elif name == 'cookie':
+                cookies.append(value)
+            else:
+                headers.add(name, value)
+        if ':authority' in pseudo and 'host' not in headers:
+            headers.add('host', pseudo[':authority'])
+        if cookies:
+            # HTTP/2 允许拆分 cookie，转为 HTTP/1.1 语义时需以 '; ' 合并（RFC 9113 8.2.3）
+            headers.add('cookie', '; '.join(cookies))
+
+        stream_id = event.stream_id
+        body = H2RequestBody(self, stream_id, headers, ended=event.stream_ended is not None,
+                             max_size=self.server.max_body_size)
+        url = f"{self.url_prefix}{pseudo.get(':path', '/')}"
+        task = asyncio.create_task(
+            self._handle_stream(stream_id, url, pseudo.get(':method', 'GET'), headers, body))
+        self._streams[stream_id] = (task, body)
+
+    async def _handle_stream(self, stream_id, url, method, headers, body):
+        responder = H2StreamResponder(self, stream_id)
+        try:
+            await self.server._process_request(responder, url, method, headers, body)
+        except (ConnectionResetError, BrokenPipeError, asyncio.CancelledError):
+            pass
+        except Exception as e:
+            logger.error(f"HTTP/2 流处理异常 ({stream_id}): {e}")
+            responder.abort()
+        finally:
+            body.abandon()
+            self._streams.pop(stream_id, None)
+            self._window_events.pop(stream_id, None)
+            try:
+                self.flush()
+            except Exception:
+                pass
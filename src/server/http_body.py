@@ -0,0 +1,178 @@
+import asyncio
+
+
+class BodyTooLarge(Exception):
+    """请求体超过配置的最大长度"""
+
+
+class MalformedBody(ValueError):
+    """请求体格式错误（如非法的 chunked 编码）"""
+
+
+class RequestBody:
+    """请求体读取管道：支持 Content-Length 与 chunked，按块增量读取，不整体缓冲"""
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, reader: asyncio.StreamReader, headers: dict,
+                 max_size: int = 0, timeout: float = 30):
+        self._reader = reader
+        self._max_size = max_size
+        self._timeout = timeout
+        self._buffer = None
+        self._pending = None    # read_limited 超限时已读出的数据块与剩余数据来源
+        self._consumed = False
+        self._done = False
+        self._failed = False
+        self.received = 0
+
+        self.chunked = False
+        self.length = 0
+        for k, v in headers.items():
+            name = k.lower()
+            if name == 'transfer-encoding' and 'chunked' in v.lower():
+                self.chunked = True
+            elif name == 'content-length':
+                try:
+                    self.length = max(int(v), 0)
+                except ValueError:
+                    self.length = 0
+        if self.chunked:
+            # chunked 优先于 Content-Length（RFC 9112 6.3）
+            self.length = None
+
+    @property
+    def is_empty(self) -> bool:
+        return self.length == 0
+
+    @property
+    def too_large(self) -> bool:
+        """声明的 Content-Length 已超过上限，无需读取即可拒绝"""
+        return bool(self._max_size and self.length and self.length > self._max_size)
+
+    # ── 读取 ─────────────────────────────────────────────
+
+    async def _read(self, n: int) -> bytes:
+        data = await asyncio.wait_for(self._reader.read(n), timeout=self._timeout)
+        if not data:
+            raise asyncio.IncompleteReadError(b'', n)
+        return data
+
+    async def _readline(self) -> bytes:
+        line = await asyncio.wait_for(self._reader.readline(), timeout=self._timeout)
+        if not line.endswith(b'\n'):
+            raise asyncio.IncompleteReadError(line, None)
+        return line
+
+    def _account(self, n: int):
+        self.received += n
+        if self._max_size and self.received > self._max_size:
+            raise BodyTooLarge(f'请求体超过上限 {self._max_size} 字节')
+
+    async def _iter_fixed(self, remaining: int):
+        while remaining > 0:
+            data = await self._read(min(remaining, self.CHUNK_SIZE))
+            remaining -= len(data)
+            self._account(len(data))
+            yield data
+
+    async def _iter_chunked(self):
+        while True:
+            size_line = await self._readline()
+            try:
+                size = int(size_line.split(b';', 1)[0].strip(), 16)
+            except ValueError:
+                raise MalformedBody(f'非法的 chunk 长度: {size_line[:32]!r}')
+            if size == 0:
+                # 丢弃 trailers，直到空行
+                while (await self._readline()).strip():
+                    pass
+                return
+            async for data in self._iter_fixed(size):
+                yield data
+            if await self._readline() != b'\r\n':
+                raise MalformedBody('chunk 结尾缺少 CRLF')
+
+    def _source(self):
+        """原始数据块来源，子类可覆盖（如 HTTP/2 DATA 帧）"""
+        return self._iter_chunked() if self.chunked else self._iter_fixed(self.length)
+
+    async def __aiter__(self):
+        if self._buffer is not None:
+            if self._buffer:
+                yield self._buffer
+            return
+        if self._pending is not None:
+            # read_limited 已读出开头部分：先给出这些数据块，再继续读取剩余部分
+            parts, source = self._pending
+            self._pending = None
+        else:
+            if self._consumed:
+                raise RuntimeError('请求体已被读取')
+            self._consumed = True
+            parts, source = (), self._source()
+
+        for data in parts:
+            yield data
+        try:
+            async for data in source:
+                yield data
+        except BaseException:
+            self._failed = True
+            raise
+        self._done = True
+
+    async def read(self) -> bytes:
+        """读取完整请求体（受 max_size 限制）"""
+        if self._buffer is None:
+            self._buffer = b''.join([data async for data in self])
+        return self._buffer
+
+    async def read_limited(self, limit: int):
+        """读取完整请求体用于匹配，超过 limit 字节时返回 None
+
+        超限时已读出的部分保留下来，之后迭代（如转发给上游）仍得到完整的请求体；
+        声明的 Content-Length 已超限时不读取。
+        """
+        if self._buffer is not None:
+            return self._buffer if len(self._buffer) <= limit else None
+        if self.length is not None and self.length > limit:
+            return None
+        if self._consumed or self._pending is not None:
+            raise RuntimeError('请求体已被读取')
+        if self.length is not None:
+            return await self.read()
+
+        # 长度未知（chunked / 未带 Content-Length 的 HTTP/2 流）：边读边计数，超限即停
+        self._consumed = True
+        source = self._source()
+        parts = []
+        size = 0
+        try:
+            async for data in source:
+                parts.append(data)
+                size += len(data)
+                if size > limit:
+                    self._pending = (parts, source)
+                    return None
+        except BaseException:
+            self._failed = True
+            raise
+        self._done = True
+        self._buffer = b''.join(parts)
+        return self._buffer
+
+    async def discard(self) -> bool:
+        """丢弃未读取的剩余部分；返回连接是否仍可复用"""
+        if self._failed or self.too_large:
+            return False
+        if self._consumed and not self._done and self._pending is None:
+            return False
+        if self._done or self._buffer is not None or self.is_empty:
+            return True
+        try:
+            async for _ in self:
+                pass
+        except Exception:
+            return False
+        return True
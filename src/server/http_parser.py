@@ -0,0 +1,173 @@
+import logging
+
+logger = logging.getLogger('Pretender.Parser')
+
+
+class HeadParseError(ValueError):
+    """请求行或请求头格式错误"""
+
+
+class Headers:
+    """大小写不敏感的多值 header 容器，保留原始顺序、大小写与重复项"""
+
+    __slots__ = ('_items', '_index')
+
+    def __init__(self, items=()):
+        self._items = []   # [(name, value), ...]
+        self._index = {}   # lower name -> [value, ...]
+        for name, value in items:
+            self.add(name, value)
+
+    def add(self, name: str, value: str):
+        self._items.append((name, value))
+        self._index.setdefault(name.lower(), []).append(value)
+
+    def get(self, name: str, default=None):
+        """获取 header 值，重复的 header 以 ', ' 合并（RFC 9110 5.3）"""
+        values = self._index.get(name.lower())
+        if not values:
+            return default
+        return values[0] if len(values) == 1 else ', '.join(values)
+
+    def get_list(self, name: str) -> list:
+        return list(self._index.get(name.lower(), ()))
+
+    def items(self):
+        return list(self._items)
+
+    def keys(self):
+        return [name for name, _ in self._items]
+
+    def __getitem__(self, name: str) -> str:
+        value = self.get(name)
+        if value is None:
+            raise KeyError(name)
+        return value
+
+    def __contains__(self, name) -> bool:
+        return isinstance(name, str) and name.lower() in self._index
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self._items)
+
+    def __repr__(self):
+        return f'Headers({self._items!r})'
+
+
+# ── 解析后端 ─────────────────────────────────────────────
+
+def _split_request_line(line: str):
+    """解析请求行 → (method, target, version)"""
+    parts = line.split(' ', 2)
+    if len(parts) == 3:
+        return parts[0], parts[1], parts[2]
+    if len(parts) == 2:
+        return parts[0], parts[1], 'HTTP/1.1'
+    raise HeadParseError(f'非法的请求行: {line[:64]!r}')
+
+
+class PythonHeadParser:
+    """纯 Python 实现：整块 decode 后按行切分，一次遍历完成解析"""
+
+    name = 'python'
+
+    def parse(self, head: bytes):
+        lines = head.decode('latin-1').lstrip('\r\n').split('\r\n')
+        method, target, version = _split_request_line(lines[0])
+        headers = Headers()
+        for line in lines[1:]:
+            name, sep, value = line.partition(':')
+            if sep:
+                headers.add(name.strip(), value.strip())
+        return method, target, version, headers
+
+
+class _HttptoolsCallbacks:
+    __slots__ = ('url', 'headers')
+
+    def __init__(self):
+        self.url = b''
+        self.headers = Headers()
+
+    def on_url(self, url: bytes):
+        self.url += url
+
+    def on_header(self, name: bytes, value: bytes):
+        self.headers.add(name.decode('latin-1'), value.decode('latin-1').strip())
+
+
+class HttptoolsHeadParser:
+    """基于 httptools（llhttp，C 实现）的解析后端"""
+
+    name = 'httptools'
+
+    def __init__(self):
+        import httptools
+        self._httptools = httptools
+
+    def parse(self, head: bytes):
+        httptools = self._httptools
+        callbacks = _HttptoolsCallbacks()
+        parser = httptools.HttpRequestParser(callbacks)
+        try:
+            parser.feed_data(head.lstrip(b'\r\n'))
+        except httptools.HttpParserUpgrade:
+            pass  # CONNECT / Upgrade：请求头已完整解析
+        except httptools.HttpParserError as e:
+            raise HeadParseError(str(e)) from e
+        method = parser.get_method().decode('latin-1')
+        version = f'HTTP/{parser.get_http_version()}'
+        return method, callbacks.url.decode('latin-1'), version, callbacks.headers
+
+
+class H11HeadParser:
+    """基于 h11 的解析后端（纯 Python，校验更严格）"""
+
+    name = 'h11'
+
+    def __init__(self):
+        import h11
+        self._h11 = h11
+
+    def parse(self, head: bytes):
+        h11 = self._h11
+        conn = h11.Connection(h11.SERVER)
+        conn.receive_data(head.lstrip(b'\r\n'))
+        try:
+            event = conn.next_event()
+        except h11.RemoteProtocolError as e:
+            raise HeadParseError(str(e)) from e
+        if not isinstance(event, h11.Request):
+            raise HeadParseError('请求头不完整')
+        raw_items = getattr(event.headers, 'raw_items', None)
+        items = raw_items() if raw_items else event.headers
+        headers = Headers((k.decode('latin-1'), v.decode('latin-1')) for k, v in items)
+        return (event.method.decode('latin-1'), event.target.decode('latin-1'),
+                f'HTTP/{event.http_version.decode()}', headers)
+
+
+_BACKENDS = {
+    'python': PythonHeadParser,
+    'httptools': HttptoolsHeadParser,
+    'h11': H11HeadParser,
+}
+
+
+def create_head_parser(name: str = 'auto'):
+    """创建请求头解析后端；auto 时优先使用已安装的 httptools"""
+    name = (name or 'auto').lower()
+    if name == 'auto':
+        try:
+            return HttptoolsHeadParser()
+        except ImportError:
+            return PythonHeadParser()
+    if name not in _BACKENDS:
+        raise ValueError(f'未知的解析后端: {name}（可选: auto, {", ".join(_BACKENDS)}）')
+    try:
+        return _BACKENDS[name]()
+    except ImportError:
+        logger.warning(f"未安装 {name}，回退到纯 Python 解析")
+        return PythonHeadParser()
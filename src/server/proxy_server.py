@@ -3,6 +3,7 @@ import httpx
 import os
 import signal
 import sys
+from ..core.body_matcher import RequestBodyView
 from ..core.config_manager import ConfigManager
 from ..handlers.response_handler import ResponseHandler
 
@@ -45,8 +46,18 @@ class ProxyHTTPRequestHandler(http.server.BaseHTTPRequestHandler):
                 self.send_error(405, "Method Not Allowed")
                 return
             
+            # 候选规则带 body 约束时才读取请求体（不超过 1MB），转发时复用
+            content_length = int(self.headers.get('Content-Length', 0) or 0)
+            body = None
+            request_body = None
+            candidates = self.config_manager.mock_candidates(url, method)
+            if self.config_manager.needs_body(candidates):
+                if content_length <= 1024 * 1024:
+                    body = self.rfile.read(content_length) if content_length > 0 else b''
+                request_body = RequestBodyView(body)
+
             # 检查是否需要mock，传入headers进行验证
-            mock_resp = self.config_manager.match_mock(url, method, dict(self.headers))
+            mock_resp = self.config_manager.select_mock(candidates, self.headers, request_body)
             if mock_resp is not None:
                 # 检查是否是header验证失败
                 if isinstance(mock_resp, dict) and mock_resp.get("error") == "header_validation_failed":
@@ -57,12 +68,11 @@ class ProxyHTTPRequestHandler(http.server.BaseHTTPRequestHandler):
                 return
 
             # 代理转发
+            self.config_manager.stats.record_forward(url)
             try:
                 headers = dict(self.headers)
                 headers.pop('Host', None)
-                content_length = int(self.headers.get('Content-Length', 0))
-                body = None
-                if content_length > 0:
+                if body is None and content_length > 0:
                     if content_length > 10 * 1024 * 1024:  # 限制请求体大小为10MB
                         self.send_error(413, "Payload Too Large")
                         return
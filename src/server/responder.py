@@ -0,0 +1,118 @@
+_STATUS_PHRASES = {
+    200: 'OK', 201: 'Created', 204: 'No Content',
+    301: 'Moved Permanently', 302: 'Found', 304: 'Not Modified',
+    400: 'Bad Request', 401: 'Unauthorized', 403: 'Forbidden',
+    404: 'Not Found', 405: 'Method Not Allowed',
+    413: 'Payload Too Large', 431: 'Request Header Fields Too Large',
+    500: 'Internal Server Error', 502: 'Bad Gateway',
+    503: 'Service Unavailable', 504: 'Gateway Timeout',
+}
+
+
+def status_phrase(code: int) -> str:
+    return _STATUS_PHRASES.get(code, 'Unknown')
+
+
+def encode_head(status: int, headers: dict) -> bytes:
+    """序列化 HTTP/1.1 状态行 + 响应头"""
+    lines = [f'HTTP/1.1 {status} {status_phrase(status)}\r\n']
+    for k, v in headers.items():
+        lines.append(f'{k}: {v}\r\n')
+    lines.append('\r\n')
+    return ''.join(lines).encode('latin-1')
+
+
+class PreparedResponse:
+    """内容固定的完整响应，多次发送时复用
+
+    HTTP/1.1 的状态行 + 响应头 + body 按 keep-alive 与否各序列化一次并缓存，
+    之后每次发送只需一次 write；HTTP/2 复用 body 与响应头。
+    """
+
+    __slots__ = ('status', 'headers', 'body', '_wire')
+
+    def __init__(self, status: int, headers: dict, body: bytes):
+        self.status = status
+        self.headers = dict(headers)
+        self.headers.setdefault('Content-Length', str(len(body)))
+        self.body = body
+        self._wire = {}     # keep_alive -> bytes
+
+    def wire(self, keep_alive: bool) -> bytes:
+        data = self._wire.get(keep_alive)
+        if data is None:
+            headers = dict(self.headers)
+            headers['Connection'] = 'keep-alive' if keep_alive else 'close'
+            data = self._wire[keep_alive] = encode_head(self.status, headers) + self.body
+        return data
+
+
+class Http1Responder:
+    """HTTP/1.1 响应写入：状态行/响应头序列化、chunked 分帧与 Connection 头
+
+    与 H2StreamResponder 接口一致，请求处理逻辑无需关心底层协议。
+    version 为请求的协议版本：HTTP/1.0 客户端不支持 chunked（RFC 9112 7.1），
+    长度未知的 body 改为以关闭连接标识结束。
+    """
+
+    def __init__(self, writer, keep_alive: bool = False, version: str = 'HTTP/1.1'):
+        self.writer = writer
+        self.keep_alive = keep_alive
+        self.http10 = version.strip().upper() == 'HTTP/1.0'
+        self._chunked = False
+
+    @property
+    def closing(self) -> bool:
+        return self.writer.is_closing()
+
+    def build_head(self, status: int, headers: dict) -> bytes:
+        """构造状态行 + 响应头"""
+        headers['Connection'] = 'keep-alive' if self.keep_alive else 'close'
+        return encode_head(status, headers)
+
+    async def send(self, status: int, headers: dict, body: bytes):
+        """写入完整响应"""
+        headers.setdefault('Content-Length', str(len(body)))
+        self.writer.write(self.build_head(status, headers))
+        if body:
+            self.writer.write(body)
+        await self.writer.drain()
+
+    async def send_prepared(self, prepared: PreparedResponse):
+        """写入预先序列化的完整响应"""
+        self.writer.write(prepared.wire(self.keep_alive))
+        await self.writer.drain()
+
+    async def start(self, status: int, headers: dict, has_body: bool = True):
+        """仅写入响应头，body 由 write() 流式写入
+
+        未声明长度时使用 chunked 编码；HTTP/1.0 客户端则不分帧，写完 body 后关闭连接。
+        """
+        self._chunked = has_body and not any(k.lower() == 'content-length' for k in headers)
+        if self._chunked and self.http10:
+            self._chunked = False
+            self.keep_alive = False
+        if self._chunked:
+            headers['Transfer-Encoding'] = 'chunked'
+        self.writer.write(self.build_head(status, headers))
+        await self.writer.drain()
+
+    async def write(self, data: bytes):
+        """写入一段 body 并等待 drain() 背压"""
+        if not data:
+            return
+        if self._chunked:
+            # 分帧与数据合并为一次 write，避免每块触发三次 send
+            self.writer.write(b'%x\r\n%b\r\n' % (len(data), data))
+        else:
+            self.writer.write(data)
+        await self.writer.drain()
+
+    async def end(self):
+        if self._chunked:
+            self.writer.write(b'0\r\n\r\n')
+        await self.writer.drain()
+
+    def abort(self):
+        """响应中途失败：响应头可能已发出，只能断开连接"""
+        self.writer.close()
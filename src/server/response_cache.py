@@ -0,0 +1,341 @@
+import asyncio
+import hashlib
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+
+logger = logging.getLogger('Pretender.Cache')
+
+# 默认可缓存的状态码（RFC 9110 15.1）
+CACHEABLE_STATUS = frozenset((200, 203, 204, 300, 301, 308, 404, 405, 410, 414, 501))
+
+# 304 刷新缓存时不应覆盖的表示层头
+_KEEP_ON_REFRESH = frozenset(('content-length', 'content-encoding', 'content-type', 'content-range'))
+
+# 针对单个客户端的响应头，不写入共享缓存（否则会重放给其他客户端）
+_NOT_STORED = frozenset(('set-cookie', 'set-cookie2'))
+
+
+def parse_cache_control(value) -> dict:
+    """解析 Cache-Control → {directive: value or True}，指令名小写"""
+    directives = {}
+    if not value:
+        return directives
+    for part in value.split(','):
+        name, sep, arg = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = arg.strip().strip('"') if sep else True
+    return directives
+
+
+def _seconds(value):
+    try:
+        return max(int(value), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+def _http_date(value):
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+
+def _header(headers: dict, name: str):
+    for k, v in headers.items():
+        if k.lower() == name:
+            return v
+    return None
+
+
+def freshness_lifetime(headers: dict, default_ttl: float = 0):
+    """计算响应的新鲜期（秒），优先级: s-maxage > max-age > Expires - Date > default_ttl"""
+    cc = parse_cache_control(_header(headers, 'cache-control'))
+    if 'no-cache' in cc:
+        return 0
+    for directive in ('s-maxage', 'max-age'):
+        seconds = _seconds(cc.get(directive))
+        if seconds is not None:
+            return seconds
+    expires = _header(headers, 'expires')
+    if expires is not None:
+        expires_at = _http_date(expires)
+        if expires_at is None:
+            return 0  # 非法的 Expires 视为已过期
+        date = _http_date(_header(headers, 'date')) or time.time()
+        return max(expires_at - date, 0)
+    return default_ttl
+
+
+def is_storable(status: int, request_headers, response_headers: dict, default_ttl: float = 0) -> bool:
+    """按共享缓存语义判断响应能否写入缓存（RFC 9111 3）"""
+    if status not in CACHEABLE_STATUS:
+        return False
+    req_cc = parse_cache_control(request_headers.get('cache-control'))
+    cc = parse_cache_control(_header(response_headers, 'cache-control'))
+    if 'no-store' in req_cc or 'no-store' in cc or 'private' in cc:
+        return False
+    if _header(response_headers, 'vary') == '*':
+        return False
+    if 'authorization' in request_headers and not (
+            'public' in cc or 's-maxage' in cc or 'must-revalidate' in cc):
+        return False
+    # 没有新鲜期也没有校验器的响应存下来也无法复用
+    has_validator = (_header(response_headers, 'etag') is not None
+                     or _header(response_headers, 'last-modified') is not None)
+    return has_validator or freshness_lifetime(response_headers, default_ttl) > 0
+
+
+def wants_revalidation(request_headers) -> bool:
+    """客户端要求跳过新鲜缓存（no-cache / max-age=0 / Pragma: no-cache）"""
+    cc = parse_cache_control(request_headers.get('cache-control'))
+    if 'no-cache' in cc or _seconds(cc.get('max-age')) == 0:
+        return True
+    return 'no-cache' in (request_headers.get('pragma') or '').lower()
+
+
+class CacheEntry:
+    """一条缓存的上游响应，body 为原始（未解码）字节"""
+
+    __slots__ = ('status', 'headers', 'body', 'vary', 'stored_at', 'lifetime', 'initial_age', 'size')
+
+    def __init__(self, status: int, headers: dict, body: bytes, vary: dict, lifetime: float):
+        self.status = status
+        self.headers = {k: v for k, v in headers.items() if k.lower() not in _NOT_STORED}
+        self.body = body
+        self.vary = vary            # Vary 列出的请求头 → 存储时的请求值
+        self.stored_at = time.time()
+        self.lifetime = lifetime
+        self.initial_age = _seconds(_header(headers, 'age')) or 0
+        # 写入时确定的占用字节数，LRU 记账以此为准（304 刷新响应头不改变）
+        self.size = len(body) + sum(len(k) + len(v) for k, v in self.headers.items()) + 64
+
+    @property
+    def age(self) -> int:
+        return int(self.initial_age + max(time.time() - self.stored_at, 0))
+
+    @property
+    def is_fresh(self) -> bool:
+        return self.age < self.lifetime
+
+    @property
+    def etag(self):
+        return _header(self.headers, 'etag')
+
+    @property
+    def last_modified(self):
+        return _header(self.headers, 'last-modified')
+
+    def matches(self, request_headers) -> bool:
+        """Vary 中列出的请求头与存储时一致才可复用"""
+        return all(request_headers.get(name) == value for name, value in self.vary.items())
+
+    def refresh(self, headers, lifetime: float):
+        """收到 304 后用新的响应头更新元数据（RFC 9111 4.3.4）"""
+        merged = {k: v for k, v in self.headers.items()}
+        lower = {k.lower(): k for k in merged}
+        for k, v in headers.items():
+            if k.lower() in _KEEP_ON_REFRESH or k.lower() in _NOT_STORED:
+                continue
+            merged.pop(lower.get(k.lower(), k), None)
+            merged[k] = v
+        self.headers = merged
+        self.stored_at = time.time()
+        self.lifetime = lifetime
+        self.initial_age = _seconds(_header(merged, 'age')) or 0
+
+
+def vary_values(response_headers: dict, request_headers) -> dict:
+    vary = _header(response_headers, 'vary')
+    if not vary:
+        return {}
+    return {name.strip().lower(): request_headers.get(name.strip())
+            for name in vary.split(',') if name.strip()}
+
+
+class ResponseCache:
+    """按字节数限制的内存 LRU，超出时可溢出到磁盘目录
+
+    键为 URL；每个 URL 仅保留一个变体（Vary 不一致视为未命中，新响应覆盖旧变体）。
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024,
+                 max_entry_size: int = 8 * 1024 * 1024,
+                 disk_dir: str = None,
+                 disk_max_bytes: int = 1024 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.max_entry_size = min(max_entry_size, max_bytes)
+        self._memory = OrderedDict()  # url -> CacheEntry
+        self._memory_bytes = 0
+
+        # 磁盘溢出：每个进程独立的子目录，退出时删除
+        self._disk_dir = None
+        self.disk_max_bytes = disk_max_bytes
+        self._disk = OrderedDict()    # url -> (文件路径, 文件大小)
+        self._disk_bytes = 0
+        self._spilling = {}           # url -> 正在写入的文件路径（只有最近一次有效）
+        self._spill_seq = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._disk_dir = tempfile.mkdtemp(dir=disk_dir, prefix='spill-')
+
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.stores = 0
+        self.evictions = 0
+        self.spills = 0
+        self.disk_hits = 0
+
+    # ── 查找 / 写入 ──────────────────────────────────────
+
+    async def get(self, url: str, request_headers):
+        entry = self._memory.get(url)
+        if entry is not None:
+            self._memory.move_to_end(url)
+        elif url in self._disk:
+            entry = await self._load_spilled(url)
+            if entry is not None:
+                self.disk_hits += 1
+                current = self._memory.get(url)
+                if current is not None:
+                    # 读盘期间已写入了更新的响应
+                    entry = current
+                else:
+                    await self._insert(url, entry)
+        if entry is not None and not entry.matches(request_headers):
+            return None
+        return entry
+
+    async def put(self, url: str, entry: CacheEntry):
+        if entry.size > self.max_entry_size:
+            return
+        self.stores += 1
+        await self._insert(url, entry)
+
+    async def _insert(self, url: str, entry: CacheEntry):
+        self._remove(url)
+        self._memory[url] = entry
+        self._memory_bytes += entry.size
+        while self._memory_bytes > self.max_bytes and self._memory:
+            old_url, old = self._memory.popitem(last=False)
+            self._memory_bytes -= old.size
+            self.evictions += 1
+            if self._disk_dir is not None:
+                await self._spill(old_url, old)
+
+    def _remove(self, url: str):
+        old = self._memory.pop(url, None)
+        if old is not None:
+            self._memory_bytes -= old.size
+        self._drop_disk(url)
+        # 进行中的落盘随之作废
+        self._spilling.pop(url, None)
+
+    def _drop_disk(self, url: str):
+        spilled = self._disk.pop(url, None)
+        if spilled is not None:
+            self._disk_bytes -= spilled[1]
+            self._unlink(spilled[0])
+
+    # ── 磁盘溢出 ─────────────────────────────────────────
+
+    def _path(self, url: str) -> str:
+        """每次落盘使用新的文件名，同一 URL 并发落盘时互不覆盖"""
+        self._spill_seq += 1
+        name = hashlib.sha1(url.encode()).hexdigest()
+        return os.path.join(self._disk_dir, f'{name}-{self._spill_seq}')
+
+    @staticmethod
+    def _unlink(path: str):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+    async def _spill(self, url: str, entry: CacheEntry):
+        if not entry.is_fresh and entry.etag is None and entry.last_modified is None:
+            return  # 已过期且无法重新校验，不值得落盘
+        data = pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.disk_max_bytes:
+            return
+        path = self._spilling[url] = self._path(url)
+        try:
+            await asyncio.to_thread(self._write_file, path, data)
+        except OSError as e:
+            logger.warning(f"缓存落盘失败: {e}")
+            if self._spilling.get(url) == path:
+                del self._spilling[url]
+            return
+        # 写盘期间该 URL 可能已重新写入内存或再次落盘，这份数据已过时
+        if self._spilling.get(url) != path or url in self._memory:
+            self._unlink(path)
+            return
+        del self._spilling[url]
+        self._drop_disk(url)
+        self._disk[url] = (path, len(data))
+        self._disk_bytes += len(data)
+        self.spills += 1
+        while self._disk_bytes > self.disk_max_bytes and self._disk:
+            _, (old_path, size) = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            self._unlink(old_path)
+
+    @staticmethod
+    def _write_file(path: str, data: bytes):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _read_file(path: str) -> bytes:
+        with open(path, 'rb') as f:
+            return f.read()
+
+    async def _load_spilled(self, url: str):
+        path, size = self._disk.pop(url)
+        self._disk_bytes -= size
+        try:
+            data = await asyncio.to_thread(self._read_file, path)
+            return pickle.loads(data)
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            logger.warning(f"读取落盘缓存失败: {e}")
+            return None
+        finally:
+            self._unlink(path)
+
+    # ── 统计 / 关闭 ──────────────────────────────────────
+
+    def stats(self) -> dict:
+        return {
+            'entries': len(self._memory),
+            'bytes': self._memory_bytes,
+            'disk_entries': len(self._disk),
+            'disk_bytes': self._disk_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'revalidated': self.revalidated,
+            'stores': self.stores,
+            'evictions': self.evictions,
+            'spills': self.spills,
+            'disk_hits': self.disk_hits,
+        }
+
+    def close(self):
+        s = self.stats()
+        if s['hits'] or s['misses'] or s['revalidated']:
+            logger.info(f"响应缓存: 命中 {s['hits']}, 未命中 {s['misses']}, "
+                        f"304 重新校验 {s['revalidated']}, 写入 {s['stores']}, 淘汰 {s['evictions']}")
+        self._memory.clear()
+        self._disk.clear()
+        if self._disk_dir is not None:
+            shutil.rmtree(self._disk_dir, ignore_errors=True)
@@ -0,0 +1,145 @@
+import asyncio
+import logging
+
+logger = logging.getLogger('Pretender.Tunnel')
+
+
+class _Activity:
+    """隧道两个方向共享的最近一次收到数据的时间，用于空闲超时"""
+
+    __slots__ = ('loop', 'last')
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.last = loop.time()
+
+
+class _RelayProtocol(asyncio.Protocol):
+    """把收到的数据直接写入对端 transport，不经过 StreamReader 缓冲
+
+    写缓冲满时暂停读取对端（双向背压），任一端断开即关闭另一端。
+    对端尚未就绪时（上游先发数据的协议，如 SMTP / SSH 的欢迎信息）暂停读取，
+    期间已收到的数据先缓存，就绪后转发再继续读取。
+    """
+
+    def __init__(self, done: asyncio.Future, activity: _Activity, chained=None):
+        self.transport = None
+        self.peer = None
+        self.eof = False
+        self._early = []
+        self._done = done
+        self._activity = activity
+        # 被替换掉的原协议（StreamReaderProtocol），断开时需通知它以释放 writer.wait_closed()
+        self._chained = chained
+
+    def connection_made(self, transport):
+        self.transport = transport
+        if self.peer is None:
+            transport.pause_reading()
+
+    def attach(self, peer):
+        self.peer = peer
+        if self._early:
+            peer.write(b''.join(self._early))
+            self._early.clear()
+        if self.eof:
+            # 就绪前对方已发送 EOF
+            if peer.can_write_eof():
+                peer.write_eof()
+            return
+        self.transport.resume_reading()
+
+    def data_received(self, data):
+        self._activity.last = self._activity.loop.time()
+        if self.peer is None:
+            self._early.append(data)
+            return
+        self.peer.write(data)
+
+    def eof_received(self):
+        self.eof = True
+        if self.peer is None:
+            return True
+        # 两个方向都已结束，关闭隧道
+        if getattr(self.peer.get_protocol(), 'eof', False):
+            self.transport.close()
+            return False
+        # 半关闭：转发 EOF 后继续接收另一方向的数据
+        if self.peer.can_write_eof():
+            self.peer.write_eof()
+            return True
+        return False
+
+    def connection_lost(self, exc):
+        if self.peer is not None:
+            self.peer.close()
+        if self._chained is not None:
+            self._chained.connection_lost(exc)
+        if not self._done.done():
+            self._done.set_result(None)
+
+    def pause_writing(self):
+        self.peer.pause_reading()
+
+    def resume_writing(self):
+        self.peer.resume_reading()
+
+
+async def relay(reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                host: str, port: int, timeout: float = 30, idle_timeout: float = 300) -> bool:
+    """在 CONNECT 连接上建立直连隧道，双向原样转发字节直到任一方断开
+
+    上游连接失败返回 False（尚未向客户端发送 200，调用方可返回错误）。
+    两个方向都超过 idle_timeout 秒没有数据时关闭隧道，0 表示不限制。
+    """
+    loop = asyncio.get_running_loop()
+    client_transport = writer.transport
+    upstream_done = loop.create_future()
+    client_done = loop.create_future()
+    activity = _Activity(loop)
+
+    upstream_proto = _RelayProtocol(upstream_done, activity)
+    try:
+        upstream_transport, _ = await asyncio.wait_for(
+            loop.create_connection(lambda: upstream_proto, host, port),
+            timeout=timeout,
+        )
+    except (OSError, asyncio.TimeoutError) as e:
+        logger.warning(f"隧道连接上游失败 ({host}:{port}): {e}")
+        return False
+
+    try:
+        writer.write(b'HTTP/1.1 200 Connection Established\r\n\r\n')
+        await writer.drain()
+    except (ConnectionResetError, BrokenPipeError):
+        upstream_transport.close()
+        raise
+
+    # 之后收到的数据直接由 client_proto 转发；客户端可能在收到 200 之前就发出了 ClientHello，
+    # 结束 reader 后取出其中已缓冲的数据先行转发
+    client_proto = _RelayProtocol(client_done, activity, chained=client_transport.get_protocol())
+    client_proto.transport = client_transport
+    client_transport.pause_reading()
+    client_transport.set_protocol(client_proto)
+    reader.feed_eof()
+    pending = await reader.read()
+
+    client_proto.attach(upstream_transport)
+    upstream_proto.attach(client_transport)
+    if pending:
+        upstream_transport.write(pending)
+
+    waiters = (upstream_done, client_done)
+    while True:
+        wait = None
+        if idle_timeout:
+            wait = activity.last + idle_timeout - loop.time()
+            if wait <= 0:
+                logger.info(f"隧道空闲超时，关闭: {host}:{port}")
+                break
+        done, _ = await asyncio.wait(waiters, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+        if done:
+            break
+    upstream_transport.close()
+    client_transport.close()
+    return True
@@ -0,0 +1,322 @@
+import asyncio
+import contextlib
+import importlib.util
+import logging
+import socket
+import time
+import weakref
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+import httpcore
+import httpx
+
+logger = logging.getLogger('Pretender.Upstream')
+
+
+class _CachingDNSBackend(httpcore.AsyncNetworkBackend):
+    """带 DNS 结果缓存的网络后端，同时统计新建的上游 TCP 连接数"""
+
+    def __init__(self, ttl: float = 60.0):
+        self._backend = httpcore.AnyIOBackend()
+        self._ttl = ttl
+        self._cache = {}  # (host, port) -> (expire_at, [ip, ...])
+        self.connections_opened = 0
+
+    async def _resolve(self, host, port):
+        if self._ttl <= 0:
+            return [host]
+        try:
+            socket.inet_pton(socket.AF_INET6 if ':' in host else socket.AF_INET, host)
+            return [host]  # 已是 IP，无需解析
+        except OSError:
+            pass
+
+        key = (host, port)
+        cached = self._cache.get(key)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+
+        loop = asyncio.get_running_loop()
+        try:
+            infos = await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        except OSError as e:
+            # 与 httpcore 默认后端保持一致，解析失败映射为 ConnectError
+            raise httpcore.ConnectError(str(e)) from e
+        ips = list(dict.fromkeys(info[4][0] for info in infos))
+        self._cache[key] = (time.monotonic() + self._ttl, ips)
+        return ips
+
+    async def connect_tcp(self, host, port, timeout=None,
+                          local_address=None, socket_options=None):
+        ips = await self._resolve(host, port)
+        last_exc = None
+        for ip in ips:
+            try:
+                stream = await self._backend.connect_tcp(
+                    ip, port, timeout=timeout,
+                    local_address=local_address, socket_options=socket_options,
+                )
+                self.connections_opened += 1
+                return stream
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                last_exc = e
+        # 所有地址均失败，丢弃缓存以便下次重新解析
+        self._cache.pop((host, port), None)
+        if last_exc is None:
+            raise httpcore.ConnectError(f'{host} 没有可用的地址')
+        raise last_exc
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return await self._backend.connect_unix_socket(
+            path, timeout=timeout, socket_options=socket_options)
+
+    async def sleep(self, seconds):
+        await self._backend.sleep(seconds)
+
+
+# httpcore 异常 → httpx 异常，子类在前（与 httpx.AsyncHTTPTransport 的映射一致）
+_EXCEPTION_MAP = (
+    (httpcore.ConnectTimeout, httpx.ConnectTimeout),
+    (httpcore.ReadTimeout, httpx.ReadTimeout),
+    (httpcore.WriteTimeout, httpx.WriteTimeout),
+    (httpcore.PoolTimeout, httpx.PoolTimeout),
+    (httpcore.TimeoutException, httpx.TimeoutException),
+    (httpcore.ConnectError, httpx.ConnectError),
+    (httpcore.ReadError, httpx.ReadError),
+    (httpcore.WriteError, httpx.WriteError),
+    (httpcore.NetworkError, httpx.NetworkError),
+    (httpcore.ProxyError, httpx.ProxyError),
+    (httpcore.UnsupportedProtocol, httpx.UnsupportedProtocol),
+    (httpcore.LocalProtocolError, httpx.LocalProtocolError),
+    (httpcore.RemoteProtocolError, httpx.RemoteProtocolError),
+    (httpcore.ProtocolError, httpx.ProtocolError),
+)
+
+
+@contextlib.contextmanager
+def _map_httpcore_exceptions():
+    try:
+        yield
+    except Exception as e:
+        for source, target in _EXCEPTION_MAP:
+            if isinstance(e, source):
+                raise target(str(e)) from e
+        raise
+
+
+class _ResponseStream(httpx.AsyncByteStream):
+    """上游响应 body：关闭时通知 transport 请求已结束"""
+
+    def __init__(self, stream, transport: '_PoolTransport'):
+        self._stream = stream
+        self._transport = transport
+        self._closed = False
+
+    async def __aiter__(self):
+        with _map_httpcore_exceptions():
+            async for part in self._stream:
+                yield part
+
+    async def aclose(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            if hasattr(self._stream, 'aclose'):
+                await self._stream.aclose()
+        finally:
+            await self._transport.release()
+
+
+class _PoolTransport(httpx.AsyncBaseTransport):
+    """单个上游 origin 的 transport：把 httpx 请求交给 httpcore.AsyncConnectionPool
+
+    请求与异常的转换同 httpx.AsyncHTTPTransport，区别是连接池由调用方创建（可指定
+    network_backend），并记录进行中的请求数：被淘汰时等最后一个响应关闭后再关闭连接池。
+    """
+
+    def __init__(self, pool: httpcore.AsyncConnectionPool, owner: 'UpstreamPool'):
+        self.pool = pool
+        self.active = 0
+        self.retired = False
+        self._owner = owner
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        core_request = httpcore.Request(
+            method=request.method,
+            url=httpcore.URL(
+                scheme=request.url.raw_scheme,
+                host=request.url.raw_host,
+                port=request.url.port,
+                target=request.url.raw_path,
+            ),
+            headers=request.headers.raw,
+            content=request.stream,
+            extensions=request.extensions,
+        )
+        self.active += 1
+        try:
+            with _map_httpcore_exceptions():
+                resp = await self.pool.handle_async_request(core_request)
+        except BaseException:
+            await self.release()
+            raise
+        self._owner._record(resp.extensions.get('network_stream'))
+        return httpx.Response(
+            status_code=resp.status,
+            headers=resp.headers,
+            stream=_ResponseStream(resp.stream, self),
+            extensions=resp.extensions,
+        )
+
+    async def release(self):
+        self.active -= 1
+        if self.retired and self.active == 0:
+            await self.pool.aclose()
+
+    async def retire(self):
+        """从连接池淘汰：没有进行中的请求时立即关闭，否则由最后一个响应关闭"""
+        self.retired = True
+        if self.active == 0:
+            await self.pool.aclose()
+
+    async def aclose(self):
+        await self.pool.aclose()
+
+
+class UpstreamPool:
+    """上游连接池：按 origin 复用 httpx.AsyncClient，支持 keep-alive、HTTP/2 与 DNS 缓存
+
+    origin 数量超过 max_hosts 时按最近最少使用淘汰，关闭其空闲连接。
+    """
+
+    def __init__(self, max_connections_per_host: int = 20,
+                 keepalive_expiry: float = 30.0,
+                 http2: bool = False,
+                 dns_ttl: float = 60.0,
+                 timeout: float = 30.0,
+                 max_hosts: int = 256):
+        self.max_connections_per_host = max_connections_per_host
+        self.keepalive_expiry = keepalive_expiry
+        self.timeout = timeout
+        self.max_hosts = max(1, max_hosts)
+
+        if http2 and importlib.util.find_spec('h2') is None:
+            logger.warning("未安装 h2，上游 HTTP/2 已禁用 (pip install httpx[http2])")
+            http2 = False
+        self.http2 = http2
+
+        self._backend = _CachingDNSBackend(ttl=dns_ttl)
+        self._ssl_context = httpx.create_ssl_context(verify=False)
+        self._clients = OrderedDict()  # origin -> (httpx.AsyncClient, _PoolTransport)，按最近使用排序
+        self._retiring = set()          # 淘汰后仍在关闭中的任务
+        self._streams = weakref.WeakSet()  # 已经承载过请求的上游连接，用于统计复用
+        self._requests = 0
+        self._reused = 0
+        self._evicted = 0
+        self._closed = False
+
+    def _origin(self, url: str) -> str:
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}".lower()
+
+    def _new_client(self):
+        pool = httpcore.AsyncConnectionPool(
+            ssl_context=self._ssl_context,
+            max_connections=self.max_connections_per_host,
+            max_keepalive_connections=self.max_connections_per_host,
+            keepalive_expiry=self.keepalive_expiry,
+            http1=True,
+            http2=self.http2,
+            network_backend=self._backend,
+        )
+        transport = _PoolTransport(pool, self)
+        client = httpx.AsyncClient(
+            transport=transport,
+            # 代理不跟随重定向：3xx 原样返回客户端，由客户端重新发起（流式请求体也无法重放）
+            follow_redirects=False,
+            timeout=self.timeout,
+            # 不读取 HTTP(S)_PROXY / ALL_PROXY 等环境变量：环境代理会为匹配的 URL 另建传输层，
+            # 绕过本连接池与 DNS 缓存（客户端常把这些变量指向 Pretender 自身，还会形成回环）。
+            # 传入 transport 时 httpx 目前也会忽略环境代理，这里显式关闭，不依赖其版本行为
+            trust_env=False,
+        )
+        return client, transport
+
+    def _record(self, stream):
+        """每个上游请求记录一次：连接此前已承载过请求即为复用"""
+        self._requests += 1
+        if stream is None:
+            return
+        if stream in self._streams:
+            self._reused += 1
+        else:
+            self._streams.add(stream)
+
+    def client_for(self, url: str) -> httpx.AsyncClient:
+        """获取 URL 所属 origin 的长连接 client"""
+        if self._closed:
+            raise RuntimeError('UpstreamPool 已关闭')
+        origin = self._origin(url)
+        entry = self._clients.get(origin)
+        if entry is not None:
+            self._clients.move_to_end(origin)
+            return entry[0]
+        entry = self._clients[origin] = self._new_client()
+        while len(self._clients) > self.max_hosts:
+            _, (_, transport) = self._clients.popitem(last=False)
+            self._evicted += 1
+            task = asyncio.create_task(transport.retire())
+            self._retiring.add(task)
+            task.add_done_callback(self._retiring.discard)
+        return entry[0]
+
+    async def send(self, method, url, headers=None, content=None,
+                   stream: bool = False) -> httpx.Response:
+        """发送请求；stream=True 时不读取 body，调用方需负责 aclose()"""
+        client = self.client_for(url)
+        request = client.build_request(method, url, headers=headers, content=content)
+        return await client.send(request, stream=stream)
+
+    async def request(self, method, url, headers=None, content=None) -> httpx.Response:
+        return await self.send(method, url, headers=headers, content=content)
+
+    def stats(self) -> dict:
+        """连接池现状与累计计数"""
+        connections = idle = active = 0
+        for _, transport in self._clients.values():
+            active += transport.active
+            for conn in transport.pool.connections:
+                connections += 1
+                if conn.is_idle():
+                    idle += 1
+        return {
+            'hosts': len(self._clients),
+            'max_hosts': self.max_hosts,
+            'evicted_hosts': self._evicted,
+            'connections': connections,
+            'idle_connections': idle,
+            'active_requests': active,
+            'requests': self._requests,
+            'connections_opened': self._backend.connections_opened,
+            'connections_reused': self._reused,
+        }
+
+    async def aclose(self):
+        """关闭所有上游连接"""
+        if self._closed:
+            return
+        self._closed = True
+        s = self.stats()
+        clients, self._clients = list(self._clients.values()), OrderedDict()
+        for client, _ in clients:
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.debug(f"关闭上游连接异常: {e}")
+        if self._retiring:
+            await asyncio.gather(*self._retiring, return_exceptions=True)
+        logger.info(f"上游连接池已关闭: 请求 {s['requests']} 次, "
+                    f"新建连接 {s['connections_opened']}, 复用 {s['connections_reused']}, "
+                    f"淘汰主机 {s['evicted_hosts']}")
@@ -0,0 +1,86 @@
+import logging
+import multiprocessing
+import multiprocessing.connection
+import signal
+import time
+
+logger = logging.getLogger('Pretender.Workers')
+
+# worker 启动后存活不足该时长即退出，视为启动失败，重启前退避
+_MIN_UPTIME = 5.0
+_MAX_BACKOFF = 30.0
+
+
+class WorkerSupervisor:
+    """多进程 worker 监督者：启动 N 个 worker，异常退出时自动重启
+
+    每个 worker 独立运行事件循环，并以 SO_REUSEPORT 绑定同一端口，由内核分发连接。
+    """
+
+    def __init__(self, target, workers: int):
+        self.target = target          # target(worker_id)，在子进程中运行
+        self.workers = workers
+        self._procs = {}              # worker_id -> Process
+        self._started_at = {}         # worker_id -> 启动时间
+        self._failures = {}           # worker_id -> 连续快速失败次数
+        self._stopping = False
+
+    def _spawn(self, worker_id: int):
+        proc = multiprocessing.Process(target=self.target, args=(worker_id,),
+                                       name=f'pretender-worker-{worker_id}')
+        proc.start()
+        self._procs[worker_id] = proc
+        self._started_at[worker_id] = time.monotonic()
+        logger.info(f"worker {worker_id} 已启动 (pid {proc.pid})")
+
+    def _on_signal(self, signum, frame):
+        self._stopping = True
+
+    def run(self):
+        signal.signal(signal.SIGINT, self._on_signal)
+        signal.signal(signal.SIGTERM, self._on_signal)
+
+        for worker_id in range(self.workers):
+            self._spawn(worker_id)
+
+        pending = {}  # worker_id -> 计划重启的时间
+        try:
+            while not self._stopping:
+                sentinels = [p.sentinel for p in self._procs.values() if p.is_alive()]
+                multiprocessing.connection.wait(sentinels, timeout=1.0)
+
+                now = time.monotonic()
+                for worker_id, proc in list(self._procs.items()):
+                    if proc.is_alive() or worker_id in pending or self._stopping:
+                        continue
+                    uptime = now - self._started_at[worker_id]
+                    if uptime < _MIN_UPTIME:
+                        self._failures[worker_id] = self._failures.get(worker_id, 0) + 1
+                    else:
+                        self._failures[worker_id] = 0
+                    delay = min(2 ** self._failures[worker_id] - 1, _MAX_BACKOFF)
+                    logger.warning(f"worker {worker_id} (pid {proc.pid}) 已退出 "
+                                   f"(exitcode={proc.exitcode})，{delay:.0f}s 后重启")
+                    pending[worker_id] = now + delay
+
+                for worker_id, at in list(pending.items()):
+                    if now >= at and not self._stopping:
+                        del pending[worker_id]
+                        self._spawn(worker_id)
+        finally:
+            self.stop()
+
+    def stop(self, timeout: float = 10.0):
+        """通知所有 worker 退出，超时未退出的强制结束"""
+        self._stopping = True
+        for proc in self._procs.values():
+            if proc.is_alive():
+                proc.terminate()
+        deadline = time.monotonic() + timeout
+        for proc in self._procs.values():
+            proc.join(max(deadline - time.monotonic(), 0))
+            if proc.is_alive():
+                logger.warning(f"worker pid {proc.pid} 未能按时退出，强制结束")
+                proc.kill()
+                proc.join()
+        logger.info("所有 worker 已退出")
@@ -0,0 +1,114 @@
+import asyncio
+import gzip
+
+import pytest
+
+from src.core.config_manager import ConfigManager
+from src.core.data_generator import DataGenerator
+from src.server.async_proxy import AsyncProxyServer
+from src.server.upstream import UpstreamPool
+
+PAYLOAD = b'{"items": [' + b'"hello", ' * 500 + b'"end"]}'
+
+
+async def gzip_upstream(reader, writer):
+    """按 keep-alive 逐个应答，body 为 gzip 压缩后的 PAYLOAD"""
+    body = gzip.compress(PAYLOAD)
+    try:
+        while await reader.readuntil(b'\r\n\r\n'):
+            writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                         b'Content-Encoding: gzip\r\nContent-Length: %d\r\n\r\n%b' % (len(body), body))
+            await writer.drain()
+    except asyncio.IncompleteReadError:
+        pass
+    writer.close()
+
+
+async def read_response(reader):
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    headers = {k.lower(): v.strip() for k, _, v in (line.partition(':') for line in lines[1:] if line)}
+    return lines[0], headers, await reader.readexactly(int(headers['content-length']))
+
+
+async def echo_upstream(reader, writer):
+    writer.write(await reader.read(100))
+    await writer.drain()
+    writer.close()
+
+
+def make_proxy(tmp_path, **kwargs):
+    config = tmp_path / 'mock_config.yaml'
+    config.write_text('mocks: []\n', encoding='utf-8')
+    return AsyncProxyServer(ConfigManager(str(config), watch='off'), None, DataGenerator(),
+                            host='127.0.0.1', port=0, upstream=UpstreamPool(), **kwargs)
+
+
+@pytest.mark.parametrize('stream_upstream', [False, True])
+def test_gzip_upstream_over_keep_alive(tmp_path, stream_upstream):
+    async def main():
+        upstream = await asyncio.start_server(gzip_upstream, '127.0.0.1', 0)
+        upstream_port = upstream.sockets[0].getsockname()[1]
+        server = make_proxy(tmp_path, stream_upstream=stream_upstream)
+        proxy = await asyncio.start_server(server._handle_client, '127.0.0.1', 0)
+        reader, writer = await asyncio.open_connection(*proxy.sockets[0].getsockname()[:2])
+        try:
+            responses = []
+            for path in ('/a', '/b', '/c'):
+                writer.write(b'GET http://127.0.0.1:%d%b HTTP/1.1\r\nHost: 127.0.0.1\r\n'
+                             b'Accept-Encoding: gzip\r\n\r\n' % (upstream_port, path.encode()))
+                responses.append(await asyncio.wait_for(read_response(reader), 10))
+            return responses
+        finally:
+            writer.close()
+            await server.upstream.aclose()
+            proxy.close()
+            upstream.close()
+
+    for status, headers, body in asyncio.run(main()):
+        assert status == 'HTTP/1.1 200 OK'
+        assert headers['content-encoding'] == 'gzip'
+        assert gzip.decompress(body) == PAYLOAD
+
+
+def test_blind_tunnel_is_counted_as_forward(tmp_path):
+    server = make_proxy(tmp_path)
+
+    async def main():
+        upstream = await asyncio.start_server(echo_upstream, '127.0.0.1', 0)
+        upstream_port = upstream.sockets[0].getsockname()[1]
+        proxy = await asyncio.start_server(server._handle_client, '127.0.0.1', 0)
+        reader, writer = await asyncio.open_connection(*proxy.sockets[0].getsockname()[:2])
+        try:
+            writer.write(b'CONNECT 127.0.0.1:%d HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n' % upstream_port)
+            head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), 10)
+            writer.write(b'ping')
+            return upstream_port, head, await asyncio.wait_for(reader.read(), 10)
+        finally:
+            writer.close()
+            await server.upstream.aclose()
+            proxy.close()
+            upstream.close()
+
+    port, head, echoed = asyncio.run(main())
+    assert head.startswith(b'HTTP/1.1 200') and echoed == b'ping'
+    assert server.config_manager.stats.report()['forwarded'] == {f'https://127.0.0.1:{port}': 1}
+
+
+def test_upstream_pool_ignores_proxy_environment(monkeypatch):
+    for name in ('NO_PROXY', 'no_proxy'):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv('HTTP_PROXY', 'http://127.0.0.1:9')
+    monkeypatch.setenv('ALL_PROXY', 'http://127.0.0.1:9')
+
+    async def main():
+        upstream = await asyncio.start_server(gzip_upstream, '127.0.0.1', 0)
+        pool = UpstreamPool()
+        try:
+            resp = await pool.request('GET', 'http://127.0.0.1:%d/' % upstream.sockets[0].getsockname()[1])
+            return resp.content, pool.stats()['requests']
+        finally:
+            await pool.aclose()
+            upstream.close()
+
+    assert asyncio.run(main()) == (PAYLOAD, 1)
@@ -0,0 +1,109 @@
+import pytest
+
+from src.core.body_matcher import (RequestBodyView, compile_body_matcher, compile_json_path,
+                                   json_equal, select_json)
+
+
+def _test(spec, raw):
+    return compile_body_matcher(spec).test(RequestBodyView(raw))
+
+
+@pytest.mark.parametrize('path, steps', [
+    ('$', ()),
+    ('$.a.b', ('a', 'b')),
+    ('$.items[0].sku', ('items', 0, 'sku')),
+    ('$.items[-1]', ('items', -1)),
+    ("$['a.b'][\"c\\\"d\"]", ('a.b', 'c"d')),
+])
+def test_compile_json_path(path, steps):
+    assert compile_json_path(path) == steps
+
+
+@pytest.mark.parametrize('path', ['a.b', '$.', '$[x]', '$.a[', '$..a'])
+def test_compile_json_path_rejects(path):
+    with pytest.raises(ValueError):
+        compile_json_path(path)
+
+
+def test_select_json_with_wildcards():
+    data = {'items': [{'sku': 'A'}, {'sku': 'B'}, {'name': 'C'}], 'map': {'x': 1, 'y': 2}}
+    assert select_json(data, compile_json_path('$.items[*].sku')) == ['A', 'B']
+    assert select_json(data, compile_json_path('$.map.*')) == [1, 2]
+    assert select_json(data, compile_json_path('$.items[5]')) == []
+    assert select_json(data, compile_json_path('$.items.sku')) == []
+
+
+@pytest.mark.parametrize('actual, expected, equal', [
+    (1, 1.0, True),
+    (True, 1, False),
+    (0, False, False),
+    (True, True, True),
+    (None, None, True),
+    ({'a': [1, True]}, {'a': [1.0, True]}, True),
+    ({'a': 1, 'b': 2}, {'a': 1}, False),
+    ([1, 2], [1, 2, 3], False),
+    ('1', 1, False),
+])
+def test_json_equal(actual, expected, equal):
+    assert json_equal(actual, expected) is equal
+
+
+def test_json_constraints():
+    spec = {'json': {'$.user.name': 'alice', '$.items[*].sku': 'A-1'}}
+    assert _test(spec, b'{"user": {"name": "alice"}, "items": [{"sku": "B"}, {"sku": "A-1"}]}')
+    assert not _test(spec, b'{"user": {"name": "alice"}, "items": [{"sku": "B"}]}')
+    assert not _test(spec, b'{"user": {"name": "bob"}, "items": [{"sku": "A-1"}]}')
+    assert not _test(spec, b'{"user": ')
+    assert _test({'json': {'$': None}}, b'null')
+    assert not _test({'json': {'$': None}}, b'not json')
+
+
+def test_form_constraints():
+    spec = {'form': {'action': '^login$', 'remember': {'equals': '1'}}}
+    assert _test(spec, b'user=a&action=login&remember=1')
+    assert _test(spec, b'action=logout&action=login&remember=1')
+    assert not _test(spec, b'action=login')
+    assert not _test(spec, b'action=loginx&remember=1')
+    # 缺少的字段按空值校验，与 headers 一致
+    assert _test({'form': {'next': {'equals': ''}}}, b'action=login')
+
+
+def test_regex_runs_on_raw_bytes():
+    spec = {'regex': '"vip":\\s*true'}
+    assert _test(spec, b'{"vip":  true}')
+    assert not _test(spec, b'{"vip": false}')
+    assert _test({'regex': 'é'}, 'café'.encode('utf-8'))
+
+
+def test_all_constraints_must_hold():
+    spec = {'regex': 'vip', 'json': {'$.vip': True}}
+    assert _test(spec, b'{"vip": true}')
+    assert not _test(spec, b'{"vip": 1}')
+
+
+def test_oversized_or_missing_body_never_matches():
+    matcher = compile_body_matcher({'regex': ''})
+    assert not matcher.test(RequestBodyView(None))
+    assert not matcher.test(None)
+    assert matcher.test(RequestBodyView(b''))
+
+
+def test_view_parses_once():
+    view = RequestBodyView(b'{"a": 1}')
+    assert view.json is view.json
+    assert view.form is view.form
+
+
+@pytest.mark.parametrize('spec, error', [
+    ({'xml': '/a'}, ValueError),
+    ('regex', ValueError),
+    ({'json': {'a': 1}}, ValueError),
+])
+def test_invalid_specs(spec, error):
+    with pytest.raises(error):
+        compile_body_matcher(spec)
+
+
+def test_empty_spec_compiles_to_none():
+    assert compile_body_matcher(None) is None
+    assert compile_body_matcher({}) is None
@@ -0,0 +1,84 @@
+import pytest
+
+from src.core.config_manager import ConfigManager
+
+CACHE_ONLY = r"""
+cache:
+  - url: ^https://api\.example\.com/v1/.*$
+  - host: "*.cdn.example.com"
+    ttl: 300
+  - url: ^https://both\.example\.com/static/.*$
+    host: both.example.com
+"""
+
+
+@pytest.fixture
+def cache_only(tmp_path):
+    path = tmp_path / 'mock_config.yaml'
+    path.write_text(CACHE_ONLY, encoding='utf-8')
+    return ConfigManager(str(path), watch='off')
+
+
+def test_https_host_with_only_cache_rules_is_intercepted(cache_only):
+    assert cache_only.cache_policy('https://api.example.com/v1/a') is not None
+    assert cache_only.could_match_origin('https://api.example.com')
+    assert cache_only.could_match_origin('https://img.cdn.example.com:8443')
+    assert cache_only.could_match_origin('https://both.example.com')
+
+
+def test_hosts_without_rules_are_still_tunnelled(cache_only):
+    assert not cache_only.could_match_origin('https://other.example.com')
+    assert not cache_only.could_match_origin('https://api.example.com:8443')
+    assert not cache_only.could_match_origin('https://cdn.example.com')
+
+
+def test_cache_rules_ignored_when_cache_disabled(cache_only):
+    assert not cache_only.could_match_origin('https://api.example.com', cache=False)
+    assert not cache_only.could_match_origin('https://img.cdn.example.com', cache=False)
+
+
+MOCKS = r"""
+mocks:
+  - url: ^https://api\.example\.com/users$
+    method: GET
+    response: {code: 200, msg: config}
+"""
+
+
+@pytest.fixture
+def with_mocks(tmp_path):
+    path = tmp_path / 'mock_config.yaml'
+    path.write_text(MOCKS, encoding='utf-8')
+    manager = ConfigManager(str(path), watch='off')
+    manager.reload()
+    return manager
+
+
+def _rule(url, msg='runtime'):
+    return {'url': url, 'method': 'GET', 'response': {'code': 200, 'msg': msg}}
+
+
+def test_runtime_changes_only_rebuild_the_runtime_layer(with_mocks, monkeypatch):
+    file_stats = with_mocks.match_mock('https://api.example.com/users', 'GET', {})
+    attached = []
+    original = with_mocks.stats.attach
+    monkeypatch.setattr(with_mocks.stats, 'attach', lambda rules, layer='config': (
+        attached.append(layer), original(rules, layer)))
+
+    rule_id = with_mocks.add_rule(_rule(r'^https://rt\.example\.com/x$'))
+    assert with_mocks.match_mock('https://rt.example.com/x', 'GET', {})['msg'] == 'runtime'
+    assert with_mocks.match_mock('https://api.example.com/users', 'GET', {}) == file_stats
+    assert with_mocks.could_match_origin('https://rt.example.com', cache=False)
+    with_mocks.delete_rule(rule_id)
+    assert with_mocks.match_mock('https://rt.example.com/x', 'GET', {}) is None
+    assert not with_mocks.could_match_origin('https://rt.example.com', cache=False)
+    assert attached == ['runtime', 'runtime']
+
+    report = {item['rule']: item['matches'] for item in with_mocks.stats.report()['rules']}
+    assert report == {'GET ^https://api\\.example\\.com/users$': 2}
+
+
+def test_runtime_rules_apply_without_config_file(tmp_path):
+    manager = ConfigManager(str(tmp_path / 'missing.yaml'), watch='off')
+    manager.add_rule(_rule(r'^https://rt\.example\.com/x$'))
+    assert manager.match_mock('https://rt.example.com/x', 'GET', {})['msg'] == 'runtime'
@@ -0,0 +1,59 @@
+import asyncio
+import os
+
+import pytest
+
+from src.core.config_watcher import ConfigWatcher, inotify_available
+
+pytestmark = pytest.mark.skipif(not inotify_available(), reason='需要 inotify')
+
+
+def watch(path, change):
+    """以 inotify 模式监视 path，执行 change() 后返回 reload 被调用的次数"""
+    async def main():
+        reloads = []
+        watcher = ConfigWatcher([str(path)], lambda: reloads.append(1), mode='inotify', debounce=0.05)
+        await watcher.start()
+        assert watcher.mode == 'inotify'
+        try:
+            change()
+            for _ in range(20):
+                await asyncio.sleep(0.05)
+                if reloads:
+                    break
+        finally:
+            await watcher.stop()
+        return len(reloads)
+    return asyncio.run(main())
+
+
+def test_atomic_symlink_swap(tmp_path):
+    """Kubernetes ConfigMap 卷：mock_config.yaml -> ..data/mock_config.yaml，..data 整体替换"""
+    for version in ('..v1', '..v2'):
+        (tmp_path / version).mkdir()
+        (tmp_path / version / 'mock_config.yaml').write_text(f'# {version}\n', encoding='utf-8')
+    os.symlink('..v1', tmp_path / '..data')
+    os.symlink('..data/mock_config.yaml', tmp_path / 'mock_config.yaml')
+
+    def swap():
+        os.symlink('..v2', tmp_path / '..data_tmp')
+        os.rename(tmp_path / '..data_tmp', tmp_path / '..data')
+
+    assert watch(tmp_path / 'mock_config.yaml', swap) == 1
+
+
+def test_symlink_target_edited_in_other_directory(tmp_path):
+    (tmp_path / 'real').mkdir()
+    (tmp_path / 'conf').mkdir()
+    target = tmp_path / 'real' / 'rules.yaml'
+    target.write_text('mocks: []\n', encoding='utf-8')
+    os.symlink(target, tmp_path / 'conf' / 'mock_config.yaml')
+
+    assert watch(tmp_path / 'conf' / 'mock_config.yaml',
+                 lambda: target.write_text('mocks: [] # edited\n', encoding='utf-8')) == 1
+
+
+def test_unrelated_changes_are_ignored(tmp_path):
+    config = tmp_path / 'mock_config.yaml'
+    config.write_text('mocks: []\n', encoding='utf-8')
+    assert watch(config, lambda: (tmp_path / 'other.yaml').write_text('x', encoding='utf-8')) == 0
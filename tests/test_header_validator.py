@@ -0,0 +1,77 @@
+import re
+
+import pytest
+
+from src.core.header_validator import HeaderValidator, classify, compile_header_validators, validate_headers
+
+
+@pytest.mark.parametrize('pattern, expected', [
+    ('^Bearer ', ('prefix', 'Bearer ')),
+    ('^Bearer .*', ('prefix', 'Bearer ')),
+    ('^Bearer .*$', ('prefix', 'Bearer ')),
+    ('^prod$', ('equals', 'prod')),
+    ('^$', ('equals', '')),
+    ('json$', ('suffix', 'json')),
+    ('token', ('contains', 'token')),
+    ('token.*', ('contains', 'token')),
+    ('^a\\.b\\-c$', ('equals', 'a.b-c')),
+    ('^v1\\/x', ('prefix', 'v1/x')),
+    ('^ab?c', ('regex', '^ab?c')),
+    ('^a+', ('regex', '^a+')),
+    ('^x{2}$', ('regex', '^x{2}$')),
+    ('\\d+', ('regex', '\\d+')),
+    ('^a\\b', ('regex', '^a\\b')),
+    ('^(a|b)$', ('regex', '^(a|b)$')),
+    ('^a.c$', ('regex', '^a.c$')),
+    ('^a$b', ('regex', '^a$b')),
+    ('a\\', ('regex', 'a\\')),
+])
+def test_classify(pattern, expected):
+    assert classify(pattern) == expected
+
+
+VALUES = ['', 'prod', 'production', 'Bearer abc', 'bearer abc', 'x Bearer ', 'a.b-c', 'aXb-c',
+          'v1/x/y', 'application/json', 'application/json; charset=utf-8', 'token', 'my-token-1',
+          'ab', 'ac', 'abc', 'xx', 'a\nb']
+LITERAL_PATTERNS = ['^Bearer ', '^Bearer .*', '^prod$', '^$', 'json$', 'token', 'token.*',
+                    '^a\\.b\\-c$', '^v1\\/x', '^ab?c', '\\d+', '']
+
+
+@pytest.mark.parametrize('pattern', LITERAL_PATTERNS)
+def test_fast_path_agrees_with_re_search(pattern):
+    validator = HeaderValidator('X-Test', pattern)
+    for value in VALUES:
+        assert validator.test(value) == (re.search(pattern, value) is not None), (pattern, value)
+
+
+@pytest.mark.parametrize('spec, matching, other', [
+    ({'equals': 'a.b'}, 'a.b', 'aXb'),
+    ({'prefix': '^x'}, '^xy', 'xy'),
+    ({'suffix': '.*'}, 'a.*', 'ab'),
+    ({'contains': '[1]'}, 'v[1]w', 'v1w'),
+    ({'regex': '^v[0-9]$'}, 'v3', 'v33'),
+    ({'equals': 42}, '42', '420'),
+])
+def test_explicit_kinds(spec, matching, other):
+    validator = HeaderValidator('X-Test', spec)
+    assert validator.test(matching)
+    assert not validator.test(other)
+
+
+@pytest.mark.parametrize('spec', [{'equals': 'a', 'prefix': 'b'}, {'glob': '*'}, {}])
+def test_invalid_explicit_spec(spec):
+    with pytest.raises(ValueError):
+        HeaderValidator('X-Test', spec)
+
+
+def test_validate_headers_is_case_insensitive_and_reports_first_failure():
+    validators = compile_header_validators({'Authorization': '^Bearer ', 'X-Env': {'equals': 'prod'}})
+    assert validate_headers(validators, {'authorization': 'Bearer t', 'X-ENV': 'prod'}) is None
+
+    rejection = validate_headers(validators, {'Authorization': 'Basic t', 'X-Env': 'dev'})
+    assert rejection['error'] == 'header_validation_failed'
+    assert 'Authorization=Basic t' in rejection['message']
+    assert rejection is validators[0].rejection('Basic t')
+
+    rejection = validate_headers(validators, {'Authorization': 'Bearer t'})
+    assert 'X-Env=' in rejection['message']
@@ -0,0 +1,130 @@
+import asyncio
+
+import pytest
+
+from src.server.http_body import BodyTooLarge, MalformedBody, RequestBody
+
+CHUNKED = {'Transfer-Encoding': 'chunked'}
+NEXT_REQUEST = b'GET /next HTTP/1.1\r\n\r\n'
+
+
+def chunked(*parts, trailers=b''):
+    return b''.join(b'%x\r\n%s\r\n' % (len(part), part) for part in parts) + b'0\r\n' + trailers + b'\r\n'
+
+
+def run(coroutine_function, data: bytes, headers=CHUNKED, **kwargs):
+    """在新的事件循环中用装有 data 的 StreamReader 构造 RequestBody，执行 coroutine_function(body, reader)"""
+    async def main():
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        return await coroutine_function(RequestBody(reader, headers, **kwargs), reader)
+    return asyncio.run(main())
+
+
+async def _read(body, reader):
+    return await body.read(), await reader.read()
+
+
+async def _chunks(body, reader):
+    return [data async for data in body]
+
+
+def test_chunked_read_leaves_next_request():
+    data = chunked(b'hello ', b'world') + NEXT_REQUEST
+    assert run(_read, data) == (b'hello world', NEXT_REQUEST)
+
+
+def test_chunk_extensions_and_trailers():
+    data = b'5;name=value\r\nhello\r\n' + chunked(b'!', trailers=b'X-Sum: 1\r\nX-More: 2\r\n') + NEXT_REQUEST
+    assert run(_read, data) == (b'hello!', NEXT_REQUEST)
+
+
+def test_chunked_takes_precedence_over_content_length():
+    headers = {'Content-Length': '3', 'transfer-encoding': 'gzip, Chunked'}
+    body, _ = run(_read, chunked(b'abcdef'), headers=headers)
+    assert body == b'abcdef'
+
+
+def test_iteration_yields_chunks_incrementally():
+    big = b'x' * (RequestBody.CHUNK_SIZE + 10)
+    parts = run(_chunks, chunked(b'a', big, b'b'))
+    assert b''.join(parts) == b'a' + big + b'b'
+    assert len(parts) == 4
+
+
+def test_content_length_body():
+    data = b'0123456789' + NEXT_REQUEST
+    assert run(_read, data, headers={'Content-Length': '10'}) == (b'0123456789', NEXT_REQUEST)
+
+
+def test_too_large_chunked_body_raises_while_reading():
+    with pytest.raises(BodyTooLarge):
+        run(_read, chunked(b'x' * 60, b'y' * 60), max_size=100)
+
+
+def test_declared_length_over_limit_is_rejected_up_front():
+    async def check(body, reader):
+        return body.too_large, await body.discard()
+    assert run(check, b'x' * 200, headers={'Content-Length': '200'}, max_size=100) == (True, False)
+    assert run(check, chunked(b'x' * 200), max_size=100) == (False, False)
+
+
+@pytest.mark.parametrize('data', [
+    b'zz\r\nabc\r\n0\r\n\r\n',
+    b'3\r\nabcdef\r\n0\r\n\r\n',
+])
+def test_malformed_chunked_body(data):
+    with pytest.raises(MalformedBody):
+        run(_read, data)
+
+
+@pytest.mark.parametrize('data', [b'a\r\nabc', b'3\r\nabc', b'3\r\nabc\r\n0\r\n'])
+def test_truncated_chunked_body(data):
+    with pytest.raises(asyncio.IncompleteReadError):
+        run(_read, data)
+
+
+def test_read_limited_within_limit():
+    async def check(body, reader):
+        raw = await body.read_limited(100)
+        return raw, await body.read(), await body.discard()
+    assert run(check, chunked(b'abc', b'def')) == (b'abcdef', b'abcdef', True)
+
+
+def test_read_limited_over_limit_keeps_the_body_for_forwarding():
+    parts = [b'a' * 40, b'b' * 40, b'c' * 40]
+
+    async def check(body, reader):
+        raw = await body.read_limited(50)
+        forwarded = b''.join([data async for data in body])
+        return raw, forwarded, await reader.read()
+    assert run(check, chunked(*parts) + NEXT_REQUEST) == (None, b''.join(parts), NEXT_REQUEST)
+
+
+def test_read_limited_skips_declared_oversized_body():
+    async def check(body, reader):
+        return await body.read_limited(5), await body.read()
+    assert run(check, b'0123456789', headers={'Content-Length': '10'}) == (None, b'0123456789')
+
+
+def test_discard_unread_body_keeps_connection_usable():
+    async def check(body, reader):
+        return await body.discard(), await reader.read()
+    assert run(check, chunked(b'abc') + NEXT_REQUEST) == (True, NEXT_REQUEST)
+
+
+def test_discard_after_failed_read():
+    async def check(body, reader):
+        with pytest.raises(MalformedBody):
+            await body.read()
+        return await body.discard()
+    assert run(check, b'zz\r\n') is False
+
+
+def test_body_can_only_be_iterated_once():
+    async def check(body, reader):
+        [data async for data in body]
+        with pytest.raises(RuntimeError):
+            [data async for data in body]
+    run(check, chunked(b'abc'))
@@ -0,0 +1,143 @@
+import datetime
+import json
+import random
+
+import pytest
+
+from src.core import data_generator
+from src.core.data_generator import DataGenerator
+
+URL = 'http://mock.test/api/items'
+
+
+def dumps(value) -> bytes:
+    return json.dumps(value, ensure_ascii=False).encode('utf-8')
+
+
+@pytest.fixture(scope='module')
+def generator():
+    return DataGenerator()
+
+
+# 占位符取值固定（randint:n,n），to_json / iter_json 与 json.dumps(render()) 可逐字节比较
+TEMPLATES = {
+    'static': {'ok': True, 'n': 1.5, 'text': '中文 "quoted" \\ \n', 'none': None, 'list': [1, [2, {}]]},
+    'placeholders': {'id': '{{random.randint:7,7}}', 'label': 'id-{{random.randint:3,3}}-%s',
+                     'nested': [{'v': '{{random.randint:1,1}}'}, 'plain'], 1: 'int key',
+                     'é': '{{random.randint:2,2}}'},
+    'repeat': {'total': 3, 'items': {'$repeat': 3, '$item': {'id': '{{random.randint:5,5}}', 'p': '100%'}}},
+    'repeat static item': {'items': {'$repeat': 4, '$item': {'k': 'v'}}, 'x': '{{random.randint:1,1}}'},
+    'repeat zero': {'items': {'$repeat': 0, '$item': '{{random.randint:1,1}}'}},
+    'nested repeat': {'$repeat': 3, '$item': {'row': {'$repeat': 2, '$item': ['{{random.randint:4,4}}', '%d']}}},
+    'repeat over batch': [{'$repeat': data_generator.STREAM_BATCH * 2 + 5, '$item': '{{random.randint:9,9}}'}],
+    'repeat by query': {'data': {'$repeat': {'query': 'size', 'default': 2, 'max': 50},
+                                 '$item': {'n': '{{random.randint:6,6}}'}}},
+    'top-level string': 'value {{random.randint:8,8}}',
+}
+URLS = [URL, URL + '?size=7', URL + '?size=1000', URL + '?size=-3', URL + '?size=abc']
+
+
+def test_render_fills_placeholders(generator):
+    plan = generator.compile(TEMPLATES['placeholders'])
+    assert not plan.static
+    assert plan.render() == {'id': '7', 'label': 'id-3-%s', 'nested': [{'v': '1'}, 'plain'],
+                             1: 'int key', 'é': '2'}
+    assert generator.compile(TEMPLATES['top-level string']).render() == 'value 8'
+
+
+def test_static_template_is_shared(generator):
+    plan = generator.compile(TEMPLATES['static'])
+    assert plan.static
+    assert plan.value is TEMPLATES['static']
+    assert plan.render() is TEMPLATES['static']
+
+
+def test_dynamic_render_copies_only_changed_containers(generator):
+    template = {'fixed': {'a': [1, 2]}, 'v': '{{random.randint:1,1}}'}
+    plan = generator.compile(template)
+    first, second = plan.render(), plan.render()
+    assert first == second == {'fixed': {'a': [1, 2]}, 'v': '1'}
+    assert first is not second
+    assert first['fixed'] is template['fixed']
+
+
+def test_placeholders_with_fixed_results_compile_to_static_text(generator):
+    plan = generator.compile('{{nope.x}} and {{random.nomethod}}')
+    assert plan.static
+    assert plan.value.startswith('{{UNKNOWN: nope.x}} and {{ERROR: random.nomethod')
+
+
+def test_generate_data_matches_compiled_plan(generator):
+    template = TEMPLATES['placeholders']
+    assert generator.generate_data(template) == generator.compile(template).render()
+
+
+@pytest.mark.parametrize('name', TEMPLATES)
+def test_to_json_equals_dumps_render(generator, name):
+    plan = generator.compile(TEMPLATES[name])
+    for url in URLS:
+        assert plan.to_json(url) == dumps(plan.render(url)), url
+
+
+@pytest.mark.parametrize('name', TEMPLATES)
+def test_iter_json_joins_to_to_json(generator, name):
+    plan = generator.compile(TEMPLATES[name])
+    for url in URLS:
+        assert ''.join(plan.iter_json(url)).encode('utf-8') == plan.to_json(url), url
+
+
+def test_repeat_count_from_query(generator):
+    plan = generator.compile(TEMPLATES['repeat by query'])
+    counts = [len(json.loads(plan.to_json(url))['data']) for url in URLS]
+    assert counts == [2, 7, 50, 0, 2]
+
+
+def test_streaming_batches(generator):
+    plan = generator.compile(TEMPLATES['repeat over batch'])
+    assert plan.streamable
+    pieces = list(plan.iter_json(URL))
+    # 除方括号外每批 STREAM_BATCH 项一段：两个整批与剩余的 5 项
+    assert len([p for p in pieces if p.strip('[], ')]) == 3
+    assert json.loads(''.join(pieces)) == [['9'] * (data_generator.STREAM_BATCH * 2 + 5)]
+
+
+def test_static_template_is_encoded_once(generator):
+    plan = generator.compile(TEMPLATES['static'])
+    assert plan.static and not plan.streamable
+    assert plan.to_json() is plan.to_json(URL)
+    assert plan.body == dumps(TEMPLATES['static'])
+
+
+def test_random_values_match_with_same_seed(generator):
+    # 不含 $repeat 时占位符按模板顺序求值，同一随机种子下两种输出一致
+    plan = generator.compile({'a': '{{random.randint:1,1000000}}', 'b': ['{{random.uniform}}', 'x'],
+                              'c': 'n={{random.randint}}'})
+    random.seed(42)
+    encoded = plan.to_json(URL)
+    random.seed(42)
+    assert encoded == dumps(plan.render(URL))
+
+
+def test_values_json_cannot_encode(generator):
+    # YAML 日期等 JSON 无法表示的值：与 json.dumps 一样报错，而不是输出不同的结果
+    for template in ({'d': datetime.date(2024, 1, 2)},
+                     {'d': datetime.date(2024, 1, 2), 'v': '{{random.randint:1,1}}'},
+                     {'$repeat': 2, '$item': {'d': datetime.date(2024, 1, 2), 'v': '{{random.randint:1,1}}'}}):
+        plan = generator.compile(template)
+        with pytest.raises(TypeError):
+            dumps(plan.render(URL))
+        with pytest.raises(TypeError):
+            plan.to_json(URL)
+
+
+@pytest.mark.parametrize('template', [
+    {'$repeat': 2},
+    {'$repeat': -1, '$item': 1},
+    {'$repeat': [3, 1], '$item': 1},
+    {'$repeat': {'default': 2}, '$item': 1},
+    {'$repeat': 2, '$item': 1, 'extra': 1},
+])
+def test_invalid_repeat_renders_error_text(generator, template):
+    plan = generator.compile(template)
+    assert plan.render(URL).startswith('{{ERROR: $repeat')
+    assert plan.to_json(URL) == dumps(plan.render(URL))
@@ -0,0 +1,128 @@
+import random
+import re
+
+import pytest
+
+from src.core import rule_index
+from src.core.rule_index import RuleIndex, compile_rule
+
+ENGINES = ['linear', 'combined',
+           pytest.param('re2', marks=pytest.mark.skipif(rule_index.re2 is None, reason='未安装 google-re2'))]
+
+HOSTS = ['api.example.com', 'img.example.com', 'ÄPI.example.com']
+
+
+def _rule(url, method='GET', **extra):
+    return dict(url=url, method=method, response={'code': 200, 'msg': url}, **extra)
+
+
+def build_rules(n: int, seed: int = 0):
+    """覆盖各种写法：主机桶、通用列表、内联标志，以及无法合并或 RE2 不支持的反向引用 / 环视"""
+    rnd = random.Random(seed)
+    rules = []
+    for i in range(n):
+        host = re.escape(rnd.choice(HOSTS))
+        method = rnd.choice(['GET', 'GET', 'POST'])
+        kind = i % 9
+        if kind == 0:
+            url = f'^https?://{host}/v{i % 3}/res{i % 40}/[0-9]+$'
+        elif kind == 1:
+            url = f'^https://{host}/static/.*'
+        elif kind == 2:
+            url = f'.*/health{i % 5}$'
+        elif kind == 3:
+            url = f'(?i)^https://{host}/case{i % 7}$'
+        elif kind == 4:
+            url = f'^https://{host}/(a|b)/\\1/r{i % 6}$'
+        elif kind == 5:
+            url = f'^https://{host}/(?!admin)\\w+/{i % 4}$'
+        elif kind == 6:
+            url = f'^https://{host}/(?P<name>[a-z]+)/x$'
+        elif kind == 7:
+            url = r'^https?://[^/]+/\d+/[\w.-]+$'
+        else:
+            url = f'^https://{host}/items\\?page={i % 3}$'
+        rules.append(_rule(url, method))
+    return rules
+
+
+def build_urls(count: int, seed: int = 1):
+    rnd = random.Random(seed)
+    paths = ['/v{a}/res{b}/42', '/static/app.js', '/x/health{c}', '/CASE{c}', '/a/a/r{c}', '/b/a/r{c}',
+             '/admin/{c}', '/user/{c}', '/abc/x', '/12/ÿé.txt', '/items?page={c}', '/v{a}/res{b}/4x2']
+    urls = []
+    for _ in range(count):
+        path = rnd.choice(paths).format(a=rnd.randrange(3), b=rnd.randrange(40), c=rnd.randrange(8))
+        scheme = rnd.choice(['http', 'https'])
+        host = rnd.choice(HOSTS + ['other.test'])
+        urls.append(f'{scheme}://{host}{path}')
+    return urls
+
+
+def reference(rules, method, url):
+    """配置顺序中第一条 method 相同且 re.fullmatch 的规则序号"""
+    for index, rule in enumerate(rules):
+        if rule['method'] == method and re.fullmatch(rule['url'], url):
+            return index
+    return None
+
+
+def _index_of(compiled):
+    return None if compiled is None else compiled.index
+
+
+@pytest.fixture(scope='module')
+def rules():
+    return build_rules(400)
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_first_match_equals_fullmatch(rules, engine):
+    index = RuleIndex(rules, engine=engine)
+    assert index.engine == engine
+    for url in build_urls(2000):
+        for method in ('GET', 'POST'):
+            assert _index_of(index.match(method, url)) == reference(rules, method, url), (method, url)
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_lazy_index_from_snapshot_entries(rules, engine):
+    entries = []
+    for i, rule in enumerate(rules):
+        compiled = compile_rule(i, rule)
+        entries.append((i, compiled.method, compiled.prefix))
+    index = RuleIndex(rules, engine=engine, entries=entries)
+    for url in build_urls(500, seed=2):
+        assert _index_of(index.match('GET', url)) == reference(rules, 'GET', url), url
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_candidates_continue_past_body_rules(engine):
+    rules = []
+    for i in range(60):
+        body = {'json': {'$.n': i}} if i % 3 else None
+        rules.append(_rule(f'^https://api\\.example\\.com/n/{i % 5}$', body=body))
+        rules.append(_rule('.*/n/[0-9]$', body={'regex': str(i)}))
+    index = RuleIndex(rules, engine=engine)
+    for url in ('https://api.example.com/n/3', 'https://img.example.com/n/1', 'https://api.example.com/n/x'):
+        expected = []
+        for i, rule in enumerate(rules):
+            if re.fullmatch(rule['url'], url):
+                expected.append(i)
+                if not rule.get('body'):
+                    break
+        assert [c.index for c in index.candidates('GET', url)] == expected
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_with_changes_matches_rebuilt_index(rules, engine):
+    index = RuleIndex(rules, engine=engine)
+    removed = index.rules[::7]
+    added = [compile_rule(i + 0.5, _rule('.*/health1$')) for i in range(0, 400, 50)]
+    changed = index.with_changes(removed=removed, added=added)
+
+    dropped = {c.index for c in removed}
+    expected = sorted([c for c in index.rules if c.index not in dropped] + added)
+    for url in build_urls(500, seed=3):
+        want = next((c.index for c in expected if c.method == 'GET' and c.regex.fullmatch(url)), None)
+        assert _index_of(changed.match('GET', url)) == want, url